@@ -1,231 +1,1082 @@
-from flask import Flask, request, jsonify, Response
-import cairosvg
-from api_domain import plan_shelves_py
+from flask import Flask, Request, request, jsonify, Response, g, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+from api_domain import normalize_params
+from api_catalog import catalogues
+from api_cache import RenderCache, canonical_key, plan_cache, plan_shelves_cached, source_version
 from api_draw import render_svg
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.utils import ImageReader
-from PyPDF2 import PdfReader, PdfWriter
-from io import BytesIO
+from api_room import room_geometry
+from api_workers import (JobStore, QueueFull, RenderError, RenderPool, rasterize_svg, render_image,
+                         report_page)
+from api_metrics import (Gauges, SlowRequestProfiler, cache_collector, hit_ratio_collector, registry,
+                         request_duration, request_errors_total, request_size, request_spans, requests_total,
+                         response_size, server_timing_header, span, start_request)
+from concurrent.futures import TimeoutError as RenderTimeout
+from api_json import install_json_provider
+from api_schema import (BOM_FIELDS, QUERY_REQUIRED, REPORT_FIELDS, ValidationError, compact_result, parse_compact,
+                        parse_fields, parse_plan)
+from api_bom import CutList, iter_csv, iter_json, piece_rows
+from api_session import PlanSession, SessionStore, merge_changes
+from api_limits import CHEAP, CLASSES, HEAVY, RENDER, LoadShedder, RateLimiter
+import hmac
+import math
+import os
+import shutil
+import tempfile
+import time
+
+# api_batch (NumPy) y api_pdf (reportlab, PyPDF2) se importan dentro de los endpoints que
+# los usan, y cairosvg dentro del pool de rasterizado: un worker que solo atiende /plan
+# arranca sin cargarlos. En producción wsgi.py puede precargarlos antes del fork.
+
+# Uploads de PDF de /pdf y /quote: pasan por disco (ver PDF_STREAM_THRESHOLD) y tienen su propio máximo
+UPLOAD_ENDPOINTS = ('pdf_endpoint', 'quote_endpoint')
+UPLOAD_MAX_CONTENT_LENGTH = int(os.environ.get('PDF_MAX_CONTENT_LENGTH_MB', '256')) * 1024 * 1024
+
+
+class LimitedRequest(Request):
+    # Flask aplica MAX_CONTENT_LENGTH a todo pedido; los endpoints de upload usan UPLOAD_MAX_CONTENT_LENGTH
+    @property
+    def max_content_length(self):
+        if self.endpoint in UPLOAD_ENDPOINTS:
+            return UPLOAD_MAX_CONTENT_LENGTH
+        return super().max_content_length
+
 
 app = Flask(__name__)
+app.request_class = LimitedRequest
+# orjson si está instalado (JSON_BACKEND=auto|orjson|std)
+JSON_BACKEND = install_json_provider(app)
+STARTED_AT = time.time()
 
+# Tamaño máximo del cuerpo de un pedido (salvo los uploads de /pdf y /quote); por encima responde 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH_MB', '64')) * 1024 * 1024
 
-def parse_walls(raw):
-    if raw is None:
-        return []
-    if isinstance(raw, list):
-        return [str(x) for x in raw]
-    # comma-separated string
-    return [x.strip() for x in str(raw).split(',') if x.strip()]
+# Máximo de habitaciones por llamada a /plan/batch
+PLAN_BATCH_MAX = 50000
 
+# Sesiones de edición de /plan/sessions: vencen tras PLAN_SESSION_TTL_S sin uso
+plan_sessions = SessionStore(
+    ttl=float(os.environ.get('PLAN_SESSION_TTL_S', '1800')),
+    max_sessions=int(os.environ.get('PLAN_SESSIONS_MAX', '10000')),
+)
 
-@app.get('/plan')
-def plan_endpoint_get():
+# Caché de renders: memoria (MB), disco opcional (directorio + MB) y cabecera Cache-Control
+render_cache = RenderCache(
+    memory_bytes=int(os.environ.get('RENDER_CACHE_MEMORY_MB', '64')) * 1024 * 1024,
+    disk_dir=os.environ.get('RENDER_CACHE_DIR') or None,
+    disk_bytes=int(os.environ.get('RENDER_CACHE_DISK_MB', '512')) * 1024 * 1024,
+)
+RENDER_CACHE_CONTROL = os.environ.get('RENDER_CACHE_CONTROL', 'public, max-age=86400')
+# Versión del dibujo (hash del código de api_draw, api_room y api_workers): entra en la clave para que un deploy que
+# cambia el dibujo o el rasterizado no siga sirviendo los renders anteriores guardados en disco
+RENDER_VERSION = source_version(render_svg, room_geometry, render_image)
+
+# Pool de procesos para rasterizar: workers, cola máxima, timeout por pedido (s) y Retry-After (s)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', str(os.cpu_count() or 1)))
+render_pool = RenderPool(
+    workers=RENDER_WORKERS,
+    max_queue=int(os.environ.get('RENDER_QUEUE_MAX', str(2 * max(1, RENDER_WORKERS)))),
+    timeout=float(os.environ.get('RENDER_TIMEOUT_S', '30')),
+)
+RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER_S', '2'))
+render_jobs = JobStore(
+    ttl=float(os.environ.get('RENDER_JOB_TTL_S', '600')),
+    max_jobs=int(os.environ.get('RENDER_JOBS_MAX', '1000')),
+)
+
+# /pdf pasa a modo streaming (disco + respuesta por bloques) por encima de este tamaño de pedido
+PDF_STREAM_THRESHOLD = int(os.environ.get('PDF_STREAM_THRESHOLD_MB', '20')) * 1024 * 1024
+
+# Máximo de habitaciones (páginas) por informe de /report
+REPORT_MAX_PAGES = int(os.environ.get('REPORT_MAX_PAGES', '500'))
+
+# Directorio de PDFs base que /quote puede usar por nombre
+QUOTE_TEMPLATE_DIR = os.environ.get('QUOTE_TEMPLATE_DIR') or None
+
+# Clase de costo de cada endpoint (nombre de la vista); el resto es CHEAP. /healthz y /metrics no se limitan.
+ENDPOINT_CLASSES = {
+    'render_endpoint': RENDER, 'render_job_submit': RENDER, 'plan_batch_endpoint': RENDER, 'plan_bom': RENDER,
+    'pdf_endpoint': HEAVY, 'quote_endpoint': HEAVY, 'report_endpoint': HEAVY,
+}
+UNLIMITED_ENDPOINTS = ('healthz', 'metrics_endpoint', 'metrics_slowest', 'static')
+
+# Rate limit por cliente (token bucket en memoria de cada worker): fichas por segundo, ráfaga y costo por clase.
+# RATE_LIMIT_PER_S=0 lo desactiva; RATE_LIMIT_HEADER (p. ej. X-Forwarded-For detrás de un proxy) identifica al cliente.
+rate_limiter = RateLimiter(
+    rate=float(os.environ.get('RATE_LIMIT_PER_S', '50')),
+    burst=float(os.environ.get('RATE_LIMIT_BURST', '200')),
+    max_clients=int(os.environ.get('RATE_LIMIT_CLIENTS', '100000')),
+)
+RATE_LIMIT_HEADER = os.environ.get('RATE_LIMIT_HEADER') or None
+RATE_COSTS = {
+    CHEAP: float(os.environ.get('RATE_COST_CHEAP', '1')),
+    RENDER: float(os.environ.get('RATE_COST_RENDER', '5')),
+    HEAVY: float(os.environ.get('RATE_COST_HEAVY', '20')),
+}
+
+# Load shedding por worker: capacidad en unidades de peso (0 lo desactiva) y latencia objetivo de los pedidos baratos
+load_shedder = LoadShedder(
+    max_capacity=float(os.environ.get('SHED_CAPACITY', '32')),
+    target=float(os.environ.get('SHED_TARGET_MS', '250')) / 1000,
+)
+
+# Métricas: cabecera Server-Timing en todas las respuestas y perfilador de los pedidos más lentos
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true')
+profiler = SlowRequestProfiler(
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    keep=int(os.environ.get('PROFILE_KEEP', '20')),
+    directory=os.environ.get('PROFILE_DIR') or None,
+)
+
+METRIC_CACHES = {'plan': plan_cache.stats, 'render_memory': render_cache.memory.stats}
+if render_cache.disk is not None:
+    METRIC_CACHES['render_disk'] = render_cache.disk.stats
+for _field, _desc in (('hits', 'aciertos'), ('misses', 'fallos'), ('evictions', 'desalojos')):
+    registry.register(Gauges(f'repisas_cache_{_field}_total', f'Cachés: {_desc} acumulados.', 'counter',
+                             cache_collector(METRIC_CACHES, _field)))
+registry.register(Gauges('repisas_cache_entries', 'Cachés: entradas actuales.', 'gauge',
+                         cache_collector(METRIC_CACHES, 'entries')))
+registry.register(Gauges('repisas_cache_hit_ratio', 'Cachés: aciertos / (aciertos + fallos).', 'gauge',
+                         hit_ratio_collector(METRIC_CACHES)))
+registry.register(Gauges('repisas_render_rejected_total', 'Renders rechazados con 503 por cola llena.', 'counter',
+                         lambda: [({}, render_pool.rejected)]))
+registry.register(Gauges('repisas_rate_limited_total', 'Pedidos rechazados con 429 por rate limit.', 'counter',
+                         lambda: [({}, rate_limiter.rejected)]))
+registry.register(Gauges('repisas_shed_total', 'Pedidos rechazados con 503 por load shedding, por clase.', 'counter',
+                         lambda: [({'class': kind}, load_shedder.shed[kind]) for kind in CLASSES]))
+registry.register(Gauges('repisas_shed_capacity', 'Capacidad actual del load shedding (unidades de peso).', 'gauge',
+                         lambda: [({}, load_shedder.capacity)]))
+
+
+def endpoint_label():
+    # La regla de la ruta (no la URL) para acotar la cardinalidad
+    return request.url_rule.rule if request.url_rule is not None else 'other'
+
+
+@app.before_request
+def metrics_start():
+    g.metrics_t0 = time.perf_counter()
+    start_request()
+    g.profile = profiler.maybe_start()
+
+
+def client_key():
+    # Primer valor de RATE_LIMIT_HEADER si está configurada y presente; si no, la IP de la conexión
+    if RATE_LIMIT_HEADER:
+        value = request.headers.get(RATE_LIMIT_HEADER)
+        if value:
+            return value.split(',')[0].strip()
+    return request.remote_addr or '-'
+
+
+def limit_response(status, error, retry_after):
+    resp = jsonify({'ok': False, 'error': error})
+    resp.status_code = status
+    resp.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return resp
+
+
+@app.before_request
+def admission():
+    # Tamaño del cuerpo, rate limit por cliente y load shedding, antes de leer el cuerpo o hacer trabajo
+    if request.endpoint is None or request.endpoint in UNLIMITED_ENDPOINTS:
+        return None
+    limit = request.max_content_length
+    if limit and (request.content_length or 0) > limit:
+        return too_large(None)
+    kind = ENDPOINT_CLASSES.get(request.endpoint, CHEAP)
+    if rate_limiter.enabled:
+        wait = rate_limiter.acquire(client_key(), RATE_COSTS[kind])
+        if wait:
+            return limit_response(429, 'Demasiados pedidos, reintente más tarde', wait)
+    if load_shedder.enabled:
+        if not load_shedder.admit(kind):
+            return limit_response(503, 'Servidor ocupado, reintente más tarde', RENDER_RETRY_AFTER)
+        g.shed_class = kind
+    return None
+
+
+@app.teardown_request
+def admission_release(exc):
+    kind = g.pop('shed_class', None)
+    if kind is not None:
+        load_shedder.release(kind, time.perf_counter() - g.get('metrics_t0', time.perf_counter()))
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def too_large(e):
+    limit_mb = request.max_content_length / (1024 * 1024)
+    return jsonify({'ok': False, 'error': f'El pedido supera el máximo de {limit_mb:g} MB'}), 413
+
+
+@app.after_request
+def metrics_finish(resp):
+    duration = time.perf_counter() - g.get('metrics_t0', time.perf_counter())
+    endpoint = endpoint_label()
+    requests_total.inc(endpoint=endpoint, method=request.method, code=resp.status_code)
+    if resp.status_code >= 400:
+        request_errors_total.inc(endpoint=endpoint, code=resp.status_code)
+    request_duration.observe(duration, endpoint=endpoint)
+    if request.content_length:
+        request_size.observe(request.content_length, endpoint=endpoint)
+    if resp.content_length is not None:
+        response_size.observe(resp.content_length, endpoint=endpoint)
+    if SERVER_TIMING and 'Server-Timing' not in resp.headers:
+        resp.headers['Server-Timing'] = server_timing_header(request_spans(), duration)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.finish(profile, {
+            'endpoint': endpoint, 'method': request.method, 'path': request.full_path.rstrip('?'),
+            'status': resp.status_code, 'duration': duration, 'time': time.time(),
+            'spans': {stage: elapsed for stage, elapsed in request_spans()},
+        })
+    return resp
+
+
+@app.get('/healthz')
+def healthz():
+    # Sonda de readiness: no toca cachés, pools ni módulos pesados
+    return jsonify({'ok': True, 'pid': os.getpid(), 'uptimeS': round(time.time() - STARTED_AT, 3)})
+
+
+@app.get('/metrics')
+def metrics_endpoint():
+    return Response(registry.expose(), mimetype='text/plain; version=0.0.4')
+
+
+@app.get('/metrics/slowest')
+def metrics_slowest():
+    if not profiler.enabled:
+        return jsonify({'ok': False, 'error': 'Perfilador desactivado (PROFILE_SAMPLE_RATE=0)'}), 404
+    return jsonify({'sampleRate': profiler.sample_rate, 'requests': profiler.slowest()})
+
+
+# Endpoints de administración: exigen `Authorization: Bearer <ADMIN_TOKEN>` y sin ADMIN_TOKEN quedan deshabilitados
+ADMIN_ENDPOINTS = ('plan_cache_clear', 'render_cache_clear', 'catalogues_reload')
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') or None
+
+
+@app.before_request
+def admin_auth():
+    if request.endpoint not in ADMIN_ENDPOINTS:
+        return None
+    if not ADMIN_TOKEN:
+        return jsonify({'ok': False, 'error': 'Endpoint de administración deshabilitado (definir ADMIN_TOKEN)'}), 403
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        resp = jsonify({'ok': False, 'error': 'Token de administración inválido'})
+        resp.status_code = 401
+        resp.headers['WWW-Authenticate'] = 'Bearer'
+        return resp
+    return None
+
+
+def read_json(text=None):
+    """JSON del cuerpo (con cualquier Content-Type) o de `text`; ValidationError si no es válido."""
     try:
-        params = {
-            'A': float(request.args.get('A', type=float)),
-            'B': float(request.args.get('B', type=float)),
-            'C': float(request.args.get('C', type=float)),
-            'D': float(request.args.get('D', type=float)),
-            'E': float(request.args.get('E', type=float)),
-            'roomHeight': float(request.args.get('H', request.args.get('roomHeight', type=float))),
-            'walls': parse_walls(request.args.get('walls')),
-            'shape': request.args.get('shape', default='L'),
-        }
+        payload = app.json.loads(text) if text is not None else request.get_json(force=True)
+    except RequestEntityTooLarge:
+        raise
     except Exception:
-        return jsonify({'ok': False, 'error': 'Parámetros inválidos'}), 400
+        payload = None
+    if payload is None:
+        raise ValidationError({'body': 'JSON inválido'}, 'JSON inválido')
+    return payload
+
+
+def input_of(payload):
+    # Los campos pueden venir en el nivel superior o anidados en 'input'
+    return payload.get('input') or payload if isinstance(payload, dict) else payload
 
-    result = plan_shelves_py(params)
+
+def plan_response(params, result, compact):
     status = 200 if result.get('ok') else 422
-    return jsonify({'input': params, 'result': result}), status
+    return jsonify({'input': params, 'result': compact_result(result, compact)}), status
+
+
+@app.get('/plan')
+def plan_endpoint_get():
+    try:
+        params = parse_plan(request.args, QUERY_REQUIRED)
+        compact = parse_compact(request.args.get('compact'))
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    with span('plan'):
+        params, result = plan_shelves_cached(params)
+    return plan_response(params, result, compact)
 
 
 @app.post('/plan')
 def plan_endpoint_post():
     try:
-        payload = request.get_json(force=True)
-        # allow either top-level fields or nested under 'input'
-        body = payload.get('input', payload)
-        params = {
-            'A': float(body.get('A', 0)),
-            'B': float(body.get('B', 0)),
-            'C': float(body.get('C', 0)),
-            'D': float(body.get('D', 0)),
-            'E': float(body.get('E', 0)),
-            'roomHeight': float(body.get('roomHeight', body.get('H', 0))),
-            'walls': body.get('walls', []),
-            'shape': body.get('shape', 'L'),
-        }
+        payload = read_json()
+        params = parse_plan(input_of(payload))
+        compact = parse_compact(request.args.get('compact', payload.get('compact')))
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    with span('plan'):
+        params, result = plan_shelves_cached(params)
+    return plan_response(params, result, compact)
+
+
+@app.get('/plan/cache')
+def plan_cache_stats():
+    return jsonify(plan_cache.stats())
+
+
+@app.delete('/plan/cache')
+def plan_cache_clear():
+    plan_cache.clear()
+    return jsonify({'ok': True})
+
+
+def batch_rows(payload):
+    # Acepta una lista de habitaciones, {'rooms': [...]} o {'columns': {'A': [...], ...}}
+    if isinstance(payload, list):
+        return payload
+    if 'rooms' in payload:
+        return list(payload['rooms'])
+    columns = payload['columns']
+    n = len(next(iter(columns.values()), []))
+    if any(not isinstance(v, list) or len(v) != n for v in columns.values()):
+        raise ValueError('columnas de distinto largo')
+    return [{k: v[i] for k, v in columns.items()} for i in range(n)]
+
+
+# Cuerpos que /plan/bom lee línea por línea (una habitación o un resultado por línea)
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+PIECE_FIELDS = ('wall', 'length', 'depth', 'height', 'levels')
+
+
+def bom_rows():
+    if request.mimetype in NDJSON_MIMETYPES:
+        return ndjson_rows(request.stream)
+    return batch_rows(read_json())
+
+
+def ndjson_rows(stream):
+    for line in stream:
+        if line.strip():
+            try:
+                yield app.json.loads(line)
+            except Exception:
+                yield None
+
+
+def piece_errors(plan):
+    # Las piezas pueden venir del cliente: medidas finitas positivas y niveles enteros positivos
+    errors = {}
+    for j, p in enumerate(plan):
+        for k in ('length', 'depth', 'height'):
+            value = p[k]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value < math.inf:
+                errors[f'result.plan[{j}].{k}'] = 'debe ser un número positivo'
+        levels = p['levels']
+        if isinstance(levels, bool) or not isinstance(levels, int) or levels < 1:
+            errors[f'result.plan[{j}].levels'] = 'debe ser un entero positivo'
+        offset = p.get('offset')
+        if offset is not None and (isinstance(offset, bool) or not isinstance(offset, (int, float))
+                                   or not math.isfinite(offset)):
+            errors[f'result.plan[{j}].offset'] = 'debe ser un número'
+        if errors:
+            break
+    return errors
+
+
+def bom_entry(row):
+    """(plan, largo de tabla, cantidad) de una fila de /plan/bom, o (None, error, cantidad).
+
+    La fila puede traer un resultado ya calculado (`result`, p. ej. de /plan/batch) o la
+    entrada de /plan, que se planifica con la caché; `quantity` repite la habitación.
+    """
+    if not isinstance(row, dict):
+        return None, {'input': 'debe ser un objeto'}, 1
+    quantity = row.get('quantity', 1)
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+        return None, {'quantity': 'debe ser un entero positivo'}, 1
+    result = row.get('result')
+    if result is None:
+        try:
+            _, result = plan_shelves_cached(parse_plan(input_of(row)))
+        except ValidationError as e:
+            return None, e.errors, quantity
+    if not isinstance(result, dict):
+        return None, {'result': 'debe ser un resultado de /plan'}, quantity
+    if not result.get('ok'):
+        return None, result.get('error', 'Resultado no factible'), quantity
+    plan = result.get('plan')
+    if not isinstance(plan, list) or not all(isinstance(p, dict) and all(k in p for k in PIECE_FIELDS) for p in plan):
+        return None, {'result': 'debe ser un resultado de /plan'}, quantity
+    errors = piece_errors(plan)
+    if errors:
+        return None, errors, quantity
+    try:
+        cat = catalogues.get((result.get('meta') or {}).get('catalogue'))
+    except KeyError:
+        cat = catalogues.get()
+    return plan, cat.max_len, quantity
+
+
+def bom_pieces(rows, cut_list, detail):
+    # Consume las filas acumulando en `cut_list`; con `detail` genera además cada pieza
+    for i, row in enumerate(rows):
+        plan, stock, quantity = bom_entry(row)
+        if plan is None:
+            cut_list.add_error(i, stock, quantity)
+            continue
+        cut_list.add_plan(plan, stock, quantity)
+        if detail:
+            yield from piece_rows(i, plan, quantity)
+
+
+@app.post('/plan/bom')
+def plan_bom():
+    options, errors = parse_fields(request.args, BOM_FIELDS)
+    if errors:
+        return jsonify(ValidationError(errors).payload()), 400
+    try:
+        rows = bom_rows()
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
     except Exception:
         return jsonify({'ok': False, 'error': 'JSON inválido'}), 400
 
-    result = plan_shelves_py(params)
-    status = 200 if result.get('ok') else 422
-    return jsonify({'input': params, 'result': result}), status
+    cut_list = CutList(kerf=options['kerf'])
+    pieces = bom_pieces(rows, cut_list, options['detail'])
+    if not options['detail']:
+        # Sin detalle se acumula todo antes de responder; la salida solo depende de las medidas distintas
+        with span('bom'):
+            for _ in pieces:
+                pass
+        pieces = None
+    if options['format'] == 'csv':
+        body, mimetype, filename = iter_csv(pieces, cut_list), 'text/csv', 'cortes.csv'
+    else:
+        body, mimetype, filename = iter_json(pieces, cut_list, app.json.dumps), 'application/json', 'cortes.json'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 
-@app.post('/render')
-def render_endpoint():
+def session_params(source):
+    # Las sesiones replanifican por muro el planificador A/B/E; no admiten `room` ni `optimize`
+    params = parse_plan(source)
+    unsupported = {k: 'no disponible en sesiones de edición' for k in ('room', 'optimize') if k in params}
+    if unsupported:
+        raise ValidationError(unsupported)
+    return normalize_params(params)
+
+
+def session_state(session):
+    return {'session': session.id, 'version': session.version, 'input': session.params,
+            'result': session.result, 'svg': session.svg()}
+
+
+@app.post('/plan/sessions')
+def plan_session_create():
     try:
-        payload = request.get_json(force=True)
+        params = session_params(input_of(read_json()))
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    session = PlanSession()
+    with span('plan'):
+        patch = session.apply(params)
+    if not patch['ok']:
+        return jsonify(patch), 422
+    plan_sessions.add(session)
+    return jsonify(session_state(session)), 201
+
+
+@app.get('/plan/sessions/<session_id>')
+def plan_session_get(session_id):
+    session = plan_sessions.get(session_id)
+    if session is None:
+        return jsonify({'ok': False, 'error': 'Sesión inexistente o vencida'}), 404
+    with session.lock:
+        return jsonify(session_state(session))
+
+
+@app.patch('/plan/sessions/<session_id>')
+def plan_session_update(session_id):
+    session = plan_sessions.get(session_id)
+    if session is None:
+        return jsonify({'ok': False, 'error': 'Sesión inexistente o vencida'}), 404
+    try:
+        payload = read_json()
+        if not isinstance(payload, dict):
+            raise ValidationError({'changes': 'debe ser un objeto'})
+        changes = payload.get('changes', {k: v for k, v in payload.items() if k != 'version'})
+        if not isinstance(changes, dict):
+            raise ValidationError({'changes': 'debe ser un objeto'})
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    with session.lock:
+        # `version` opcional: rechaza cambios hechos sobre un estado que ya no es el actual
+        if payload.get('version') is not None and payload['version'] != session.version:
+            return jsonify({'ok': False, 'error': 'La sesión cambió', 'version': session.version}), 409
+        try:
+            params = session_params(merge_changes(session.params, changes))
+        except ValidationError as e:
+            return jsonify(e.payload()), 400
+        with span('plan'):
+            patch = session.apply(params)
+        if not patch['ok']:
+            return jsonify(dict(patch, version=session.version)), 422
+        return jsonify(dict(patch, session=session.id, input=params))
+
+
+@app.delete('/plan/sessions/<session_id>')
+def plan_session_delete(session_id):
+    if not plan_sessions.delete(session_id):
+        return jsonify({'ok': False, 'error': 'Sesión inexistente o vencida'}), 404
+    return jsonify({'ok': True})
+
+
+@app.get('/catalogues')
+def catalogues_endpoint():
+    return jsonify(catalogues.stats())
+
+
+@app.post('/catalogues/reload')
+def catalogues_reload():
+    ok = catalogues.reload()
+    body = catalogues.stats()
+    body['ok'] = ok
+    return jsonify(body), 200 if ok else 422
+
+
+@app.post('/plan/batch')
+def plan_batch_endpoint():
+    from api_batch import plan_shelves_batch
+
+    try:
+        payload = read_json()
+        rows = batch_rows(payload)
+        compact = parse_compact(request.args.get('compact', payload.get('compact') if isinstance(payload, dict) else None))
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
     except Exception:
         return jsonify({'ok': False, 'error': 'JSON inválido'}), 400
+    if len(rows) > PLAN_BATCH_MAX:
+        return jsonify({'ok': False, 'error': f'Máximo {PLAN_BATCH_MAX} habitaciones por llamada'}), 413
+
+    # Parsear fila por fila; las filas inválidas no detienen el lote
+    parsed = [None] * len(rows)
+    valid = []
+    rooms = {}
+    results = [None] * len(rows)
+    for i, row in enumerate(rows):
+        try:
+            params = parse_plan(input_of(row))
+        except ValidationError as e:
+            results[i] = e.payload()
+            continue
+        if 'room' in params or params.get('optimize'):
+            # Los ambientes poligonales y el modo optimizador no se vectorizan: se planifican uno por uno
+            rooms[i] = plan_shelves_cached(params)
+            continue
+        # La misma forma canónica que /plan (plan_shelves_cached): mismo resultado y mismo input devuelto
+        parsed[i] = normalize_params(params)
+        valid.append(i)
+
+    with span('plan_batch'):
+        planned = plan_shelves_batch([parsed[i] for i in valid])
+    for i, result in zip(valid, planned):
+        results[i] = {'ok': result.get('ok', False), 'input': parsed[i], 'result': compact_result(result, compact)}
+    for i, (params, result) in rooms.items():
+        results[i] = {'ok': result.get('ok', False), 'input': params, 'result': compact_result(result, compact)}
+    return jsonify({'count': len(rows), 'okCount': sum(1 for r in results if r['ok']), 'results': results})
+
+
+# Formatos de /render y sus límites de tamaño
+RENDER_MIMETYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+RENDER_DEFAULT_SIZE = (1200, 900)
+THUMBNAIL_SIZE = (200, 150)
+THUMBNAIL_MAX_WIDTH = 320
+RENDER_MIN_SIDE, RENDER_MAX_SIDE = 16, 4000
+
+
+def render_options(payload):
+    """Formato y tamaño pedidos (query string o body): format, width, height, scale, thumbnail.
+
+    Lanza ValidationError con un mensaje por cada opción inválida.
+    """
+    errors = {}
+
+    def opt(name):
+        value = request.args.get(name)
+        return payload.get(name) if value is None else value
+
+    def number(name, kind):
+        value = opt(name)
+        if value is None:
+            return None
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            errors[name] = 'debe ser un número'
+
+    fmt = str(opt('format') or 'png').lower()
+    if fmt not in RENDER_MIMETYPES:
+        errors['format'] = f"debe ser uno de: {', '.join(RENDER_MIMETYPES)}"
+    thumbnail = str(opt('thumbnail') or '').lower() in ('1', 'true')
+    base_w, base_h = THUMBNAIL_SIZE if thumbnail else RENDER_DEFAULT_SIZE
+    width, height, scale = number('width', int), number('height', int), number('scale', float)
+    if errors:
+        raise ValidationError(errors)
+    sized = [name for name, value in (('width', width), ('height', height)) if value is not None] or ['scale']
+    if width is not None and height is not None:
+        pass
+    elif width is not None:
+        height = round(width * base_h / base_w)
+    elif height is not None:
+        width = round(height * base_w / base_h)
+    else:
+        factor = scale if scale is not None else 1.0
+        width, height = round(base_w * factor), round(base_h * factor)
+    if not all(RENDER_MIN_SIDE <= v <= RENDER_MAX_SIDE for v in (width, height)):
+        raise ValidationError({name: f'el tamaño debe quedar entre {RENDER_MIN_SIDE} y {RENDER_MAX_SIDE} px'
+                               for name in sized})
+    # Las miniaturas (pedidas o implícitas por el ancho) omiten cuadrícula y textos
+    thumbnail = thumbnail or width <= THUMBNAIL_MAX_WIDTH
+    if fmt == 'svg':
+        # El SVG es vectorial: el tamaño no cambia el contenido
+        width, height = None, None
+    return {'format': fmt, 'width': width, 'height': height, 'thumbnail': thumbnail}
+
 
+def render_cache_key(input_data, result, options):
+    # render_svg solo lee A, B, E (o el polígono de `room`) y el resultado del plan; cada variante tiene su propia
+    # entrada y la versión del dibujo invalida lo anterior
+    if input_data.get('room') is not None:
+        return canonical_key({'room': input_data['room'], 'result': result, 'variant': options,
+                              'renderer': RENDER_VERSION})
+    return canonical_key({
+        'A': float(input_data['A']),
+        'B': float(input_data['B']),
+        'E': float(input_data['E']),
+        'result': result,
+        'variant': options,
+        'renderer': RENDER_VERSION,
+    })
+
+
+def cached_response(resp, key):
+    resp.set_etag(key)
+    resp.headers['Cache-Control'] = RENDER_CACHE_CONTROL
+    return resp
+
+
+def image_mimetype(data):
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/svg+xml'
+
+
+def render_request():
+    # Devuelve (input_data, result, options, key, None) o (None, None, None, None, respuesta_de_error)
     # Accept either a combined {'input':..., 'result':...} or just 'input' to recompute
-    input_data = payload.get('input') or payload
+    try:
+        payload = read_json()
+        input_data = parse_plan(input_of(payload))
+        options = render_options(payload)
+    except ValidationError as e:
+        return None, None, None, None, (jsonify(e.payload()), 400)
     result = payload.get('result')
     if result is None:
         # recompute using the same planning logic to be robust
-        result = plan_shelves_py(input_data)
+        with span('plan'):
+            input_data, result = plan_shelves_cached(input_data)
         if not result.get('ok'):
-            return jsonify({'ok': False, 'error': result.get('error', 'Error desconocido')}), 422
+            return None, None, None, None, (jsonify({'ok': False, 'error': result.get('error', 'Error desconocido')}), 422)
+    elif not isinstance(result, dict) or not isinstance(result.get('plan'), list):
+        return None, None, None, None, (jsonify(ValidationError({'result': 'debe ser un resultado de /plan'}).payload()), 400)
 
     try:
-        # Render SVG y convertir a PNG preservando transparencias y colores
-        svg = render_svg(input_data, result)
-        if not svg or len(svg.strip()) == 0:
-            return jsonify({'ok': False, 'error': 'SVG generado está vacío'}), 500
-            
-        # Convertir con parámetros específicos para evitar corrupción
-        png_bytes = cairosvg.svg2png(
-            bytestring=svg.encode('utf-8'),
-            output_width=1200,
-            output_height=900,
-            background_color='white'
-        )
-        
-        if not png_bytes or len(png_bytes) == 0:
-            return jsonify({'ok': False, 'error': 'PNG generado está vacío'}), 500
-            
-        return Response(png_bytes, mimetype='image/png')
+        key = render_cache_key(input_data, result, options)
+    except Exception:
+        return None, None, None, None, (jsonify({'ok': False, 'error': 'Parámetros inválidos'}), 400)
+    return input_data, result, options, key, None
+
+
+def busy_response():
+    resp = jsonify({'ok': False, 'error': 'Servidor ocupado, reintente más tarde'})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(RENDER_RETRY_AFTER)
+    return resp
+
+
+@app.post('/render')
+def render_endpoint():
+    input_data, result, options, key, error = render_request()
+    if error:
+        return error
+    mimetype = RENDER_MIMETYPES[options['format']]
+    if request.if_none_match.contains(key):
+        return cached_response(Response(status=304), key)
+
+    data = render_cache.get(key)
+    if data is not None:
+        resp = cached_response(Response(data, mimetype=mimetype), key)
+        resp.headers['X-Cache'] = 'HIT'
+        return resp
+
+    try:
+        with span('svg'):
+            svg = render_svg(input_data, result, thumbnail=options['thumbnail'])
+        if options['format'] == 'svg':
+            # SVG directo desde render_svg, sin rasterizar
+            data = svg.encode('utf-8')
+        else:
+            # Incluye la espera en la cola del pool
+            with span('raster'):
+                data = render_pool.run(rasterize_svg, svg, options['format'], options['width'], options['height'])
+    except QueueFull:
+        return busy_response()
+    except RenderTimeout:
+        return jsonify({'ok': False, 'error': 'Tiempo de render agotado'}), 504
+    except RenderError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
     except Exception as e:
         return jsonify({'ok': False, 'error': f'Error generando imagen: {str(e)}'}), 500
 
+    render_cache.put(key, data)
+    resp = cached_response(Response(data, mimetype=mimetype), key)
+    resp.headers['X-Cache'] = 'MISS'
+    return resp
+
+
+def job_payload(job_id, status):
+    return {'ok': status != 'error', 'jobId': job_id, 'status': status,
+            'statusUrl': f'/render/jobs/{job_id}', 'resultUrl': f'/render/jobs/{job_id}/result'}
+
+
+def store_job_result(key, fut):
+    # Callback del pool: los resultados exitosos pasan a la caché de renders
+    if not fut.cancelled() and fut.exception() is None:
+        render_cache.put(key, fut.result())
+
+
+def start_render_job(key, input_data, result, options):
+    fut = render_pool.submit(render_image, input_data, result, options['format'],
+                             options['width'], options['height'], options['thumbnail'])
+    fut.add_done_callback(lambda f: store_job_result(key, f))
+    return fut
+
+
+@app.post('/render/jobs')
+def render_job_submit():
+    input_data, result, options, key, error = render_request()
+    if error:
+        return error
+    if options['format'] == 'svg':
+        return jsonify({'ok': False, 'error': 'Los trabajos asíncronos son solo para png y webp'}), 400
+    # El id del trabajo es la clave de caché: si ya está renderizado, el trabajo está listo
+    if render_cache.get(key) is not None:
+        return jsonify(job_payload(key, 'done')), 200
+    # JobStore reserva el lugar antes de encolar: si está lleno, el pool no recibe trabajo huérfano
+    try:
+        job = render_jobs.add(key, lambda: start_render_job(key, input_data, result, options))
+    except QueueFull:
+        return busy_response()
+    return jsonify(job_payload(key, JobStore.status(job))), 202
+
+
+@app.get('/render/jobs/<job_id>')
+def render_job_status(job_id):
+    job = render_jobs.get(job_id)
+    if job is None:
+        if render_cache.get(job_id) is not None:
+            return jsonify(job_payload(job_id, 'done'))
+        return jsonify({'ok': False, 'error': 'Trabajo no encontrado'}), 404
+    status = JobStore.status(job)
+    body = job_payload(job_id, status)
+    if status == 'error':
+        exc = None if job['future'].cancelled() else job['future'].exception()
+        body['error'] = str(exc) if exc else 'Trabajo cancelado'
+    return jsonify(body)
+
+
+@app.get('/render/jobs/<job_id>/result')
+def render_job_result(job_id):
+    data = render_cache.get(job_id)
+    if data is None:
+        job = render_jobs.get(job_id)
+        if job is None:
+            return jsonify({'ok': False, 'error': 'Trabajo no encontrado'}), 404
+        status = JobStore.status(job)
+        if status in ('pending', 'running'):
+            resp = jsonify(job_payload(job_id, status))
+            resp.status_code = 202
+            resp.headers['Retry-After'] = str(RENDER_RETRY_AFTER)
+            return resp
+        if status == 'error':
+            return render_job_status(job_id), 500
+        data = job['future'].result()
+    if request.if_none_match.contains(job_id):
+        return cached_response(Response(status=304), job_id)
+    return cached_response(Response(data, mimetype=image_mimetype(data)), job_id)
+
+
+@app.get('/render/cache')
+def render_cache_stats():
+    return jsonify(render_cache.stats())
+
+
+@app.delete('/render/cache')
+def render_cache_clear():
+    render_cache.clear()
+    return jsonify({'ok': True})
+
+
+def plan_page_from_request():
+    """Página del plano a partir de 'image' (PNG/JPEG), 'svg' o el campo 'plan' (JSON).
+
+    Devuelve (page_data, None) o (None, respuesta_de_error).
+    """
+    from api_pdf import build_plan_page
+
+    if 'svg' in request.files and request.files['svg'].filename != '':
+        svg = request.files['svg'].read().decode('utf-8')
+        if not svg.strip():
+            return None, (jsonify({'ok': False, 'error': 'Archivos vacíos'}), 400)
+        with span('page'):
+            return build_plan_page(svg=svg), None
+    if request.form.get('plan'):
+        try:
+            payload = read_json(request.form['plan'])
+            input_data = parse_plan(input_of(payload))
+        except ValidationError as e:
+            return None, (jsonify(e.payload()), 400)
+        result = payload.get('result')
+        if result is None:
+            with span('plan'):
+                input_data, result = plan_shelves_cached(input_data)
+        if not result.get('ok'):
+            return None, (jsonify({'ok': False, 'error': result.get('error', 'Error desconocido')}), 422)
+        with span('svg'):
+            svg = render_svg(input_data, result)
+        with span('page'):
+            return build_plan_page(svg=svg), None
+    if 'image' not in request.files:
+        return None, (jsonify({'ok': False, 'error': 'Se requieren archivos "image" (PNG) y "pdf"'}), 400)
+    image_file = request.files['image']
+    if image_file.filename == '':
+        return None, (jsonify({'ok': False, 'error': 'Archivos no seleccionados'}), 400)
+    image_data = image_file.read()
+    if not image_data:
+        return None, (jsonify({'ok': False, 'error': 'Archivos vacíos'}), 400)
+    with span('page'):
+        return build_plan_page(image_data=image_data), None
+
 
 @app.post('/pdf')
 def pdf_endpoint():
+    from api_pdf import merge_plan_page_bytes
+
     try:
         # Verificar que se enviaron los archivos
-        if 'image' not in request.files or 'pdf' not in request.files:
+        if 'pdf' not in request.files:
             return jsonify({'ok': False, 'error': 'Se requieren archivos "image" (PNG) y "pdf"'}), 400
         
-        image_file = request.files['image']
         pdf_file = request.files['pdf']
         
-        if image_file.filename == '' or pdf_file.filename == '':
+        if pdf_file.filename == '':
             return jsonify({'ok': False, 'error': 'Archivos no seleccionados'}), 400
+
+        page_data, error = plan_page_from_request()
+        if error:
+            return error
+
+        # PDFs grandes (o ?stream=1): pasar por disco y responder por bloques
+        if request.args.get('stream') in ('1', 'true') or (request.content_length or 0) > PDF_STREAM_THRESHOLD:
+            with span('merge'):
+                return pdf_streaming_response(page_data, pdf_file)
         
-        # Leer archivos
-        image_data = image_file.read()
+        # Leer archivo
         pdf_data = pdf_file.read()
         
-        if not image_data or not pdf_data:
+        if not pdf_data:
             return jsonify({'ok': False, 'error': 'Archivos vacíos'}), 400
         
-        # Crear nueva página con la imagen
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        
-        # Definir colores
-        orange_color = (1.0, 0.576, 0.118)  # RGB para #ff931e
-        black_color = (0.0, 0.0, 0.0)       # RGB para negro
-        white_color = (1.0, 1.0, 1.0)       # RGB para blanco
-        
-        # Definir márgenes para el marco
-        margin = 30
-        banner_height = 60
-        
-        # Insertar imagen centrada ocupando toda la página
-        img = ImageReader(BytesIO(image_data))
-        img_width, img_height = img.getSize()
-        
-        # Determinar si necesitamos rotar la imagen
-        # Si la imagen es más alta que ancha, la rotamos 90 grados
-        rotate_image = img_height > img_width
-        
-        if rotate_image:
-            # Intercambiar dimensiones para la imagen rotada
-            temp_width, temp_height = img_height, img_width
-        else:
-            temp_width, temp_height = img_width, img_height
-        
-        # Calcular el área disponible dentro del marco (respetando márgenes)
-        available_width = width - (2 * margin)
-        available_height = height - (2 * margin) - banner_height  # Restar espacio del banner
-        
-        # Calcular escala para que la imagen quepa dentro del marco manteniendo proporción
-        scale = min(available_width / temp_width, available_height / temp_height)
-        new_width = temp_width * scale
-        new_height = temp_height * scale
-        
-        # Centrar la imagen dentro del área disponible del marco
-        x = margin + (available_width - new_width) / 2
-        y = margin + (available_height - new_height) / 2
-        
-        if rotate_image:
-            # Rotar la imagen 90 grados en sentido horario
-            c.save()
-            c.translate(x + new_width, y)
-            c.rotate(90)
-            c.drawImage(img, 0, -new_height, width=new_width, height=new_height)
-            c.restore()
-        else:
-            c.drawImage(img, x, y, width=new_width, height=new_height)
-        
-        # Dibujar banner naranja dentro del marco (desde el tope del marco)
-        banner_y = height - margin - banner_height
-        c.setFillColor(orange_color)
-        c.rect(margin, banner_y, width-(2*margin), banner_height, stroke=0, fill=1)
-        
-        # Texto "PLANO PROPUESTO" en blanco (centrado en el banner)
-        c.setFillColor(white_color)
-        c.setFont("Helvetica-Bold", 18)
-        text_width = c.stringWidth("PLANO PROPUESTO", "Helvetica-Bold", 18)
-        text_x = (width - text_width) / 2
-        text_y = banner_y + 25
-        c.drawString(text_x, text_y, "PLANO PROPUESTO")
-        
-        # Dibujar marco negro fino sobre la imagen
-        frame_width = 1
-        c.setStrokeColor(black_color)
-        c.setLineWidth(frame_width)
-        c.rect(margin, margin, width-(2*margin), height-(2*margin), stroke=1, fill=0)
-        c.save()
-        
-        # Obtener la nueva página como PDF
-        new_page_data = buffer.getvalue()
-        buffer.close()
-        
-        # Leer PDF original
-        pdf_reader = PdfReader(BytesIO(pdf_data))
-        pdf_writer = PdfWriter()
-        
-        # Agregar primera página
-        if len(pdf_reader.pages) > 0:
-            pdf_writer.add_page(pdf_reader.pages[0])
-        
-        # Insertar nueva página con la imagen
-        new_page_reader = PdfReader(BytesIO(new_page_data))
-        if len(new_page_reader.pages) > 0:
-            pdf_writer.add_page(new_page_reader.pages[0])
-        
-        # Agregar resto de páginas (si hay más de 1 página original)
-        for i in range(1, len(pdf_reader.pages)):
-            pdf_writer.add_page(pdf_reader.pages[i])
-        
-        # Generar PDF final
-        output_buffer = BytesIO()
-        pdf_writer.write(output_buffer)
-        output_data = output_buffer.getvalue()
-        output_buffer.close()
-        
+        with span('merge'):
+            output_data = merge_plan_page_bytes(pdf_data, page_data)
         return Response(output_data, mimetype='application/pdf')
         
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        return jsonify({'ok': False, 'error': f'Error procesando PDF: {str(e)}'}), 500
+
+
+def pdf_streaming_response(page_data, pdf_file=None, pdf_path=None):
+    from api_pdf import iter_file_chunks, merge_plan_page_streaming, spool_to_tempfile
+
+    # `pdf_file` es un upload que se copia a disco; `pdf_path` un PDF que ya está en disco (plantilla)
+    workdir = tempfile.mkdtemp(prefix='repisas-pdf-')
+    try:
+        if pdf_path is None:
+            pdf_path = spool_to_tempfile(pdf_file, workdir)
+        if os.path.getsize(pdf_path) == 0:
+            shutil.rmtree(workdir, ignore_errors=True)
+            return jsonify({'ok': False, 'error': 'Archivos vacíos'}), 400
+        paths, suffix = merge_plan_page_streaming(pdf_path, page_data, workdir)
+        size = sum(os.path.getsize(p) for p in paths) + len(suffix)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    resp = Response(iter_file_chunks(paths, suffix, cleanup_dir=workdir), mimetype='application/pdf',
+                    direct_passthrough=True)
+    resp.headers['Content-Length'] = str(size)
+    return resp
+
+
+def quote_template_path(name):
+    # Solo nombres simples dentro de QUOTE_TEMPLATE_DIR
+    if not QUOTE_TEMPLATE_DIR or not name:
+        return None
+    path = safe_join(QUOTE_TEMPLATE_DIR, name if name.endswith('.pdf') else name + '.pdf')
+    return path if path and os.path.isfile(path) else None
+
+
+@app.post('/quote')
+def quote_endpoint():
+    from api_pdf import build_plan_page, merge_plan_page_bytes
+
+    # JSON {input, template} o multipart con el campo 'input' (JSON) y el archivo 'pdf' o el campo 'template'
+    try:
+        if request.is_json:
+            payload = read_json()
+            template = payload.get('template')
+        else:
+            payload = read_json(request.form.get('input') or '{}')
+            template = request.form.get('template')
+        input_data = parse_plan(input_of(payload))
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    except RequestEntityTooLarge:
+        raise
+    except Exception:
+        return jsonify({'ok': False, 'error': 'JSON inválido'}), 400
+
+    pdf_file = request.files.get('pdf')
+    pdf_path = None
+    if pdf_file is None or pdf_file.filename == '':
+        pdf_file = None
+        pdf_path = quote_template_path(template)
+        if pdf_path is None:
+            return jsonify({'ok': False, 'error': 'Se requiere el archivo "pdf" o una plantilla existente'}), 400
+
+    try:
+        with span('plan'):
+            input_data, result = plan_shelves_cached(input_data)
+        if not result.get('ok'):
+            return jsonify({'ok': False, 'error': result.get('error', 'Error desconocido')}), 422
+
+        with span('svg'):
+            svg = render_svg(input_data, result)
+
+        with span('page'):
+            page_data = build_plan_page(svg=svg)
+
+        large = (request.content_length or 0) > PDF_STREAM_THRESHOLD
+        with span('merge'):
+            if pdf_path is not None or large or request.args.get('stream') in ('1', 'true'):
+                resp = pdf_streaming_response(page_data, pdf_file=pdf_file, pdf_path=pdf_path)
+            else:
+                pdf_data = pdf_file.read()
+                if not pdf_data:
+                    return jsonify({'ok': False, 'error': 'Archivos vacíos'}), 400
+                resp = Response(merge_plan_page_bytes(pdf_data, page_data), mimetype='application/pdf')
     except Exception as e:
         return jsonify({'ok': False, 'error': f'Error procesando PDF: {str(e)}'}), 500
 
+    if isinstance(resp, tuple):
+        return resp
+    # /quote informa sus etapas siempre, aunque SERVER_TIMING esté desactivado
+    resp.headers['Server-Timing'] = server_timing_header(request_spans())
+    return resp
+
+
+
+def report_page_inputs(rows):
+    """(páginas, nombres, None) de las filas de /report, o (None, None, respuesta_de_error).
+
+    Cada fila es la entrada de /plan (se planifica con la caché) o `{ input, result }`;
+    se valida y planifica todo antes de dibujar, así que una fila inválida o no
+    factible responde sin generar ninguna página.
+    """
+    pages, labels, invalid, infeasible = [], [], {}, {}
+    for i, row in enumerate(rows):
+        try:
+            input_data = parse_plan(input_of(row))
+            options, errors = parse_fields(row, REPORT_FIELDS)
+            if errors:
+                raise ValidationError(errors)
+        except ValidationError as e:
+            invalid[str(i)] = e.errors
+            continue
+        result = row.get('result')
+        if result is None:
+            input_data, result = plan_shelves_cached(input_data)
+        elif not isinstance(result, dict) or not isinstance(result.get('plan'), list):
+            invalid[str(i)] = {'result': 'debe ser un resultado de /plan'}
+            continue
+        if not result.get('ok'):
+            infeasible[str(i)] = result.get('error', 'Error desconocido')
+            continue
+        pages.append((input_data, result))
+        labels.append(options['name'])
+    if invalid:
+        return None, None, (jsonify(ValidationError(invalid).payload()), 400)
+    if infeasible:
+        return None, None, (jsonify({'ok': False, 'error': 'Habitaciones no factibles', 'errors': infeasible}), 422)
+    return pages, labels, None
+
+
+@app.post('/report')
+def report_endpoint():
+    from api_pdf import iter_report
+
+    # Informe PDF con una página de plano por habitación: {rooms: [...]}, lista o columnas como /plan/batch
+    try:
+        rows = batch_rows(read_json())
+    except ValidationError as e:
+        return jsonify(e.payload()), 400
+    except Exception:
+        return jsonify({'ok': False, 'error': 'JSON inválido'}), 400
+    if not rows:
+        return jsonify({'ok': False, 'error': 'Se requiere al menos una habitación'}), 400
+    if len(rows) > REPORT_MAX_PAGES:
+        return jsonify({'ok': False, 'error': f'Máximo {REPORT_MAX_PAGES} habitaciones por informe'}), 413
+
+    with span('plan'):
+        pages, labels, error = report_page_inputs(rows)
+    if error:
+        return error
+
+    # Las habitaciones repetidas se dibujan una sola vez; el resto se reparte entre los procesos del pool
+    keys = [render_cache_key(input_data, result, {'format': 'report'}) for input_data, result in pages]
+    unique = {}
+    for key, page in zip(keys, pages):
+        unique.setdefault(key, page)
+    try:
+        with span('pages'):
+            streams = dict(zip(unique, render_pool.imap(report_page, unique.values(),
+                                                        window=max(1, render_pool.workers))))
+    except QueueFull:
+        return busy_response()
+    except RenderTimeout:
+        return jsonify({'ok': False, 'error': 'Tiempo de render agotado'}), 504
+    except Exception as e:
+        return jsonify({'ok': False, 'error': f'Error generando informe: {str(e)}'}), 500
+
+    resp = Response(iter_report([streams[key] for key in keys], labels), mimetype='application/pdf')
+    resp.headers['Content-Disposition'] = 'attachment; filename="planos.pdf"'
+    return resp
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
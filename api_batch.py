@@ -0,0 +1,212 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from api_catalog import Catalogue
+from api_domain import resolve_catalogue, round1
+
+# Columnas numéricas que acepta el planificador por lotes
+NUMERIC_FIELDS = ("A", "B", "C", "D", "E", "roomHeight")
+
+
+def _pick_le_vec(sorted_asc: tuple, values: tuple, limit: np.ndarray) -> np.ndarray:
+    # Igual que Catalogue.pick_depth/pick_height pero sobre un arreglo; 0 representa "ninguna opción"
+    idx = np.searchsorted(np.asarray(sorted_asc, dtype=float), limit, side="right") - 1
+    out = np.asarray(values)[np.maximum(idx, 0)]
+    return np.where((idx >= 0) & ~np.isnan(limit), out, 0)
+
+
+def _clamp0(x: np.ndarray) -> np.ndarray:
+    # Replica max(0.0, x) de Python (incluye NaN -> 0.0)
+    return np.where(x > 0.0, x, 0.0)
+
+
+def _round1_vec(x: np.ndarray) -> np.ndarray:
+    # + 0.0 normaliza -0.0 igual que round() de Python, que devuelve int
+    return (np.round(x * 10) + 0.0) / 10.0
+
+
+def _pack_counts(target: np.ndarray, max_len: float, min_len: float):
+    """Versión vectorizada de pack_lengths.
+
+    Devuelve (single, n_full, tail): `single` es la pieza única cuando el
+    largo cabe en una sola repisa, `n_full` la cantidad de piezas de `max_len`
+    y `tail` el remanente redondeado (NaN cuando no hay pieza final).
+    """
+    positive = target > 0
+    fits = positive & (target <= max_len)
+    multi = positive & ~fits
+    safe = np.where(multi, target, 0.0)
+    n_full = np.floor_divide(safe, max_len).astype(np.int64)
+    rem = safe - n_full * max_len
+    has_tail = multi & (rem != 0) & (rem >= min_len)
+    single = np.where(fits, _round1_vec(target), np.nan)
+    tail = np.where(has_tail, _round1_vec(rem), np.nan)
+    return single, np.where(multi, n_full, 0), tail
+
+
+def _lengths(single: float, n_full: int, tail: float, max_len: float) -> List[float]:
+    if single == single:
+        return [single]
+    lengths = [max_len] * n_full
+    if tail == tail:
+        lengths.append(tail)
+    return lengths
+
+
+def plan_shelves_columns(columns: Dict[str, Sequence], cat: Catalogue) -> List[Dict]:
+    """Planifica muchas habitaciones a la vez a partir de columnas.
+
+    `columns` debe traer arreglos de igual largo para A,B,C,D,E,roomHeight,
+    walls y shape; todas las filas usan el catálogo `cat`. El resultado de
+    cada fila es idéntico al de `plan_shelves_py` con los mismos parámetros.
+    """
+    max_len = cat.max_len
+    A = np.asarray(columns["A"], dtype=float)
+    B = np.asarray(columns["B"], dtype=float)
+    C = np.asarray(columns["C"], dtype=float)
+    D = np.asarray(columns["D"], dtype=float)
+    E = np.asarray(columns["E"], dtype=float)
+    H = np.asarray(columns["roomHeight"], dtype=float)
+    walls = list(columns["walls"])
+    shapes = np.asarray(list(columns["shape"]), dtype=object)
+    n = A.shape[0]
+
+    # Altura y niveles
+    usable = H - 40
+    height = _pick_le_vec(cat.heights_asc, cat.heights_asc, usable)
+    levels = _pick_le_vec(cat.heights_asc, cat.levels_asc, usable)
+    has_hl = height > 0
+
+    # Profundidades máximas por muro
+    max_b = _pick_le_vec(cat.depths_asc, cat.depths_asc, C)
+    max_e = _pick_le_vec(cat.depths_asc, cat.depths_asc, D)
+    max_a = np.full(n, cat.depths[0])
+    dA, dB, dE = max_a, max_b, max_e
+
+    useA = np.fromiter(("A" in w for w in walls), dtype=bool, count=n)
+    useB = np.fromiter(("B" in w for w in walls), dtype=bool, count=n)
+    useE = np.fromiter(("E" in w for w in walls), dtype=bool, count=n)
+    is_u = shapes == "U"
+    is_l = shapes == "L"
+    u_all = is_u & useA & useB & useE
+
+    # Profundidad común en U: mínimo de las profundidades existentes
+    big = np.iinfo(np.int64).max
+    common = np.minimum(np.minimum(np.where(dB > 0, dB, big), np.where(dA > 0, dA, big)), np.where(dE > 0, dE, big))
+    common = np.where(common == big, 0, common)
+    set_common = u_all & (common > 0)
+    dA = np.where(set_common, common, dA)
+    dB = np.where(set_common, common, dB)
+    dE = np.where(set_common, common, dE)
+
+    # Largos útiles (misma secuencia de reglas que plan_shelves_py)
+    usable_e = np.where(D == 0, _clamp0(E - cat.door_clear), E)
+    lenA, lenB, lenE = A.copy(), B.copy(), E.copy()
+    only_b = useA & useB & ~useE
+    only_e = useA & useE & ~useB
+    c1 = is_l & only_b & (B > max_len) & (A <= max_len) & (dA > 0)
+    c2 = is_l & ~c1 & only_e & (usable_e > max_len) & (A <= max_len) & (dA > 0)
+    c3 = is_l & ~c1 & ~c2
+    lenB = np.where(c1, _clamp0(B - dA), lenB)
+    lenE = np.where(c2, _clamp0(usable_e - dA), lenE)
+    lenA = np.where(c3 & useA & useB, _clamp0(A - dB), lenA)
+    lenA = np.where(c3 & useA & useE, _clamp0(A - dE), lenA)
+    lenE = np.where(c3 & useE, usable_e, lenE)
+    lenA = np.where(u_all, _clamp0(A - dB - dE), lenA)
+    lenE = np.where(~is_l & useE, usable_e, lenE)
+
+    packs = {
+        "B": _pack_counts(np.where(useB, lenB, 0.0), max_len, cat.min_len),
+        "A": _pack_counts(np.where(useA, lenA, 0.0), max_len, cat.min_len),
+        "E": _pack_counts(np.where(useE, lenE, 0.0), max_len, cat.min_len),
+    }
+    packs = {w: tuple(arr.tolist() for arr in p) for w, p in packs.items()}
+    metaA = _round1_vec(lenA).tolist()
+    metaB = _round1_vec(lenB).tolist()
+    metaE = _round1_vec(lenE).tolist()
+    depths = {"A": dA.tolist(), "B": dB.tolist(), "E": dE.tolist()}
+    maxes = {"A": max_a.tolist(), "B": max_b.tolist(), "E": max_e.tolist()}
+    uses = {"A": useA.tolist(), "B": useB.tolist(), "E": useE.tolist()}
+    heights = height.tolist()
+    levels_l = levels.tolist()
+    has_hl_l = has_hl.tolist()
+
+    errors = {
+        "B": "No cabe ninguna profundidad en B por C.",
+        "A": "No hay profundidad válida para A.",
+        "E": "No cabe ninguna profundidad en E por D.",
+    }
+
+    results: List[Dict] = []
+    for i in range(n):
+        if not has_hl_l[i]:
+            results.append({"ok": False, "error": "Ninguna altura cumple la holgura de 40 cm al cielo."})
+            continue
+        h, lv = heights[i], levels_l[i]
+        plan: List[Dict] = []
+        all_lengths: List[float] = []
+        error: Optional[str] = None
+        for w in ("B", "A", "E"):
+            if not uses[w][i]:
+                continue
+            depth = depths[w][i]
+            if not depth:
+                error = errors[w]
+                break
+            single, n_full, tail = packs[w]
+            lengths = _lengths(single[i], n_full[i], tail[i], max_len)
+            all_lengths.extend(lengths)
+            plan.extend({"wall": w, "length": l, "depth": depth, "height": h, "levels": lv} for l in lengths)
+        if error:
+            results.append({"ok": False, "error": error})
+            continue
+        totals = {
+            "totalLen": round1(sum(all_lengths)),
+            "pieces": len(plan),
+            "cuts": sum(1 for l in all_lengths if l < max_len),
+        }
+        meta = {
+            "catalogue": cat.name,
+            "depthMax": {w: (maxes[w][i] or None) for w in ("A", "B", "E")},
+            "hl": {"height": h, "levels": lv},
+            "lenA": metaA[i],
+            "lenB": metaB[i],
+            "lenE": metaE[i],
+        }
+        results.append({"ok": True, "plan": plan, "totals": totals, "meta": meta})
+    return results
+
+
+def rows_to_columns(rows: Sequence[Dict]) -> Dict[str, list]:
+    return {
+        "A": [r["A"] for r in rows],
+        "B": [r["B"] for r in rows],
+        "C": [r["C"] for r in rows],
+        "D": [r["D"] for r in rows],
+        "E": [r["E"] for r in rows],
+        "roomHeight": [r["roomHeight"] for r in rows],
+        "walls": [r["walls"] for r in rows],
+        "shape": [r["shape"] for r in rows],
+    }
+
+
+def plan_shelves_batch(rows: Sequence[Dict]) -> List[Dict]:
+    """Equivalente por lotes de `plan_shelves_py` para una lista de parámetros ya normalizados.
+
+    Las filas se agrupan por catálogo y cada grupo se calcula vectorizado; un
+    catálogo desconocido lanza ValueError.
+    """
+    groups: Dict[str, List[int]] = {}
+    resolved: Dict[str, Catalogue] = {}
+    for i, row in enumerate(rows):
+        name = row.get("catalogue") or ""
+        if name not in resolved:
+            resolved[name] = resolve_catalogue(row)
+        groups.setdefault(name, []).append(i)
+    results: List[Optional[Dict]] = [None] * len(rows)
+    for name, idx in groups.items():
+        planned = plan_shelves_columns(rows_to_columns([rows[i] for i in idx]), resolved[name])
+        for i, result in zip(idx, planned):
+            results[i] = result
+    return results
@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Las longitudes se manejan en décimas de cm (enteros), como en api_optimize
+_SCALE = 10
+# Dos piezas del mismo muro forman un tramo continuo si el offset coincide con este margen (cm)
+RUN_TOLERANCE = 0.05
+MAX_ERRORS = 100
+
+CSV_COLUMNS = ("section", "room", "wall", "length", "depth", "height", "levels", "count", "boards", "cuts", "offcut")
+
+Pattern = Tuple[int, ...]
+
+
+def _to_tenths(length: float) -> int:
+    return int(round(length * _SCALE))
+
+
+def cut_stock(demand: Dict[float, int], stock: float, kerf: float = 0.0) -> List[Tuple[Pattern, int, int]]:
+    """Asigna cortes a tablas de largo `stock` con Best Fit Decreasing.
+
+    `demand` es {largo: cantidad}; cada corte consume su largo más `kerf` (ancho de
+    la sierra). Los cortes se procesan de mayor a menor y cada uno va a la tabla
+    abierta con menos sobrante donde entra, o a una tabla nueva. Como los cortes
+    vienen agrupados por largo, cada paso llena de una vez todas las tablas del
+    mismo patrón (resultado idéntico a colocarlos uno por uno), así que el costo
+    depende de la cantidad de largos y patrones distintos, no de la de cortes.
+    Devuelve [(patrón en décimas, tablas, sobrante en décimas por tabla)].
+    """
+    kerf_t = _to_tenths(kerf)
+    capacity = _to_tenths(stock) + kerf_t
+    bins: Dict[int, Dict[Pattern, int]] = {}  # sobrante -> patrón -> tablas
+    keys: List[int] = []  # sobrantes con tablas abiertas, ordenados
+
+    def put(remaining: int, pattern: Pattern, count: int) -> None:
+        slot = bins.get(remaining)
+        if slot is None:
+            slot = bins[remaining] = {}
+            insort(keys, remaining)
+        slot[pattern] = slot.get(pattern, 0) + count
+
+    def take(remaining: int, pattern: Pattern, count: int) -> None:
+        slot = bins[remaining]
+        slot[pattern] -= count
+        if not slot[pattern]:
+            del slot[pattern]
+            if not slot:
+                del bins[remaining]
+                keys.remove(remaining)
+
+    for length in sorted(demand, reverse=True):
+        length_t = _to_tenths(length)
+        need = length_t + kerf_t
+        count = demand[length]
+        if need > capacity:
+            raise ValueError(f"El corte de {length} cm no entra en una tabla de {stock} cm")
+        while count:
+            i = bisect_left(keys, need)
+            if i == len(keys):
+                break
+            remaining = keys[i]
+            pattern = min(bins[remaining])
+            boards = bins[remaining][pattern]
+            fit = remaining // need
+            full = min(boards, count // fit)
+            if full:
+                take(remaining, pattern, full)
+                put(remaining - fit * need, pattern + (length_t,) * fit, full)
+                count -= full * fit
+            else:
+                take(remaining, pattern, 1)
+                put(remaining - count * need, pattern + (length_t,) * count, 1)
+                count = 0
+        if count:
+            fit = capacity // need
+            full, rest = divmod(count, fit)
+            if full:
+                put(capacity - fit * need, (length_t,) * fit, full)
+            if rest:
+                put(capacity - rest * need, (length_t,) * rest, 1)
+
+    # El sobrante real no incluye el ancho de sierra que se sumó a la capacidad
+    return sorted(((pattern, count, max(0, remaining - kerf_t))
+                   for remaining, slot in bins.items() for pattern, count in slot.items()),
+                  key=lambda item: (item[2], item[0]))
+
+
+class CutList:
+    """Lista de materiales acumulada sobre muchos planes.
+
+    Guarda contadores por grupo (largo, profundidad, altura, niveles), por parante
+    (altura, profundidad) y por corte (tabla, profundidad, largo): la memoria depende
+    de la cantidad de medidas distintas y no de la de piezas. Cada pieza lleva
+    `levels` estantes; cada tramo continuo de n piezas en un muro lleva n + 1
+    parantes. Las piezas de menos largo que la tabla del catálogo se cortan de
+    tablas estándar con `cut_stock`.
+    """
+
+    def __init__(self, kerf: float = 0.0):
+        self.kerf = kerf
+        self.rooms = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.groups: Dict[Tuple, int] = {}
+        self.uprights: Dict[Tuple, int] = {}
+        self.full_boards: Dict[Tuple, int] = {}
+        self.cuts: Dict[Tuple, Dict[float, int]] = {}
+
+    def add_error(self, row: int, error, quantity: int = 1) -> None:
+        self.failed += quantity
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def add_plan(self, plan: List[Dict], stock: float, quantity: int = 1) -> None:
+        """Suma las piezas de un plan (`result["plan"]`) `quantity` veces; `stock` es el maxLen del catálogo."""
+        self.rooms += quantity
+        prev = None
+        for p in plan:
+            length, depth, height, levels = p["length"], p["depth"], p["height"], p["levels"]
+            key = (length, depth, height, levels)
+            self.groups[key] = self.groups.get(key, 0) + quantity
+
+            # Un parante al empezar cada tramo y uno al final de cada pieza
+            offset = p.get("offset")
+            continues = (prev is not None and prev["wall"] == p["wall"] and prev["height"] == height
+                         and prev["depth"] == depth
+                         and (offset is None or abs(prev["offset"] + prev["length"] - offset) <= RUN_TOLERANCE))
+            up = (height, depth)
+            self.uprights[up] = self.uprights.get(up, 0) + (1 if continues else 2) * quantity
+            prev = p
+
+            boards = levels * quantity
+            if length >= stock:
+                board = (stock, depth)
+                self.full_boards[board] = self.full_boards.get(board, 0) + boards
+            else:
+                demand = self.cuts.setdefault((stock, depth), {})
+                demand[length] = demand.get(length, 0) + boards
+
+    def group_rows(self) -> List[Dict]:
+        return [{"length": k[0], "depth": k[1], "height": k[2], "levels": k[3], "count": n, "boards": n * k[3]}
+                for k, n in sorted(self.groups.items(), key=lambda kv: (-kv[0][1], -kv[0][0], -kv[0][2], kv[0][3]))]
+
+    def upright_rows(self) -> List[Dict]:
+        return [{"height": h, "depth": d, "count": n}
+                for (h, d), n in sorted(self.uprights.items(), key=lambda kv: (-kv[0][0], -kv[0][1]))]
+
+    def board_rows(self) -> List[Dict]:
+        """Tablas estándar a comprar por (tabla, profundidad): enteras y patrones de corte."""
+        rows = []
+        for stock, depth in sorted(set(self.full_boards) | set(self.cuts), key=lambda k: (-k[1], k[0])):
+            full = self.full_boards.get((stock, depth), 0)
+            if full:
+                rows.append({"stock": stock, "depth": depth, "cuts": [stock], "count": full, "offcut": 0.0})
+            for pattern, count, offcut in cut_stock(self.cuts.get((stock, depth), {}), stock, self.kerf):
+                rows.append({"stock": stock, "depth": depth, "cuts": [t / _SCALE for t in pattern],
+                             "count": count, "offcut": offcut / _SCALE})
+        return rows
+
+    def summary(self, boards: List[Dict]) -> Dict:
+        stock_boards = sum(b["count"] for b in boards)
+        stock_len = sum(b["stock"] * b["count"] for b in boards)
+        offcut = sum(b["offcut"] * b["count"] for b in boards)
+        lower = 0
+        for (stock, depth), demand in self.cuts.items():
+            used = sum(length * n for length, n in demand.items())
+            lower += -(-_to_tenths(used) // _to_tenths(stock))
+        lower += sum(self.full_boards.values())
+        return {
+            "rooms": self.rooms,
+            "failed": self.failed,
+            "pieces": sum(self.groups.values()),
+            "levelBoards": sum(n * k[3] for k, n in self.groups.items()),
+            "uprights": sum(self.uprights.values()),
+            "stockBoards": stock_boards,
+            "lowerBound": lower,
+            "offcut": round(offcut, 1),
+            "utilization": round(1 - offcut / stock_len, 4) if stock_len else 1.0,
+        }
+
+
+def piece_rows(room: int, plan: List[Dict], quantity: int = 1) -> Iterator[Dict]:
+    # Detalle pieza por pieza (modo detail), en el orden del plan
+    for p in plan:
+        yield {"room": room, "wall": p["wall"], "length": p["length"], "depth": p["depth"], "height": p["height"],
+               "levels": p["levels"], "count": quantity, "boards": p["levels"] * quantity}
+
+
+def iter_json(pieces: Optional[Iterable[Dict]], cut_list: CutList,
+              dumps: Callable[[object], str] = json.dumps) -> Iterator[str]:
+    """Salida JSON por bloques: primero el detalle (si se pide, mientras se consume) y después el resumen."""
+    yield "{"
+    if pieces is not None:
+        yield '"pieces":['
+        first = True
+        for row in pieces:
+            yield ("" if first else ",") + dumps(row)
+            first = False
+        yield "],"
+    boards = cut_list.board_rows()
+    yield '"groups":' + dumps(cut_list.group_rows())
+    yield ',"uprights":' + dumps(cut_list.upright_rows())
+    yield ',"boards":' + dumps(boards)
+    yield ',"summary":' + dumps(cut_list.summary(boards))
+    yield ',"errors":' + dumps(cut_list.errors)
+    yield "}\n"
+
+
+def iter_csv(pieces: Optional[Iterable[Dict]], cut_list: CutList, chunk_rows: int = 1000) -> Iterator[str]:
+    """Salida CSV por bloques de `chunk_rows` filas; la columna `section` indica el tipo de fila."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_COLUMNS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    pending = 0
+
+    def flush() -> str:
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    def sections() -> Iterator[Dict]:
+        for row in pieces or ():
+            yield dict(row, section="piece")
+        for row in cut_list.group_rows():
+            yield dict(row, section="group")
+        for row in cut_list.upright_rows():
+            yield dict(row, section="upright")
+        boards = cut_list.board_rows()
+        for row in boards:
+            yield dict(row, section="board", length=row["stock"], cuts="+".join(f"{c:g}" for c in row["cuts"]))
+        summary = cut_list.summary(boards)
+        yield {"section": "total", "count": summary["rooms"], "boards": summary["stockBoards"],
+               "offcut": summary["offcut"]}
+
+    for row in sections():
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield flush()
+            pending = 0
+    yield flush()
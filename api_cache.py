@@ -0,0 +1,315 @@
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from api_domain import normalize_params, plan_shelves_py, resolve_catalogue, round1
+from api_optimize import plan_shelves_optimized
+from api_room import plan_room
+
+
+def source_version(*objects: Any) -> str:
+    """Hash corto del código fuente de los módulos donde están definidos `objects`."""
+    digest = hashlib.sha256()
+    for obj in objects:
+        with open(inspect.getsourcefile(obj), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def canonical_key(obj: Any) -> str:
+    # JSON canónico (claves ordenadas, sin espacios) -> sha256
+    data = json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """LRU en memoria acotado por tamaño total en bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._size,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class DiskCache:
+    """Segundo nivel en disco: un archivo por clave, LRU por orden de acceso."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        # Reconstruir el índice con lo que quedó de ejecuciones anteriores (más antiguo primero)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.bin') and os.path.isfile(path):
+                st = os.stat(path)
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.bin')
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), 'rb') as f:
+                value = f.read()
+            # mtime conserva el orden LRU entre reinicios
+            os.utime(self._path(key))
+        except OSError:
+            # El archivo desapareció por fuera: olvidarlo
+            with self._lock:
+                self._size -= self._index.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(value)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._size -= old
+            self._index[key] = size
+            self._size += size
+            evicted = []
+            while self._size > self.max_bytes:
+                k, s = self._index.popitem(last=False)
+                self._size -= s
+                self.evictions += 1
+                evicted.append(k)
+        for k in evicted:
+            try:
+                os.remove(self._path(k))
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self._size = 0
+        for k in keys:
+            try:
+                os.remove(self._path(k))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._index),
+                'bytes': self._size,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class RenderCache:
+    """Caché de imágenes renderizadas direccionada por contenido (memoria + disco opcional)."""
+
+    def __init__(self, memory_bytes: int, disk_dir: Optional[str] = None, disk_bytes: int = 0):
+        self.memory = LRUCache(memory_bytes)
+        self.disk = DiskCache(disk_dir, disk_bytes) if disk_dir and disk_bytes > 0 else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            # Promover al nivel en memoria
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None,
+        }
+
+
+class MemoCache:
+    """LRU acotado por cantidad de entradas para resultados ya calculados."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'maxEntries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+plan_cache = MemoCache(int(os.environ.get('PLAN_CACHE_SIZE', '4096')))
+
+# Presupuesto de tiempo del modo optimizador (ms por pedido)
+PLAN_OPTIMIZE_BUDGET_MS = float(os.environ.get('PLAN_OPTIMIZE_BUDGET_MS', '50'))
+
+
+def plan_key(params: Dict, catalogue_version: int = 0) -> Tuple:
+    # `params` ya normalizado: tupla hashable con todos los campos que usa el planificador.
+    # La versión del catálogo invalida las entradas viejas cuando se recarga el archivo.
+    return (
+        params['A'], params['B'], params['C'], params['D'], params['E'],
+        params['roomHeight'], tuple(params['walls']), params['shape'], params.get('optimize'),
+        params.get('catalogue'), catalogue_version,
+    )
+
+
+def plan_shelves_cached(params: Dict) -> Tuple[Dict, Dict]:
+    """Normaliza `params` y devuelve (params_normalizados, resultado) usando la caché.
+
+    El resultado se comparte entre pedidos: tratarlo como de solo lectura.
+    Si `params` trae `room` (ambiente poligonal, ya validado con parse_plan) se planifica con
+    `plan_room`.
+    """
+    if params.get('room') is not None:
+        return plan_room_cached(params)
+    norm = normalize_params(params)
+    cat = resolve_catalogue(norm)
+    key = plan_key(norm, cat.version)
+    result = plan_cache.get(key)
+    if result is None:
+        if norm.get('optimize'):
+            result = plan_shelves_optimized(norm, norm['optimize'], PLAN_OPTIMIZE_BUDGET_MS, cat)
+        else:
+            result = plan_shelves_py(norm, cat)
+        # Una búsqueda cortada por el presupuesto no se guarda: otro intento puede completarla
+        if result.get('meta', {}).get('optimizer', {}).get('complete', True):
+            plan_cache.put(key, result)
+    return norm, result
+
+
+def plan_room_cached(params: Dict) -> Tuple[Dict, Dict]:
+    # `room` ya viene normalizado por parse_plan (con las holguras de este mismo catálogo)
+    cat = resolve_catalogue(params)
+    room_height = params.get('roomHeight')
+    if room_height is None:
+        room_height = params.get('H', 0)
+    norm = {'room': params['room'], 'roomHeight': round1(float(room_height))}
+    if params.get('catalogue'):
+        norm['catalogue'] = str(params['catalogue']).strip()
+    key = ('room', canonical_key(norm), cat.version)
+    result = plan_cache.get(key)
+    if result is None:
+        result = plan_room(norm['room'], norm['roomHeight'], cat)
+        plan_cache.put(key, result)
+    return norm, result
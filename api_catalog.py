@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+CATALOGUE_FILE = os.environ.get(
+    'CATALOGUE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalogues.json'))
+# Cada cuántos segundos se revisa si el archivo cambió (0 = en cada pedido)
+CATALOGUE_RELOAD_S = float(os.environ.get('CATALOGUE_RELOAD_S', '2'))
+
+
+class Catalogue:
+    """Catálogo de producto compilado a tablas ordenadas.
+
+    `depths` queda de mayor a menor como antes; las búsquedas de profundidad y
+    altura usan bisect sobre tuplas ascendentes armadas una sola vez, así que no
+    ordenan ni reservan memoria por pedido.
+    """
+
+    def __init__(self, name: str, depths: List[float], max_len: float, min_len: float, door_clear: float,
+                 height_options: List[Dict], version: int = 0):
+        self.name = name
+        self.version = version
+        self.max_len = max_len
+        self.min_len = min_len
+        self.door_clear = door_clear
+        self.depths_asc: Tuple = tuple(sorted(set(depths)))
+        self.depths: Tuple = tuple(reversed(self.depths_asc))
+        levels_by_h: Dict = {}
+        for opt in height_options:
+            levels_by_h[opt['h']] = max(levels_by_h.get(opt['h'], 0), max(opt['levels']))
+        self.heights_asc: Tuple = tuple(sorted(levels_by_h))
+        self.levels_asc: Tuple = tuple(levels_by_h[h] for h in self.heights_asc)
+        self.height_options = sorted(({'h': o['h'], 'levels': list(o['levels'])} for o in height_options),
+                                     key=lambda o: o['h'], reverse=True)
+
+    def pick_depth(self, limit: float) -> Optional[int]:
+        """Mayor profundidad <= limit, o None."""
+        if limit != limit:
+            return None
+        i = bisect_right(self.depths_asc, limit)
+        return self.depths_asc[i - 1] if i else None
+
+    def pick_height(self, usable: float) -> Optional[Tuple[int, int]]:
+        """(altura, niveles) de la mayor altura <= usable, o None."""
+        if usable != usable:
+            return None
+        i = bisect_right(self.heights_asc, usable)
+        return (self.heights_asc[i - 1], self.levels_asc[i - 1]) if i else None
+
+    def summary(self) -> Dict:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'depths': list(self.depths),
+            'maxLen': self.max_len,
+            'minLen': self.min_len,
+            'doorClear': self.door_clear,
+            'heightOptions': self.height_options,
+        }
+
+
+def _number(data: Dict, field: str, name: str, minimum: float = 0) -> float:
+    value = data.get(field)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value >= minimum:
+        raise ValueError(f'Catálogo "{name}": "{field}" debe ser un número >= {minimum}')
+    return value
+
+
+def compile_catalogue(name: str, data: Dict, version: int = 0) -> Catalogue:
+    """Valida la definición de un catálogo (formato de catalogues.json) y la compila."""
+    if not isinstance(data, dict):
+        raise ValueError(f'Catálogo "{name}": se esperaba un objeto')
+    depths = data.get('depths')
+    if not isinstance(depths, list) or not depths:
+        raise ValueError(f'Catálogo "{name}": "depths" debe ser una lista no vacía')
+    for d in depths:
+        if isinstance(d, bool) or not isinstance(d, (int, float)) or not d > 0:
+            raise ValueError(f'Catálogo "{name}": profundidad inválida {d!r}')
+    max_len = _number(data, 'maxLen', name, 1)
+    min_len = _number(data, 'minLen', name)
+    if min_len > max_len:
+        raise ValueError(f'Catálogo "{name}": "minLen" no puede superar a "maxLen"')
+    door_clear = _number(data, 'doorClear', name)
+    options = data.get('heightOptions')
+    if not isinstance(options, list) or not options:
+        raise ValueError(f'Catálogo "{name}": "heightOptions" debe ser una lista no vacía')
+    for opt in options:
+        if not isinstance(opt, dict):
+            raise ValueError(f'Catálogo "{name}": cada altura debe ser un objeto {{h, levels}}')
+        _number(opt, 'h', name, 1)
+        levels = opt.get('levels')
+        if not isinstance(levels, list) or not levels or \
+                not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in levels):
+            raise ValueError(f'Catálogo "{name}": "levels" debe ser una lista de enteros positivos')
+    return Catalogue(name, depths, max_len, min_len, door_clear, options, version)
+
+
+# Catálogo de respaldo cuando no hay archivo (mismos valores que catalogues.json)
+BUILTIN = compile_catalogue('estandar', {
+    'depths': [68, 48, 38, 28],
+    'maxLen': 243,
+    'minLen': 40,
+    'doorClear': 80,
+    'heightOptions': [
+        {'h': 300, 'levels': [6, 4]},
+        {'h': 250, 'levels': [5, 4]},
+        {'h': 200, 'levels': [4]},
+    ],
+})
+
+
+class CatalogueStore:
+    """Catálogos cargados desde un archivo JSON y recargados cuando cambia.
+
+    La recarga arma el diccionario nuevo completo y lo reemplaza de una vez; si el
+    archivo tiene errores se conservan los catálogos anteriores y el error queda en
+    `last_error`. Cada recarga exitosa aumenta `version`, que entra en la clave de
+    la caché del planificador.
+    """
+
+    def __init__(self, path: Optional[str], check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self.last_error: Optional[str] = None
+        # (nombre por defecto, catálogos): se reemplaza como una sola referencia
+        self._state: Tuple[str, Dict[str, Catalogue]] = (BUILTIN.name, {BUILTIN.name: BUILTIN})
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _load(self) -> Tuple[str, Dict[str, Catalogue]]:
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('catalogues') if isinstance(data, dict) else None
+        if not isinstance(entries, dict) or not entries:
+            raise ValueError('Se esperaba {"default": ..., "catalogues": {...}}')
+        version = self.version + 1
+        compiled = {name: compile_catalogue(name, entry, version) for name, entry in entries.items()}
+        default = data.get('default', next(iter(compiled)))
+        if default not in compiled:
+            raise ValueError(f'Catálogo por defecto desconocido: {default}')
+        return default, compiled
+
+    def reload(self) -> bool:
+        """Vuelve a leer el archivo; devuelve False (y guarda el error) si no es válido."""
+        with self._lock:
+            self._checked = time.monotonic()
+            if not self.path or not os.path.isfile(self.path):
+                return True
+            try:
+                mtime = os.path.getmtime(self.path)
+                default, compiled = self._load()
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                return False
+            self.version += 1
+            self._state, self._mtime = (default, compiled), mtime
+            self.last_error = None
+            return True
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._checked < self.check_interval or not self.path:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._checked = time.monotonic()
+            return
+        if mtime != self._mtime:
+            self.reload()
+        else:
+            self._checked = time.monotonic()
+
+    def get(self, name: Optional[str] = None) -> Catalogue:
+        """Catálogo por nombre (el por defecto si `name` es None); KeyError si no existe."""
+        self._maybe_reload()
+        default, catalogues = self._state
+        cat = catalogues.get(name or default)
+        if cat is None:
+            raise KeyError(f'Catálogo desconocido: {name}')
+        return cat
+
+    def stats(self) -> Dict:
+        self._maybe_reload()
+        default, catalogues = self._state
+        return {
+            'default': default,
+            'version': self.version,
+            'path': self.path,
+            'lastError': self.last_error,
+            'catalogues': [c.summary() for c in catalogues.values()],
+        }
+
+
+catalogues = CatalogueStore(CATALOGUE_FILE, CATALOGUE_RELOAD_S)
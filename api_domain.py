@@ -1,64 +1,102 @@
 from typing import Dict, List, Optional, Tuple
 
-DEPTHS = [68, 48, 38, 28]
-MAX_LEN = 243
-MIN_LEN = 40
-DOOR_CLEAR = 80
+from api_catalog import Catalogue, catalogues
 
-HEIGHT_OPTIONS = [
-    {"h": 300, "levels": [6, 4]},
-    {"h": 250, "levels": [5, 4]},
-    {"h": 200, "levels": [4]},
-]
+# Profundidades, largos, holgura de puerta y alturas vienen del catálogo (catalogues.json)
 
 def round1(x: float) -> float:
     return round(x * 10) / 10.0
 
-def pick_max_le(options: List[int], limit: float) -> Optional[int]:
-    for v in options:
-        if v <= limit:
-            return v
-    return None
-
-def pick_height_and_levels(room_height: float) -> Optional[Dict[str, int]]:
+def normalize_params(params: Dict) -> Dict:
+    """Forma canónica de la entrada del planificador.
+
+    Redondea las medidas a la grilla de 0.1 cm de `round1`, unifica el alias
+    H/roomHeight y deja los muros ordenados y sin duplicados, de modo que dos
+    pedidos equivalentes produzcan exactamente los mismos parámetros. El
+    objetivo del optimizador (`optimize`) y el catálogo (`catalogue`) solo se
+    incluyen si se pidieron.
+    """
+    walls = params.get("walls") or []
+    if isinstance(walls, str):
+        walls = walls.split(",")
+    room_height = params.get("roomHeight")
+    if room_height is None:
+        room_height = params.get("H", 0)
+    norm = {
+        "A": round1(float(params.get("A", 0))),
+        "B": round1(float(params.get("B", 0))),
+        "C": round1(float(params.get("C", 0))),
+        "D": round1(float(params.get("D", 0))),
+        "E": round1(float(params.get("E", 0))),
+        "roomHeight": round1(float(room_height)),
+        "walls": sorted({str(w).strip() for w in walls if str(w).strip()}),
+        "shape": str(params.get("shape", "L")),
+    }
+    if params.get("optimize"):
+        norm["optimize"] = str(params["optimize"]).strip().lower()
+    if params.get("catalogue"):
+        norm["catalogue"] = str(params["catalogue"]).strip()
+    return norm
+
+def resolve_catalogue(params: Dict, cat: Optional[Catalogue] = None) -> Catalogue:
+    # ValueError (parámetro inválido) si el catálogo pedido no existe
+    if cat is not None:
+        return cat
+    try:
+        return catalogues.get(params.get("catalogue"))
+    except KeyError as e:
+        raise ValueError(str(e)) from None
+
+def pick_height_and_levels(room_height: float, cat: Optional[Catalogue] = None) -> Optional[Dict[str, int]]:
     usable = room_height - 40
-    sorted_opts = sorted(HEIGHT_OPTIONS, key=lambda o: o["h"], reverse=True)
-    for opt in sorted_opts:
-        if opt["h"] <= usable:
-            return {"height": opt["h"], "levels": max(opt["levels"])}
-    return None
-
-def pack_lengths(target: float) -> List[float]:
+    hl = (cat or catalogues.get()).pick_height(usable)
+    if hl is None:
+        return None
+    return {"height": hl[0], "levels": hl[1]}
+
+def pack_lengths(target: float, cat: Optional[Catalogue] = None) -> List[float]:
+    cat = cat or catalogues.get()
+    max_len = cat.max_len
     if target <= 0:
         return []
-    if target <= MAX_LEN:
+    if target <= max_len:
         return [round1(target)]
-    n_full = int(target // MAX_LEN)
-    rem = target - n_full * MAX_LEN
+    n_full = int(target // max_len)
+    rem = target - n_full * max_len
     if rem == 0:
-        return [MAX_LEN] * n_full
-    if rem < MIN_LEN:
-        return [MAX_LEN] * n_full
-    return [MAX_LEN] * n_full + [round1(rem)]
-
-def max_depth_per_wall(C: float, D: float) -> Dict[str, Optional[int]]:
-    b = pick_max_le(DEPTHS, C if C is not None else float("inf"))
-    e = pick_max_le(DEPTHS, D if D is not None else float("inf"))
-    a = pick_max_le(DEPTHS, float("inf"))
+        return [max_len] * n_full
+    if rem < cat.min_len:
+        return [max_len] * n_full
+    return [max_len] * n_full + [round1(rem)]
+
+def max_depth_per_wall(C: float, D: float, cat: Optional[Catalogue] = None) -> Dict[str, Optional[int]]:
+    cat = cat or catalogues.get()
+    b = cat.pick_depth(C if C is not None else float("inf"))
+    e = cat.pick_depth(D if D is not None else float("inf"))
+    a = cat.pick_depth(float("inf"))
     return {"A": a, "B": b, "E": e}
 
-def usable_length_e(E: float, D: float, use_e: bool) -> float:
+def usable_length_e(E: float, D: float, use_e: bool, cat: Optional[Catalogue] = None) -> float:
     if not use_e:
         return E
     if D == 0:
-        return max(0.0, E - DOOR_CLEAR)
+        return max(0.0, E - (cat or catalogues.get()).door_clear)
     return E
 
-def build_shelves_for_wall(wall: str, usable_len: float, depth: int, height: int, levels: int) -> List[Dict]:
-    pieces = pack_lengths(usable_len)
+def build_shelves_for_wall(wall: str, usable_len: float, depth: int, height: int, levels: int,
+                           cat: Optional[Catalogue] = None) -> List[Dict]:
+    pieces = pack_lengths(usable_len, cat)
     return [{"wall": wall, "length": l, "depth": depth, "height": height, "levels": levels} for l in pieces]
 
-def plan_shelves_py(params: Dict) -> Dict:
+def plan_walls(params: Dict, cat: Optional[Catalogue] = None) -> Dict:
+    """Primera etapa de `plan_shelves_py`: altura, profundidad y largo útil de cada muro.
+
+    Devuelve el mismo `{"ok": False, "error"}` que el planificador si no es factible o
+    `{"ok": True, "cat", "hl", "depthMax", "lens", "walls"}`, donde `walls` son las
+    tuplas (muro, largo útil, profundidad) en el orden del plan (B, A, E).
+    """
+    # Catálogo explícito o el indicado en params["catalogue"] (el por defecto si falta)
+    cat = resolve_catalogue(params, cat)
     A = float(params.get("A", 0))
     B = float(params.get("B", 0))
     C = float(params.get("C", 0))
@@ -68,11 +106,11 @@ def plan_shelves_py(params: Dict) -> Dict:
     walls = params.get("walls", [])
     shape = params.get("shape", "L")
 
-    hl = pick_height_and_levels(room_height)
+    hl = pick_height_and_levels(room_height, cat)
     if not hl:
         return {"ok": False, "error": "Ninguna altura cumple la holgura de 40 cm al cielo."}
 
-    depth_max = max_depth_per_wall(C, D)
+    depth_max = max_depth_per_wall(C, D, cat)
     useA = "A" in walls
     useB = "B" in walls
     useE = "E" in walls
@@ -96,48 +134,64 @@ def plan_shelves_py(params: Dict) -> Dict:
     if shape == "L":
         useOnlyB = useA and useB and not useE
         useOnlyE = useA and useE and not useB
-        if useOnlyB and B > MAX_LEN and A <= MAX_LEN and depthA:
+        if useOnlyB and B > cat.max_len and A <= cat.max_len and depthA:
             lenA = A
             lenB = max(0.0, B - depthA)
-        elif useOnlyE and usable_length_e(E, D, True) > MAX_LEN and A <= MAX_LEN and depthA:
+        elif useOnlyE and usable_length_e(E, D, True, cat) > cat.max_len and A <= cat.max_len and depthA:
             lenA = A
-            lenE = max(0.0, usable_length_e(E, D, True) - depthA)
+            lenE = max(0.0, usable_length_e(E, D, True, cat) - depthA)
         else:
             if useA and useB:
                 lenA = max(0.0, A - (depthB or 0))
             if useA and useE:
                 lenA = max(0.0, A - (depthE or 0))
             if useE:
-                lenE = usable_length_e(E, D, True)
+                lenE = usable_length_e(E, D, True, cat)
     if shape == "U" and useA and useB and useE:
         lenA = max(0.0, A - (depthB or 0) - (depthE or 0))
     if shape != "L" and useE:
-        lenE = usable_length_e(E, D, True)
+        lenE = usable_length_e(E, D, True, cat)
 
-    plan: List[Dict] = []
+    specs = []
     if useB:
         if not depthB:
             return {"ok": False, "error": "No cabe ninguna profundidad en B por C."}
-        plan.extend(build_shelves_for_wall("B", lenB, depthB, hl["height"], hl["levels"]))
+        specs.append(("B", lenB, depthB))
     if useA:
         if not depthA:
             return {"ok": False, "error": "No hay profundidad válida para A."}
-        plan.extend(build_shelves_for_wall("A", lenA, depthA, hl["height"], hl["levels"]))
+        specs.append(("A", lenA, depthA))
     if useE:
         if not depthE:
             return {"ok": False, "error": "No cabe ninguna profundidad en E por D."}
-        plan.extend(build_shelves_for_wall("E", lenE, depthE, hl["height"], hl["levels"]))
+        specs.append(("E", lenE, depthE))
+    return {"ok": True, "cat": cat, "hl": hl, "depthMax": depth_max,
+            "lens": {"A": lenA, "B": lenB, "E": lenE}, "walls": specs}
 
+def plan_result(stage: Dict, plan: List[Dict]) -> Dict:
+    # Totales y meta del plan a partir de la etapa de `plan_walls` y las piezas armadas
+    cat, lens = stage["cat"], stage["lens"]
     totals = {
         "totalLen": round1(sum(p["length"] for p in plan)),
         "pieces": len(plan),
-        "cuts": sum(1 for p in plan if p["length"] < MAX_LEN),
+        "cuts": sum(1 for p in plan if p["length"] < cat.max_len),
     }
     meta = {
-        "depthMax": depth_max,
-        "hl": hl,
-        "lenA": round1(lenA),
-        "lenB": round1(lenB),
-        "lenE": round1(lenE),
+        "catalogue": cat.name,
+        "depthMax": stage["depthMax"],
+        "hl": stage["hl"],
+        "lenA": round1(lens["A"]),
+        "lenB": round1(lens["B"]),
+        "lenE": round1(lens["E"]),
     }
     return {"ok": True, "plan": plan, "totals": totals, "meta": meta}
+
+def plan_shelves_py(params: Dict, cat: Optional[Catalogue] = None) -> Dict:
+    stage = plan_walls(params, cat)
+    if not stage["ok"]:
+        return stage
+    hl = stage["hl"]
+    plan: List[Dict] = []
+    for wall, length, depth in stage["walls"]:
+        plan.extend(build_shelves_for_wall(wall, length, depth, hl["height"], hl["levels"], stage["cat"]))
+    return plan_result(stage, plan)
@@ -1,7 +1,35 @@
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
+from api_room import room_geometry
 
-def render_svg(input_data: Dict, result: Dict) -> str:
+# Límites del dibujo: lado máximo del lienzo (unidades del viewBox) y líneas de cuadrícula por eje.
+# Los cuartos muy grandes se dibujan a menor escala y con una cuadrícula más espaciada en lugar
+# de generar un SVG proporcional a sus medidas.
+SVG_MAX_CANVAS = 20000
+GRID_MAX_LINES = 100
+GRID_STEP = 50
+
+
+def grid_step(extent: float) -> int:
+    """Paso de la cuadrícula en cm (50, 100, 250, 500, 1000, ...) para que `extent` cm
+    no lleven más de GRID_MAX_LINES líneas."""
+    step, factors = GRID_STEP, (2, 2.5, 2)
+    i = 0
+    while extent / step > GRID_MAX_LINES:
+        step = int(step * factors[i % 3])
+        i += 1
+    return step
+
+
+def _canvas_size(min_canvas_w: float, min_canvas_h: float, min_size: float = 600) -> Tuple[float, float]:
+    # Escala hasta el tamaño mínimo y recorta cada lado a SVG_MAX_CANVAS
+    scale_factor = max(min_size / min_canvas_w, min_size / min_canvas_h, 1.0)
+    return min(min_canvas_w * scale_factor, SVG_MAX_CANVAS), min(min_canvas_h * scale_factor, SVG_MAX_CANVAS)
+
+
+def plan_layout(input_data: Dict, result: Dict) -> Dict:
+    """Geometría del dibujo de un plan A/B/E: lienzo, escala, rectángulo del cuarto y, por
+    muro con repisas (en el orden B, A, E), su rectángulo y su etiqueta."""
     A = float(input_data["A"]) ; B = float(input_data["B"]) ; E = float(input_data["E"]) 
     base_w = A
     base_h = max(B, E)
@@ -26,12 +54,8 @@ def render_svg(input_data: Dict, result: Dict) -> str:
     min_canvas_w = base_w + margin_left + margin_right
     min_canvas_h = base_h + margin_top + margin_bottom
     
-    # Establecer un tamaño mínimo y escalar si es necesario
-    min_size = 600
-    scale_factor = max(min_size / min_canvas_w, min_size / min_canvas_h, 1.0)
-    
-    canvas_w = min_canvas_w * scale_factor
-    canvas_h = min_canvas_h * scale_factor
+    # Establecer un tamaño mínimo y escalar si es necesario (sin pasar de SVG_MAX_CANVAS)
+    canvas_w, canvas_h = _canvas_size(min_canvas_w, min_canvas_h)
     
     # Recalcular escala para el contenido
     available_w = canvas_w - margin_left - margin_right
@@ -46,128 +70,271 @@ def render_svg(input_data: Dict, result: Dict) -> str:
     x0 = margin_left + (available_w - w) / 2
     y0 = margin_top + (available_h - h) / 2
 
-    def per_wall(wall: str) -> float:
-        return sum(p["length"] for p in result["plan"] if p["wall"] == wall)
+    def approximately_equal(a: float, b: float, tol: float = 0.5) -> bool:
+        return abs(a - b) <= tol
 
-    def depth_of(wall: str) -> float:
-        for p in result["plan"]:
-            if p["wall"] == wall:
-                return p["depth"]
-        return 0
+    # Resumen por muro en una sola pasada sobre el plan: largo total, profundidad y presencia
+    totals: Dict[str, float] = {}
+    depths: Dict[str, float] = {}
+    for p in result["plan"]:
+        wall = p["wall"]
+        if wall not in depths:
+            depths[wall] = p["depth"]
+        totals[wall] = totals.get(wall, 0) + p["length"]
+    hasA, hasB, hasE = "A" in totals, "B" in totals, "E" in totals
+    lenB, lenA, lenE = totals.get("B", 0), totals.get("A", 0), totals.get("E", 0)
+    dA = depths.get("A", 0) * s if hasA else 0
+    dB = depths.get("B", 0) * s
+    dE = depths.get("E", 0) * s if hasE else 0
 
-    def has_wall(wall: str) -> bool:
-        return any(p["wall"] == wall for p in result["plan"])
+    # Geometría compartida por rectángulos y etiquetas
+    if lenB > 0:
+        yB = y0 if approximately_equal(lenB, B) else ((y0 + dA) if (hasA and not hasE) else y0)
+    if lenA > 0:
+        meta_lenA = (result.get('meta') or {}).get('lenA', A)
+        LA = min(meta_lenA, A) * s
+        xA = x0 + dE if (hasE and approximately_equal(lenE, E)) else x0
+    if lenE > 0:
+        yE = y0 if approximately_equal(lenE, E) else ((y0 + dA) if (hasA and not hasB) else y0)
 
-    def approximately_equal(a: float, b: float, tol: float = 0.5) -> bool:
-        return abs(a - b) <= tol
+    shelves: Dict[str, Tuple] = {}
+    if lenB > 0:
+        shelves["B"] = ((x0 + w - dB, yB, dB, min(lenB, B) * s),
+                        (x0 + w - dB/2, yB - 6, f'{round(lenB,1)} × {int(depths["B"])}'))
+    if lenA > 0:
+        shelves["A"] = ((xA, y0, LA, dA),
+                        (xA + LA/2, y0 + dA + 14, f'{meta_lenA} × {int(depths["A"])}'))
+    if lenE > 0:
+        shelves["E"] = ((x0, yE, dE, min(lenE, E) * s),
+                        (x0 + dE/2, yE - 6, f'{round(lenE,1)} × {int(depths["E"])}'))
+    return {"A": A, "B": B, "E": E, "canvas": (canvas_w, canvas_h), "s": s, "room": (x0, y0, w, h),
+            "shelves": shelves, "grid": grid_step(max(base_w, base_h))}
 
-    parts = []
-    parts.append(
+
+def _svg_open(canvas_w: float, canvas_h: float) -> str:
+    return (
         f'<svg viewBox="0 0 {canvas_w} {canvas_h}" width="{canvas_w}" height="{canvas_h}"\n'
         f'     xmlns="http://www.w3.org/2000/svg" text-rendering="optimizeLegibility">'
     )
-    # Inline styles to ensure crisp, black typography
-    parts.append(
-        '<style>\n'
-        '  text { font-family: system-ui, -apple-system, Segoe UI, Roboto, Helvetica, Arial, sans-serif; fill:#111; }\n'
-        '  .measure { font-size:12px; font-weight:700; }\n'
-        '  .legend { font-size:13px; fill:#555; }\n'
-        '  .walllbl { font-size:12px; }\n'
-        '</style>'
-    )
-    # grid
-    parts.append('<g class="grid" stroke="#ddd" stroke-width="1">')
+
+
+# Inline styles to ensure crisp, black typography
+SVG_STYLE = (
+    '<style>\n'
+    '  text { font-family: system-ui, -apple-system, Segoe UI, Roboto, Helvetica, Arial, sans-serif; fill:#111; }\n'
+    '  .measure { font-size:12px; font-weight:700; }\n'
+    '  .legend { font-size:13px; fill:#555; }\n'
+    '  .walllbl { font-size:12px; }\n'
+    '</style>'
+)
+
+
+def _grid_lines(x0: float, y0: float, w: float, h: float, s: float, step: int = GRID_STEP) -> List[str]:
+    lines = []
     x = 0
     while x <= w:
-        parts.append(f'<line x1="{x0+x}" y1="{y0}" x2="{x0+x}" y2="{y0+h}" />')
-        x += s*50
+        lines.append(f'<line x1="{x0+x}" y1="{y0}" x2="{x0+x}" y2="{y0+h}" />')
+        x += s*step
     y = 0
     while y <= h:
-        parts.append(f'<line x1="{x0}" y1="{y0+y}" x2="{x0+w}" y2="{y0+y}" />')
-        y += s*50
-    parts.append('</g>')
+        lines.append(f'<line x1="{x0}" y1="{y0+y}" x2="{x0+w}" y2="{y0+y}" />')
+        y += s*step
+    return lines
+
+
+def _room_rect(x0: float, y0: float, w: float, h: float) -> str:
+    return f'<rect x="{x0}" y="{y0}" width="{w}" height="{h}" fill="none" stroke="#111" stroke-width="4" />'
+
+
+def _wall_labels(x0: float, y0: float, w: float, h: float, A: float, B: float, E: float) -> str:
+    return (
+        f'<text class="walllbl" x="{x0 + w/2}" y="{y0 - 10}" text-anchor="middle">A ({A} cm)</text>'
+        f'<text class="walllbl" x="{x0 + w + 10}" y="{y0 + h/2}" text-anchor="start">B ({B} cm)</text>'
+        f'<text class="walllbl" x="{x0 - 10}" y="{y0 + h/2}" text-anchor="end">E ({E} cm)</text>'
+    )
+
+
+def _shelf_rect(x: float, y: float, width: float, height: float, attrs: str = "") -> str:
+    return f'<rect{attrs} x="{x}" y="{y}" width="{width}" height="{height}" />'
+
+
+def _shelf_label(x: float, y: float, text: str) -> str:
+    return f'<text class="legend" x="{x}" y="{y}" text-anchor="middle">{text}</text>'
+
+
+def _legend(x: float, y: float, step: int = GRID_STEP, attrs: str = "") -> str:
+    return f'<text{attrs} class="legend" x="{x}" y="{y + 28}" text-anchor="start">Escala aproximada. Cuadrícula cada {step} cm.</text>'
+
+
+def render_svg(input_data: Dict, result: Dict, thumbnail: bool = False) -> str:
+    # thumbnail=True omite cuadrícula y textos (ilegibles en miniaturas) para rasterizar más rápido
+    if input_data.get("room") is not None:
+        return render_room_svg(input_data["room"], result, thumbnail)
+    lay = plan_layout(input_data, result)
+    x0, y0, w, h = lay["room"]
+    shelves = lay["shelves"]
+
+    parts = [_svg_open(*lay["canvas"]), SVG_STYLE]
+    # grid
+    if not thumbnail:
+        parts.append('<g class="grid" stroke="#ddd" stroke-width="1">')
+        parts.extend(_grid_lines(x0, y0, w, h, lay["s"], lay["grid"]))
+        parts.append('</g>')
 
     # room rectangle
-    parts.append(f'<rect x="{x0}" y="{y0}" width="{w}" height="{h}" fill="none" stroke="#111" stroke-width="4" />')
+    parts.append(_room_rect(x0, y0, w, h))
 
     # wall labels A,B,E with measurements
-    parts.append(f'<text class="walllbl" x="{x0 + w/2}" y="{y0 - 10}" text-anchor="middle">A ({A} cm)</text>')
-    parts.append(f'<text class="walllbl" x="{x0 + w + 10}" y="{y0 + h/2}" text-anchor="start">B ({B} cm)</text>')
-    parts.append(f'<text class="walllbl" x="{x0 - 10}" y="{y0 + h/2}" text-anchor="end">E ({E} cm)</text>')
+    if not thumbnail:
+        parts.append(_wall_labels(x0, y0, w, h, lay["A"], lay["B"], lay["E"]))
 
-    # shelves group
+    # shelves group (B, A, E)
     parts.append('<g fill="#e43" fill-opacity="0.15" stroke="#e43" stroke-width="3">')
+    for rect, _ in shelves.values():
+        parts.append(_shelf_rect(*rect))
+    parts.append('</g>')
+
+    if thumbnail:
+        parts.append('</svg>')
+        return "".join(parts)
+
+    # shelf labels (outside the group so they're black)
+    for _, label in shelves.values():
+        parts.append(_shelf_label(*label))
+
+    # legend
+    parts.append(_legend(x0, y0 + h, lay["grid"]))
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+# Fragmentos con id del dibujo de una sesión de edición (api_session), en orden de dibujo
+SVG_FRAGMENTS = ("grid", "room", "shelf-B", "shelf-A", "shelf-E", "legend")
+SHELF_STYLE = ' fill="#e43" fill-opacity="0.15" stroke="#e43" stroke-width="3"'
+
+
+def svg_fragment_inputs(input_data: Dict, result: Dict) -> Tuple[Tuple[float, float], Dict[str, Tuple]]:
+    """Tamaño del lienzo y, por fragmento, los valores de los que depende su marcado.
+
+    Dos llamadas con el mismo valor para un fragmento producen el mismo marcado, así
+    que una sesión solo vuelve a generar los fragmentos cuyos valores cambiaron.
+    """
+    lay = plan_layout(input_data, result)
+    x0, y0, w, h = lay["room"]
+    shelves = lay["shelves"]
+    inputs = {
+        "grid": (x0, y0, w, h, lay["s"], lay["grid"]),
+        "room": (x0, y0, w, h, lay["A"], lay["B"], lay["E"]),
+        "shelf-B": shelves.get("B"),
+        "shelf-A": shelves.get("A"),
+        "shelf-E": shelves.get("E"),
+        "legend": (x0, y0 + h, lay["grid"]),
+    }
+    return lay["canvas"], inputs
 
-    # B (right)
-    if per_wall('B') > 0:
-        d = depth_of('B') * s
-        L = min(per_wall('B'), B) * s
-        hasA = has_wall('A')
-        hasE = has_wall('E')
-        dA = depth_of('A') * s if hasA else 0
-        fills_full = approximately_equal(per_wall('B'), B)
-        y_start = y0 if fills_full else ((y0 + dA) if (hasA and not hasE) else y0)
-        parts.append(f'<rect x="{x0 + w - d}" y="{y_start}" width="{d}" height="{L}" />')
-
-    # A (top)
-    if per_wall('A') > 0:
-        dA = depth_of('A') * s
-        useE = has_wall('E')
-        useB = has_wall('B')
-        dE = depth_of('E') * s if useE else 0
-        L = min(result['meta'].get('lenA', A), A) * s
-        x_start = x0
-        if useE:
-            e_fills_full = approximately_equal(per_wall('E'), E)
-            if e_fills_full:
-                x_start = x0 + dE
-        parts.append(f'<rect x="{x_start}" y="{y0}" width="{L}" height="{dA}" />')
-
-    # E (left)
-    if per_wall('E') > 0:
-        d = depth_of('E') * s
-        L = min(per_wall('E'), E) * s
-        hasA = has_wall('A')
-        hasB = has_wall('B')
-        dA = depth_of('A') * s if hasA else 0
-        fills_full = approximately_equal(per_wall('E'), E)
-        y_start = y0 if fills_full else ((y0 + dA) if (hasA and not hasB) else y0)
-        parts.append(f'<rect x="{x0}" y="{y_start}" width="{d}" height="{L}" />')
 
+def render_svg_fragment(name: str, inputs: Optional[Tuple]) -> str:
+    # Cada fragmento es un elemento con id="<name>" que el cliente reemplaza tal cual
+    if name == "grid":
+        return '<g id="grid" class="grid" stroke="#ddd" stroke-width="1">' + "".join(_grid_lines(*inputs)) + '</g>'
+    if name == "room":
+        return '<g id="room">' + _room_rect(*inputs[:4]) + _wall_labels(*inputs) + '</g>'
+    if name == "legend":
+        return _legend(*inputs, attrs=' id="legend"')
+    if inputs is None:
+        return f'<g id="{name}"></g>'
+    rect, label = inputs
+    return f'<g id="{name}">' + _shelf_rect(*rect, attrs=SHELF_STYLE) + _shelf_label(*label) + '</g>'
+
+
+def assemble_svg(canvas: Tuple[float, float], fragments: Dict[str, str]) -> str:
+    """SVG completo a partir de los fragmentos de `SVG_FRAGMENTS`."""
+    return _svg_open(*canvas) + SVG_STYLE + "".join(fragments[name] for name in SVG_FRAGMENTS) + '</svg>'
+
+
+def render_room_svg(room: Dict, result: Dict, thumbnail: bool = False) -> str:
+    # Ambiente poligonal de N muros (api_room): mismo estilo que render_svg
+    points = room["points"]
+    geo, _ = room_geometry(points)
+    walls = room.get("walls") or [{} for _ in points]
+    ids = [w.get("id") or f"M{i + 1}" for i, w in enumerate(walls)]
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    min_x, min_y = min(xs), min(ys)
+    base_w = max(max(xs) - min_x, 1.0)
+    base_h = max(max(ys) - min_y, 1.0)
+
+    # Margen uniforme para las etiquetas de muro, que van por fuera del polígono
+    longest = max(len(f"{w} ({round(g['length'], 1)} cm)") for w, g in zip(ids, geo))
+    margin = max(25, longest * 12 * 0.6 + 10)
+    margin_bottom = margin + 20  # espacio para leyenda
+
+    min_canvas_w = base_w + 2 * margin
+    min_canvas_h = base_h + margin + margin_bottom
+    canvas_w, canvas_h = _canvas_size(min_canvas_w, min_canvas_h)
+    available_w = canvas_w - 2 * margin
+    available_h = canvas_h - margin - margin_bottom
+    s = min(available_w / base_w, available_h / base_h)
+    x0 = margin + (available_w - base_w * s) / 2
+    y0 = margin + (available_h - base_h * s) / 2
+
+    def pt(x: float, y: float) -> str:
+        return f"{round(x0 + (x - min_x) * s, 2)},{round(y0 + (y - min_y) * s, 2)}"
+
+    step = grid_step(max(base_w, base_h))
+
+    parts = [_svg_open(canvas_w, canvas_h), SVG_STYLE]
+    # grid sobre el rectángulo que contiene al polígono
+    if not thumbnail:
+        parts.append('<g class="grid" stroke="#ddd" stroke-width="1">')
+        parts.extend(_grid_lines(x0, y0, base_w * s, base_h * s, s, step))
+        parts.append('</g>')
+
+    # contorno del ambiente
+    outline = " ".join(pt(x, y) for x, y in points)
+    parts.append(f'<polygon points="{outline}" fill="none" stroke="#111" stroke-width="4" />')
+
+    # etiquetas de muro, hacia afuera desde el punto medio
+    if not thumbnail:
+        for wall_id, g in zip(ids, geo):
+            (ox, oy), (ax, ay), (nx, ny) = g["origin"], g["dir"], g["normal"]
+            mx = ox + ax * g["length"] / 2 - nx * 14 / s
+            my = oy + ay * g["length"] / 2 - ny * 14 / s
+            anchor = "middle" if abs(nx) < 0.5 else ("end" if nx > 0 else "start")
+            x, y = pt(mx, my).split(",")
+            parts.append(f'<text class="walllbl" x="{x}" y="{y}" text-anchor="{anchor}">{wall_id} ({round(g["length"], 1)} cm)</text>')
+
+    # repisas: cada pieza es un rectángulo (posiblemente rotado) pegado a su muro
+    index = {wall_id: i for i, wall_id in enumerate(ids)}
+    per_wall: Dict[str, list] = {}
+    parts.append('<g fill="#e43" fill-opacity="0.15" stroke="#e43" stroke-width="3">')
+    for p in result["plan"]:
+        g = geo[index[p["wall"]]]
+        (ox, oy), (ax, ay), (nx, ny) = g["origin"], g["dir"], g["normal"]
+        a, b, d = p["offset"], p["offset"] + p["length"], p["depth"]
+        corners = [(ox + ax * a, oy + ay * a), (ox + ax * b, oy + ay * b),
+                   (ox + ax * b + nx * d, oy + ay * b + ny * d), (ox + ax * a + nx * d, oy + ay * a + ny * d)]
+        parts.append(f'<polygon points="{" ".join(pt(x, y) for x, y in corners)}" />')
+        per_wall.setdefault(p["wall"], []).append(p)
     parts.append('</g>')
 
-    # shelf labels (outside the group so they're black)
-    if per_wall('B') > 0:
-        d = depth_of('B') * s
-        hasA = has_wall('A')
-        hasE = has_wall('E')
-        dA = depth_of('A') * s if hasA else 0
-        fills_full = approximately_equal(per_wall('B'), B)
-        y_start = y0 if fills_full else ((y0 + dA) if (hasA and not hasE) else y0)
-        parts.append(f'<text class="legend" x="{x0 + w - d/2}" y="{y_start - 6}" text-anchor="middle">{round(per_wall("B"),1)} × {int(depth_of("B"))}</text>')
-
-    if per_wall('A') > 0:
-        dA = depth_of('A') * s
-        useE = has_wall('E')
-        dE = depth_of('E') * s if useE else 0
-        L = min(result['meta'].get('lenA', A), A) * s
-        x_start = x0
-        if useE:
-            e_fills_full = approximately_equal(per_wall('E'), E)
-            if e_fills_full:
-                x_start = x0 + dE
-        parts.append(f'<text class="legend" x="{x_start + L/2}" y="{y0 + dA + 14}" text-anchor="middle">{result["meta"].get("lenA", A)} × {int(depth_of("A"))}</text>')
-
-    if per_wall('E') > 0:
-        d = depth_of('E') * s
-        hasA = has_wall('A')
-        hasB = has_wall('B')
-        dA = depth_of('A') * s if hasA else 0
-        fills_full = approximately_equal(per_wall('E'), E)
-        y_start = y0 if fills_full else ((y0 + dA) if (hasA and not hasB) else y0)
-        parts.append(f'<text class="legend" x="{x0 + d/2}" y="{y_start - 6}" text-anchor="middle">{round(per_wall("E"),1)} × {int(depth_of("E"))}</text>')
+    if thumbnail:
+        parts.append('</svg>')
+        return "".join(parts)
+
+    # shelf labels: largo total × profundidad, dentro del ambiente junto a cada muro
+    for wall_id, pieces in per_wall.items():
+        g = geo[index[wall_id]]
+        (ox, oy), (ax, ay), (nx, ny) = g["origin"], g["dir"], g["normal"]
+        start = min(p["offset"] for p in pieces)
+        end = max(p["offset"] + p["length"] for p in pieces)
+        d = pieces[0]["depth"]
+        mid = (start + end) / 2
+        x, y = pt(ox + ax * mid + nx * (d + 12 / s), oy + ay * mid + ny * (d + 12 / s)).split(",")
+        total = round(sum(p["length"] for p in pieces), 1)
+        parts.append(f'<text class="legend" x="{x}" y="{y}" text-anchor="middle">{total} × {int(d)}</text>')
 
     # legend
-    parts.append(f'<text class="legend" x="{x0}" y="{y0 + h + 28}" text-anchor="start">Escala aproximada. Cuadrícula cada 50 cm.</text>')
+    parts.append(_legend(x0, y0 + base_h * s, step))
     parts.append('</svg>')
     return "".join(parts)
@@ -0,0 +1,49 @@
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+# Backend de JSON de la app: "auto" (orjson si está instalado), "orjson" o "std" (json de la stdlib)
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Proveedor de JSON de Flask con orjson: `jsonify` y `request.get_json` lo usan sin cambios.
+
+    Mantiene las claves ordenadas como el proveedor por defecto. La salida es
+    compacta y en UTF-8; los NaN/infinitos salen como null. Si se piden
+    opciones propias de `json.dumps` (indent, etc.) se usa la stdlib.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        data = orjson.dumps(obj, default=self.default, option=self.options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def install_json_provider(app) -> str:
+    """Configura el backend de JSON de `app` según JSON_BACKEND; devuelve el nombre del elegido."""
+    if JSON_BACKEND == 'std' or (orjson is None and JSON_BACKEND == 'auto'):
+        return 'std'
+    if orjson is None:
+        raise RuntimeError('JSON_BACKEND=orjson pero orjson no está instalado')
+    app.json = OrjsonProvider(app)
+    return 'orjson'
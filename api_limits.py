@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+# Clases de costo de los endpoints, de la más barata a la más cara
+CHEAP, RENDER, HEAVY = 'cheap', 'render', 'heavy'
+CLASSES = (CHEAP, RENDER, HEAVY)
+
+
+class RateLimiter:
+    """Token bucket por cliente, en la memoria del proceso.
+
+    Cada cliente tiene hasta `burst` fichas que se reponen a `rate` por segundo; un
+    pedido gasta las fichas de su costo o se rechaza. Se guardan como mucho
+    `max_clients` clientes (se descarta el que lleva más tiempo sin pedir). Con
+    `rate=0` no limita.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # cliente -> [fichas, instante]
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: str, cost: float) -> float:
+        """Gasta `cost` fichas del cliente; devuelve 0 si se admite o los segundos hasta tenerlas."""
+        # Un pedido más caro que la ráfaga se cobra como la ráfaga completa para que alguna vez pase
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                while len(self._buckets) >= self.max_clients:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[client] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            self.rejected += 1
+            return (cost - bucket[0]) / self.rate
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"enabled": self.enabled, "rate": self.rate, "burst": self.burst, "clients": len(self._buckets),
+                    "rejected": self.rejected}
+
+
+class LoadShedder:
+    """Control de admisión adaptativo por clase de endpoint.
+
+    Cada pedido en curso suma el peso de su clase a la carga del proceso. Un pedido
+    `heavy` se admite solo si la carga queda dentro del `SHARES[HEAVY]` de la
+    capacidad, uno `render` dentro del `SHARES[RENDER]`, y los `cheap` (como /plan)
+    siempre: bajo presión se rechazan primero los caros. La capacidad sigue la
+    latencia de los pedidos baratos (AIMD): si su promedio móvil supera `target`
+    se reduce un 10 % (hasta `min_capacity`) y si no crece de a una unidad hasta
+    `max_capacity`; sin pedidos baratos durante `RECOVERY_S` el promedio se
+    reduce a la mitad y la capacidad crece igual. Con el proceso libre se admite
+    cualquier pedido.
+    """
+
+    WEIGHTS = {CHEAP: 1, RENDER: 4, HEAVY: 8}
+    SHARES = {RENDER: 0.8, HEAVY: 0.5}
+    SMOOTHING = 0.2
+    RECOVERY_S = 1.0
+
+    def __init__(self, max_capacity: float, target: float):
+        self.max_capacity = max_capacity
+        # Siempre entra al menos un pedido de cada clase además de los que ya corren
+        self.min_capacity = min(max_capacity, self.WEIGHTS[HEAVY] / self.SHARES[HEAVY])
+        self.capacity = max_capacity
+        self.target = target
+        self.latency = 0.0
+        self.updated = time.monotonic()
+        self.load = 0
+        self.inflight = {kind: 0 for kind in CLASSES}
+        self.shed = {kind: 0 for kind in CLASSES}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_capacity > 0
+
+    def admit(self, kind: str) -> bool:
+        weight = self.WEIGHTS[kind]
+        with self._lock:
+            now = time.monotonic()
+            if now - self.updated > self.RECOVERY_S:
+                # Sin muestras recientes la última latencia ya no es representativa
+                self.latency /= 2
+                self.capacity = min(self.max_capacity, self.capacity + 1)
+                self.updated = now
+            share = self.SHARES.get(kind)
+            if share is not None and self.load and self.load + weight > share * self.capacity:
+                self.shed[kind] += 1
+                return False
+            self.load += weight
+            self.inflight[kind] += 1
+            return True
+
+    def release(self, kind: str, duration: float) -> None:
+        with self._lock:
+            self.load -= self.WEIGHTS[kind]
+            self.inflight[kind] -= 1
+            if kind != CHEAP:
+                return
+            self.latency += self.SMOOTHING * (duration - self.latency)
+            self.updated = time.monotonic()
+            if self.latency > self.target:
+                self.capacity = max(self.min_capacity, self.capacity * 0.9)
+            else:
+                self.capacity = min(self.max_capacity, self.capacity + 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"enabled": self.enabled, "capacity": round(self.capacity, 2), "maxCapacity": self.max_capacity,
+                    "load": self.load, "latencyMs": round(self.latency * 1000, 2), "targetMs": self.target * 1000,
+                    "inflight": dict(self.inflight), "shed": dict(self.shed)}
@@ -0,0 +1,258 @@
+import bisect
+import contextvars
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Límites de los histogramas (segundos y bytes)
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _fmt_value(v: float) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_fmt_labels(key)} {_fmt_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteo por bucket..., conteo total, suma]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            if idx < len(self.buckets):
+                row[idx] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            rows = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in rows:
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_fmt_labels(key, ("le", _fmt_value(float(bound))))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_fmt_labels(key, ("le", "+Inf"))} {row[-2]}')
+            lines.append(f'{self.name}_sum{_fmt_labels(key)} {_fmt_value(row[-1])}')
+            lines.append(f'{self.name}_count{_fmt_labels(key)} {row[-2]}')
+        return lines
+
+
+class Gauges:
+    """Valores leídos al momento de exponer (estadísticas de cachés, pool, etc.)."""
+
+    def __init__(self, name: str, help_text: str, kind: str, collect: Callable[[], List[Tuple[Dict, float]]]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.collect = collect
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in self.collect():
+            lines.append(f'{self.name}{_fmt_labels(_labels(labels))} {_fmt_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'repisas_requests_total', 'Pedidos HTTP por endpoint, método y código de estado.'))
+request_errors_total = registry.register(Counter(
+    'repisas_request_errors_total', 'Pedidos HTTP con código 4xx/5xx por endpoint.'))
+request_duration = registry.register(Histogram(
+    'repisas_request_duration_seconds', 'Duración de los pedidos HTTP por endpoint.', TIME_BUCKETS))
+stage_duration = registry.register(Histogram(
+    'repisas_stage_duration_seconds', 'Duración de cada etapa (plan, svg, raster, page, merge, ...).', TIME_BUCKETS))
+request_size = registry.register(Histogram(
+    'repisas_request_size_bytes', 'Tamaño del cuerpo de los pedidos por endpoint.', SIZE_BUCKETS))
+response_size = registry.register(Histogram(
+    'repisas_response_size_bytes', 'Tamaño de las respuestas por endpoint.', SIZE_BUCKETS))
+
+
+# Etapas medidas dentro del pedido en curso (para Server-Timing y el perfilador)
+_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar('spans', default=None)
+
+
+def start_request() -> None:
+    _spans.set([])
+
+
+def request_spans() -> List[Tuple[str, float]]:
+    return list(_spans.get() or [])
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mide una etapa: alimenta el histograma y la lista del pedido en curso."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stage_duration.observe(elapsed, stage=stage)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    parts = [f'{stage};dur={elapsed * 1000:.2f}' for stage, elapsed in spans]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def cache_collector(caches: Dict[str, Callable[[], Dict]], field: str) -> Callable[[], List[Tuple[Dict, float]]]:
+    """Colector de un campo de `stats()` (hits, misses, entries, ...) para varias cachés."""
+    def collect():
+        return [({'cache': name}, stats()[field]) for name, stats in caches.items()]
+    return collect
+
+
+def hit_ratio_collector(caches: Dict[str, Callable[[], Dict]]) -> Callable[[], List[Tuple[Dict, float]]]:
+    def collect():
+        out = []
+        for name, stats in caches.items():
+            s = stats()
+            total = s['hits'] + s['misses']
+            out.append(({'cache': name}, s['hits'] / total if total else 0.0))
+        return out
+    return collect
+
+
+class SlowRequestProfiler:
+    """Perfila con cProfile una fracción de los pedidos y guarda los más lentos.
+
+    `sample_rate` es la probabilidad de perfilar cada pedido (0 lo desactiva). De los
+    perfilados se conservan los `keep` más lentos con su resumen de pstats y, si hay
+    `directory`, el volcado `.prof` para abrirlo con snakeviz o pstats.
+    """
+
+    def __init__(self, sample_rate: float, keep: int = 20, directory: Optional[str] = None, top_functions: int = 25):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.directory = directory
+        self.top_functions = top_functions
+        self._slowest: List[Tuple[float, int, Dict]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        if directory and sample_rate > 0:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def maybe_start(self) -> Optional[cProfile.Profile]:
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Ya hay otro perfilador activo en este proceso
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile, info: Dict) -> None:
+        profile.disable()
+        duration = info['duration']
+        with self._lock:
+            if len(self._slowest) >= self.keep and duration <= self._slowest[0][0]:
+                return
+            self._seq += 1
+            seq = self._seq
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(self.top_functions)
+        entry = dict(info, id=seq, profile=out.getvalue())
+        if self.directory:
+            entry['file'] = os.path.join(self.directory, f'request-{seq}.prof')
+            profile.dump_stats(entry['file'])
+        evicted = None
+        with self._lock:
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, (duration, seq, entry))
+            elif duration > self._slowest[0][0]:
+                evicted = heapq.heapreplace(self._slowest, (duration, seq, entry))[2]
+            else:
+                evicted = entry
+        if evicted is not None and evicted.get('file'):
+            try:
+                os.remove(evicted['file'])
+            except OSError:
+                pass
+
+    def slowest(self) -> List[Dict]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slowest, reverse=True)]
@@ -0,0 +1,193 @@
+import itertools
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from api_catalog import Catalogue
+from api_domain import max_depth_per_wall, pick_height_and_levels, resolve_catalogue, round1, usable_length_e
+
+# Objetivos del modo optimizador; cada uno ordena (cortes, desperdicio, área) de forma lexicográfica
+OBJECTIVES = ("cuts", "waste", "area")
+DEFAULT_BUDGET_MS = 50.0
+
+# Las longitudes se manejan en décimas de cm (enteros) para que la búsqueda sea exacta
+_SCALE = 10
+
+Split = Tuple[int, int, Tuple[int, ...]]  # (cortes, desperdicio, piezas), en décimas
+
+
+def _to_tenths(length: float) -> int:
+    return max(0, int(round(length * _SCALE)))
+
+
+@lru_cache(maxsize=8192)
+def split_options(length_t: int, max_t: int, min_t: int) -> Tuple[Split, ...]:
+    """Formas no dominadas de repartir un muro de `length_t` décimas en piezas.
+
+    Toda pieza mide entre `min_t` y `max_t` (minLen y maxLen del catálogo); las de
+    menos de `max_t` cuentan como corte. Además del reparto de `pack_lengths` (piezas
+    enteras y el remanente), se considera descartar el remanente (sin corte) si queda
+    alguna pieza entera o, si el remanente es menor que `min_t`, repartir la última
+    pieza entera con él en dos cortes (sin desperdicio) cuando ambas mitades llegan a
+    `min_t`. Un muro de al menos `min_t` siempre recibe alguna pieza; uno más corto
+    queda sin cubrir.
+    """
+    if length_t < min_t:
+        return ((0, length_t, ()),)
+    n = -(-length_t // max_t)
+    rem = length_t - (n - 1) * max_t
+    full = (max_t,) * (n - 1)
+    if rem == max_t:
+        return ((0, 0, full + (max_t,)),)
+    options = [(0, rem, full)] if full else []
+    if rem >= min_t:
+        options.append((1, 0, full + (rem,)))
+    elif n >= 2 and max_t + rem >= 2 * min_t:
+        joined = max_t + rem
+        first = (joined + 1) // 2
+        options.append((2, 0, full[:-1] + (first, joined - first)))
+    return tuple(options)
+
+
+def _key(objective: str, cuts: int, waste: int, area: int) -> Tuple[int, int, int]:
+    if objective == "waste":
+        return (waste, cuts, -area)
+    if objective == "area":
+        return (-area, cuts, waste)
+    return (cuts, waste, -area)
+
+
+@lru_cache(maxsize=65536)
+def best_split(length_t: int, depth: int, objective: str, max_t: int, min_t: int) -> Tuple[Tuple[int, int, int], Split]:
+    """Mejor reparto de un muro para el objetivo (subproblema memoizado).
+
+    Los tres criterios son sumas por muro, así que el óptimo lexicográfico del
+    total se obtiene eligiendo el mejor reparto de cada muro por separado.
+    """
+    best = None
+    for cuts, waste, pieces in split_options(length_t, max_t, min_t):
+        key = _key(objective, cuts, waste, sum(pieces) * depth)
+        if best is None or key < best[0]:
+            best = (key, (cuts, waste, pieces))
+    return best
+
+
+def _corners(shape: str, walls: List[str]) -> List[str]:
+    # Esquinas entre A y los muros laterales usados (ninguna en forma "1")
+    if shape == "1" or "A" not in walls:
+        return []
+    return [w for w in ("B", "E") if w in walls]
+
+
+def _wall_lengths(base: Dict[str, float], depths: Dict[str, int], owners: Dict[str, str]) -> Dict[str, float]:
+    # El muro dueño de una esquina corre completo; el otro pierde la profundidad del dueño
+    lengths = dict(base)
+    for side, owner in owners.items():
+        if owner == "A":
+            lengths[side] = max(0.0, lengths[side] - depths["A"])
+        else:
+            lengths["A"] = max(0.0, lengths["A"] - depths[side])
+    return lengths
+
+
+def plan_shelves_optimized(params: Dict, objective: str = "cuts", budget_ms: Optional[float] = None,
+                           cat: Optional[Catalogue] = None) -> Dict:
+    """Variante de `plan_shelves_py` que busca la mejor distribución.
+
+    Recorre, dentro de `budget_ms`, la profundidad de cada muro (entre las que caben),
+    qué muro se queda con cada esquina y el reparto de piezas de cada muro, y devuelve
+    el plan que optimiza `objective`: "cuts" (menos cortes, luego menos desperdicio),
+    "waste" (menos largo sin cubrir) o "area" (más superficie de repisa). Si se agota
+    el tiempo se devuelve la mejor combinación encontrada con `complete=False`.
+    Antes que el objetivo se minimiza la cantidad de muros pedidos que quedan sin
+    piezas (por ejemplo, por perder una esquina), así que todo muro que pueda
+    cubrirse se cubre.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objetivo desconocido: {objective}")
+    cat = resolve_catalogue(params, cat)
+    max_t, min_t = _to_tenths(cat.max_len), _to_tenths(cat.min_len)
+    t0 = time.perf_counter()
+    deadline = t0 + (DEFAULT_BUDGET_MS if budget_ms is None else budget_ms) / 1000.0
+
+    A = float(params.get("A", 0))
+    B = float(params.get("B", 0))
+    C = float(params.get("C", 0))
+    D = float(params.get("D", 0))
+    E = float(params.get("E", 0))
+    room_height = float(params.get("roomHeight", params.get("H", 0)))
+    walls = [w for w in ("B", "A", "E") if w in params.get("walls", [])]
+    shape = params.get("shape", "L")
+
+    hl = pick_height_and_levels(room_height, cat)
+    if not hl:
+        return {"ok": False, "error": "Ninguna altura cumple la holgura de 40 cm al cielo."}
+
+    depth_max = max_depth_per_wall(C, D, cat)
+    for wall, error in (("B", "No cabe ninguna profundidad en B por C."),
+                        ("A", "No hay profundidad válida para A."),
+                        ("E", "No cabe ninguna profundidad en E por D.")):
+        if wall in walls and not depth_max.get(wall):
+            return {"ok": False, "error": error}
+
+    base = {"A": A, "B": B, "E": usable_length_e(E, D, "E" in walls, cat)}
+    depth_choices = [[d for d in cat.depths if d <= depth_max[w]] for w in walls]
+    corners = _corners(shape, walls)
+    owner_choices = list(itertools.product(*[("A", side) for side in corners]))
+
+    best = None
+    evaluated = 0
+    complete = True
+    for owners_t in owner_choices:
+        owners = dict(zip(corners, owners_t))
+        for depths_t in itertools.product(*depth_choices):
+            if evaluated and time.perf_counter() > deadline:
+                complete = False
+                break
+            depths = dict(zip(walls, depths_t))
+            lengths = _wall_lengths(base, depths, owners)
+            total = (0, 0, 0, 0)  # (muros sin cubrir, criterios del objetivo)
+            splits = {}
+            for wall in walls:
+                key, split = best_split(_to_tenths(lengths[wall]), depths[wall], objective, max_t, min_t)
+                total = (total[0] + (not split[2]), total[1] + key[0], total[2] + key[1], total[3] + key[2])
+                splits[wall] = split
+            evaluated += 1
+            if best is None or total < best[0]:
+                best = (total, owners, depths, lengths, splits)
+        if not complete:
+            break
+
+    _, owners, depths, lengths, splits = best
+    plan: List[Dict] = []
+    for wall in walls:
+        for piece in splits[wall][2]:
+            plan.append({"wall": wall, "length": round1(piece / _SCALE), "depth": depths[wall],
+                         "height": hl["height"], "levels": hl["levels"]})
+    waste = sum(splits[w][1] for w in walls) / _SCALE
+    area = sum(p["length"] * p["depth"] for p in plan) * hl["levels"]
+
+    totals = {
+        "totalLen": round1(sum(p["length"] for p in plan)),
+        "pieces": len(plan),
+        "cuts": sum(1 for p in plan if p["length"] < cat.max_len),
+    }
+    meta = {
+        "catalogue": cat.name,
+        "depthMax": depth_max,
+        "hl": hl,
+        "lenA": round1(lengths["A"]),
+        "lenB": round1(lengths["B"]),
+        "lenE": round1(lengths["E"]),
+        "optimizer": {
+            "objective": objective,
+            "depths": depths,
+            "corners": {"A" + side: owner for side, owner in owners.items()},
+            "waste": round1(waste),
+            "area": round1(area),
+            "evaluated": evaluated,
+            "complete": complete,
+            "elapsedMs": round((time.perf_counter() - t0) * 1000, 3),
+        },
+    }
+    return {"ok": True, "plan": plan, "totals": totals, "meta": meta}
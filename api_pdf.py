@@ -0,0 +1,741 @@
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, FloatObject, IndirectObject, NameObject, NumberObject, StreamObject,
+)
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+# Tamaño de bloque al copiar y transmitir archivos
+CHUNK_SIZE = 256 * 1024
+
+
+# Geometría de la página del plano (puntos PDF)
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 30
+BANNER_HEIGHT = 60
+BANNER_TEXT = "PLANO PROPUESTO"
+
+
+@lru_cache(maxsize=1)
+def _template_page_data() -> bytes:
+    """Banner naranja y marco negro, dibujados una sola vez por proceso."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # Definir colores
+    orange_color = (1.0, 0.576, 0.118)  # RGB para #ff931e
+    black_color = (0.0, 0.0, 0.0)       # RGB para negro
+    white_color = (1.0, 1.0, 1.0)       # RGB para blanco
+
+    # Dibujar banner naranja dentro del marco (desde el tope del marco)
+    banner_y = height - MARGIN - BANNER_HEIGHT
+    c.setFillColor(orange_color)
+    c.rect(MARGIN, banner_y, width-(2*MARGIN), BANNER_HEIGHT, stroke=0, fill=1)
+
+    # Texto "PLANO PROPUESTO" en blanco (centrado en el banner)
+    c.setFillColor(white_color)
+    c.setFont("Helvetica-Bold", 18)
+    text_width = c.stringWidth(BANNER_TEXT, "Helvetica-Bold", 18)
+    text_x = (width - text_width) / 2
+    text_y = banner_y + 25
+    c.drawString(text_x, text_y, BANNER_TEXT)
+
+    # Dibujar marco negro fino sobre la imagen
+    frame_width = 1
+    c.setStrokeColor(black_color)
+    c.setLineWidth(frame_width)
+    c.rect(MARGIN, MARGIN, width-(2*MARGIN), height-(2*MARGIN), stroke=1, fill=0)
+    c.save()
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def template_page():
+    # Se parsea una vez; cada PdfWriter clona la página (contenido y recursos) al agregarla
+    return PdfReader(BytesIO(_template_page_data())).pages[0]
+
+
+def _fit_box(content_w: float, content_h: float) -> Tuple[bool, float, float, float, float]:
+    """Ubica un contenido dentro del marco, bajo el banner, manteniendo proporción.
+
+    Si el contenido es más alto que ancho se rota 90 grados. Devuelve
+    (rotar, x, y, ancho, alto) del rectángulo ocupado en la página.
+    """
+    rotate = content_h > content_w
+    temp_w, temp_h = (content_h, content_w) if rotate else (content_w, content_h)
+    # Calcular el área disponible dentro del marco (respetando márgenes)
+    available_width = PAGE_WIDTH - (2 * MARGIN)
+    available_height = PAGE_HEIGHT - (2 * MARGIN) - BANNER_HEIGHT  # Restar espacio del banner
+    scale = min(available_width / temp_w, available_height / temp_h)
+    new_w, new_h = temp_w * scale, temp_h * scale
+    # Centrar dentro del área disponible del marco
+    x = MARGIN + (available_width - new_w) / 2
+    y = MARGIN + (available_height - new_h) / 2
+    return rotate, x, y, new_w, new_h
+
+
+def _placement(content_w: float, content_h: float) -> str:
+    # Matriz que lleva el cuadrado unidad (imagen) o el viewBox (SVG) a su lugar en la página
+    rotate, x, y, new_w, new_h = _fit_box(content_w, content_h)
+    if rotate:
+        # Rotar 90 grados en sentido horario: el ancho del contenido queda en vertical
+        return f'0 -1 1 0 {_num(x)} {_num(y + new_h)} cm\n'
+    return f'1 0 0 1 {_num(x)} {_num(y)} cm\n'
+
+
+def _num(v: float) -> str:
+    return ('%.4f' % v).rstrip('0').rstrip('.') or '0'
+
+
+def _png_chunks(data: bytes):
+    pos = 8
+    while pos + 8 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        kind = data[pos + 4:pos + 8]
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def image_xobject(image_data: bytes) -> Tuple[StreamObject, int, int]:
+    """XObject de imagen para un PNG/JPEG.
+
+    Los PNG RGB o grises de 8 bits sin entrelazado y los JPEG RGB/grises se
+    embeben tal cual (IDAT ya es Flate con predictor PNG), sin decodificar ni
+    volver a comprimir. El resto pasa por Pillow, con la transparencia sobre
+    blanco.
+    """
+    xobj = StreamObject()
+    xobj[NameObject('/Type')] = NameObject('/XObject')
+    xobj[NameObject('/Subtype')] = NameObject('/Image')
+    xobj[NameObject('/BitsPerComponent')] = NumberObject(8)
+    if image_data[:8] == b'\x89PNG\r\n\x1a\n':
+        chunks = list(_png_chunks(image_data))
+        ihdr = chunks[0][1]
+        w, h = int.from_bytes(ihdr[0:4], 'big'), int.from_bytes(ihdr[4:8], 'big')
+        depth, color_type, interlace = ihdr[8], ihdr[9], ihdr[12]
+        if depth == 8 and color_type in (0, 2) and interlace == 0:
+            colors = 3 if color_type == 2 else 1
+            xobj._data = b''.join(body for kind, body in chunks if kind == b'IDAT')
+            xobj[NameObject('/Width')] = NumberObject(w)
+            xobj[NameObject('/Height')] = NumberObject(h)
+            xobj[NameObject('/ColorSpace')] = NameObject('/DeviceRGB' if colors == 3 else '/DeviceGray')
+            xobj[NameObject('/Filter')] = NameObject('/FlateDecode')
+            parms = DictionaryObject()
+            parms[NameObject('/Predictor')] = NumberObject(15)
+            parms[NameObject('/Colors')] = NumberObject(colors)
+            parms[NameObject('/BitsPerComponent')] = NumberObject(8)
+            parms[NameObject('/Columns')] = NumberObject(w)
+            xobj[NameObject('/DecodeParms')] = parms
+            return xobj, w, h
+
+    from PIL import Image
+
+    img = Image.open(BytesIO(image_data))
+    if img.format == 'JPEG' and img.mode in ('RGB', 'L'):
+        # JPEG: se embebe el archivo sin recomprimir
+        xobj._data = image_data
+        xobj[NameObject('/Width')] = NumberObject(img.width)
+        xobj[NameObject('/Height')] = NumberObject(img.height)
+        xobj[NameObject('/ColorSpace')] = NameObject('/DeviceRGB' if img.mode == 'RGB' else '/DeviceGray')
+        xobj[NameObject('/Filter')] = NameObject('/DCTDecode')
+        return xobj, img.width, img.height
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        img = Image.new('RGB', rgba.size, 'white')
+        img.paste(rgba, mask=rgba.getchannel('A'))
+    else:
+        img = img.convert('RGB')
+    w, h = img.size
+    xobj._data = zlib.compress(img.tobytes(), 6)
+    xobj[NameObject('/Width')] = NumberObject(w)
+    xobj[NameObject('/Height')] = NumberObject(h)
+    xobj[NameObject('/ColorSpace')] = NameObject('/DeviceRGB')
+    xobj[NameObject('/Filter')] = NameObject('/FlateDecode')
+    return xobj, w, h
+
+
+_SVG_NS = '{http://www.w3.org/2000/svg}'
+
+
+def _svg_color(value: Optional[str]) -> Optional[Tuple[float, float, float]]:
+    if not value or value == 'none' or not value.startswith('#'):
+        return None
+    hexv = value[1:]
+    if len(hexv) == 3:
+        hexv = ''.join(ch * 2 for ch in hexv)
+    return tuple(int(hexv[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+
+
+def _svg_styles(root) -> Dict[str, Dict[str, str]]:
+    # Reglas simples "selector { prop:valor; }" del <style> que emite render_svg
+    rules: Dict[str, Dict[str, str]] = {}
+    for style in root.iter(_SVG_NS + 'style'):
+        for selector, body in re.findall(r'([.\w-]+)\s*\{([^}]*)\}', style.text or ''):
+            props = rules.setdefault(selector, {})
+            for decl in body.split(';'):
+                if ':' in decl:
+                    k, v = decl.split(':', 1)
+                    props[k.strip()] = v.strip()
+    return rules
+
+
+def _pdf_text(text: str) -> str:
+    raw = text.encode('cp1252', 'replace').decode('latin-1')
+    return raw.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def svg_content(svg: str, font: str, alpha_states: Dict[float, str]) -> Tuple[str, float, float]:
+    """Traduce el SVG de render_svg (rect, line, polygon, text) a operadores PDF.
+
+    Devuelve (operadores, ancho, alto) en unidades del viewBox, con el eje y
+    ya invertido. `alpha_states` acumula las opacidades de relleno usadas
+    (opacidad -> nombre de ExtGState) para declararlas en los recursos.
+    """
+    import xml.etree.ElementTree as ET
+
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    root = ET.fromstring(svg)
+    _, _, vw, vh = (float(v) for v in root.get('viewBox').split())
+    styles = _svg_styles(root)
+    ops = [f'1 0 0 -1 0 {_num(vh)} cm\n']
+
+    def walk(node, inherited):
+        attrs = dict(inherited)
+        attrs.update({k: v for k, v in node.attrib.items() if k != 'class'})
+        tag = node.tag.replace(_SVG_NS, '')
+        if tag == 'g':
+            for child in node:
+                walk(child, attrs)
+            return
+        if tag == 'polygon' and not attrs.get('points', '').strip():
+            return
+        if tag in ('rect', 'line', 'polygon'):
+            stroke = _svg_color(attrs.get('stroke'))
+            fill = _svg_color(attrs.get('fill', 'none' if tag == 'line' else '#000'))
+            ops.append('q\n')
+            opacity = float(attrs.get('fill-opacity', 1))
+            if fill and opacity < 1:
+                ops.append(f'/{alpha_states.setdefault(opacity, "GSa%d" % len(alpha_states))} gs\n')
+            if stroke:
+                ops.append('%s %s %s RG %s w\n' % (*map(_num, stroke), _num(float(attrs.get('stroke-width', 1)))))
+            if fill:
+                ops.append('%s %s %s rg\n' % tuple(map(_num, fill)))
+            if tag == 'rect':
+                x, y = float(attrs.get('x', 0)), float(attrs.get('y', 0))
+                ops.append(f'{_num(x)} {_num(y)} {_num(float(attrs["width"]))} {_num(float(attrs["height"]))} re\n')
+                paint = 'B' if fill and stroke else ('f' if fill else 'S')
+            elif tag == 'polygon':
+                coords = [float(v) for v in re.split(r'[\s,]+', attrs.get('points', '').strip()) if v]
+                pairs = list(zip(coords[::2], coords[1::2]))
+                ops.append(' '.join(f'{_num(x)} {_num(y)} {op}' for (x, y), op in
+                                    zip(pairs, ['m'] + ['l'] * (len(pairs) - 1))) + ' h\n')
+                paint = 'B' if fill and stroke else ('f' if fill else 'S')
+            else:
+                ops.append(f'{_num(float(attrs["x1"]))} {_num(float(attrs["y1"]))} m '
+                           f'{_num(float(attrs["x2"]))} {_num(float(attrs["y2"]))} l\n')
+                paint = 'S'
+            ops.append(paint + '\nQ\n')
+        elif tag == 'text':
+            props = dict(styles.get('text', {}))
+            for cls in (node.get('class') or '').split():
+                props.update(styles.get('.' + cls, {}))
+            size = float(props.get('font-size', '12px').rstrip('px'))
+            color = _svg_color(props.get('fill', '#000')) or (0, 0, 0)
+            text = node.text or ''
+            x, y = float(attrs.get('x', 0)), float(attrs.get('y', 0))
+            width = stringWidth(text, 'Helvetica', size)
+            anchor = attrs.get('text-anchor', 'start')
+            if anchor == 'middle':
+                x -= width / 2
+            elif anchor == 'end':
+                x -= width
+            ops.append('BT\n%s %s %s rg\n/%s %s Tf\n1 0 0 -1 %s %s Tm\n(%s) Tj\nET\n' % (
+                *map(_num, color), font, _num(size), _num(x), _num(y), _pdf_text(text)))
+
+    for child in root:
+        walk(child, {})
+    return ''.join(ops), vw, vh
+
+
+def svg_plan_ops(svg: str, font: str, alpha_states: Dict[float, str]) -> str:
+    """Operadores que ubican el SVG de render_svg dentro del marco, bajo el banner (sin q/Q)."""
+    body, vw, vh = svg_content(svg, font, alpha_states)
+    rotate, _, _, new_w, new_h = _fit_box(vw, vh)
+    scale = (new_h if rotate else new_w) / vw
+    return _placement(vw, vh) + f'{_num(scale)} 0 0 {_num(scale)} 0 0 cm\n' + body
+
+
+def _helvetica() -> DictionaryObject:
+    font = DictionaryObject()
+    font[NameObject('/Type')] = NameObject('/Font')
+    font[NameObject('/Subtype')] = NameObject('/Type1')
+    font[NameObject('/BaseFont')] = NameObject('/Helvetica')
+    font[NameObject('/Encoding')] = NameObject('/WinAnsiEncoding')
+    return font
+
+
+def _alpha_state(opacity: float) -> DictionaryObject:
+    gs = DictionaryObject()
+    gs[NameObject('/Type')] = NameObject('/ExtGState')
+    gs[NameObject('/ca')] = FloatObject(opacity)
+    return gs
+
+
+def build_plan_page(image_data: Optional[bytes] = None, svg: Optional[str] = None) -> bytes:
+    """Página A4 con el plano (PNG o SVG vectorial), el banner y el marco, como PDF.
+
+    El banner y el marco vienen de la plantilla ya construida; por pedido
+    solo se agrega el contenido del plano debajo de ella.
+    """
+    writer = PdfWriter()
+    page = writer.add_page(template_page())
+    resources = page['/Resources'].get_object()
+    ops = ['q\n']
+
+    if svg is not None:
+        alpha_states: Dict[float, str] = {}
+        ops.append(svg_plan_ops(svg, 'FPlan', alpha_states))
+        _resource(resources, '/Font')[NameObject('/FPlan')] = writer._add_object(_helvetica())
+        for opacity, name in alpha_states.items():
+            _resource(resources, '/ExtGState')[NameObject('/' + name)] = writer._add_object(_alpha_state(opacity))
+    else:
+        xobj, img_w, img_h = image_xobject(image_data)
+        ops.append(_placement(img_w, img_h))
+        rotate, _, _, new_w, new_h = _fit_box(img_w, img_h)
+        # El contenido rotado ocupa new_h de ancho y new_w de alto en sus propios ejes
+        w, h = (new_h, new_w) if rotate else (new_w, new_h)
+        ops.append(f'{_num(w)} 0 0 {_num(h)} 0 0 cm\n/PlanImg Do\n')
+        _resource(resources, '/XObject')[NameObject('/PlanImg')] = writer._add_object(xobj)
+
+    ops.append('Q\n')
+    plan_stream = StreamObject()
+    plan_stream._data = ''.join(ops).encode('latin-1')
+    plan_stream = plan_stream.flate_encode()
+    contents = page.raw_get('/Contents')
+    existing = list(contents.get_object()) if isinstance(contents.get_object(), ArrayObject) else [contents]
+    # El plano va primero para que el banner y el marco queden por encima
+    page[NameObject('/Contents')] = ArrayObject([writer._add_object(plan_stream)] + existing)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _resource(resources: DictionaryObject, kind: str) -> DictionaryObject:
+    if kind not in resources:
+        resources[NameObject(kind)] = DictionaryObject()
+    return resources[kind].get_object()
+
+
+def merge_plan_page(pdf_stream: BinaryIO, page_data: bytes, out: BinaryIO) -> None:
+    """Escribe en `out` el PDF original con la página del plano después de la primera."""
+    # Leer PDF original
+    pdf_reader = PdfReader(pdf_stream)
+    pdf_writer = PdfWriter()
+
+    # Agregar primera página
+    if len(pdf_reader.pages) > 0:
+        pdf_writer.add_page(pdf_reader.pages[0])
+
+    # Insertar nueva página con la imagen
+    new_page_reader = PdfReader(BytesIO(page_data))
+    if len(new_page_reader.pages) > 0:
+        pdf_writer.add_page(new_page_reader.pages[0])
+
+    # Agregar resto de páginas (si hay más de 1 página original)
+    for i in range(1, len(pdf_reader.pages)):
+        pdf_writer.add_page(pdf_reader.pages[i])
+
+    pdf_writer.write(out)
+
+
+def merge_plan_page_bytes(pdf_data: bytes, page_data: bytes) -> bytes:
+    output_buffer = BytesIO()
+    merge_plan_page(BytesIO(pdf_data), page_data, output_buffer)
+    output_data = output_buffer.getvalue()
+    output_buffer.close()
+    return output_data
+
+
+def spool_to_tempfile(upload, directory: str) -> str:
+    """Copia un upload (werkzeug FileStorage) a disco por bloques y devuelve la ruta."""
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.pdf')
+    with os.fdopen(fd, 'wb') as f:
+        while True:
+            chunk = upload.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+    return path
+
+
+class IncrementalUnsupported(Exception):
+    pass
+
+
+def _clone(obj, mapping: Dict, queue: List, next_id: List[int]):
+    # Copia un objeto del PDF de la página nueva renumerando sus referencias
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in mapping:
+            mapping[key] = next_id[0]
+            next_id[0] += 1
+            queue.append(obj)
+        return IndirectObject(mapping[key], 0, None)
+    if isinstance(obj, DictionaryObject):
+        new = obj.__class__()
+        for k, v in obj.items():
+            new[NameObject(k)] = _clone(v, mapping, queue, next_id)
+        if isinstance(obj, StreamObject):
+            new._data = obj._data
+        return new
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_clone(v, mapping, queue, next_id) for v in obj)
+    return obj
+
+
+def _last_startxref(mapped) -> int:
+    tail = mapped[max(0, len(mapped) - 2048):]
+    found = re.findall(rb'startxref\s+(\d+)', tail)
+    if not found:
+        raise IncrementalUnsupported('sin startxref')
+    return int(found[-1])
+
+
+def plan_page_update(mapped, page_data: bytes) -> bytes:
+    """Actualización incremental que inserta la página del plano tras la primera.
+
+    Solo se leen el xref, el catálogo y los nodos del árbol de páginas
+    afectados; el resultado (bytes del original + esta actualización) es un
+    PDF válido sin reescribir ni cargar los objetos existentes.
+    """
+    reader = PdfReader(mapped)
+    if reader.is_encrypted or len(reader.pages) == 0:
+        raise IncrementalUnsupported('PDF cifrado o sin páginas')
+    prev = _last_startxref(mapped)
+    head = bytes(mapped[prev:prev + 32])
+    if head.startswith(b'xref'):
+        xref_stream = False
+    elif re.match(rb'\d+\s+\d+\s+obj', head):
+        xref_stream = True
+    else:
+        raise IncrementalUnsupported('startxref inválido')
+
+    first = reader.pages[0]
+    parent_ref = first.raw_get('/Parent')
+    first_ref = first.indirect_ref
+    if not isinstance(parent_ref, IndirectObject) or first_ref is None:
+        raise IncrementalUnsupported('árbol de páginas inesperado')
+
+    # Los trailers de xref stream no siempre exponen /Size en PyPDF2
+    known = [i for refs in reader.xref.values() for i in refs] + list(reader.xref_objStm)
+    size = max([int(reader.trailer.get('/Size', 0))] + [i + 1 for i in known])
+    next_id = [size]
+    mapping: Dict = {}
+    queue: List = []
+    new_objects: List = []
+
+    # Página nueva y todo lo que referencia (imagen, fuentes, recursos)
+    src_page = PdfReader(BytesIO(page_data)).pages[0]
+    page_id = next_id[0]
+    next_id[0] += 1
+    page = DictionaryObject()
+    for k, v in src_page.items():
+        if k != '/Parent':
+            page[NameObject(k)] = _clone(v, mapping, queue, next_id)
+    page[NameObject('/Parent')] = IndirectObject(parent_ref.idnum, parent_ref.generation, None)
+    new_objects.append((page_id, 0, page))
+    while queue:
+        src = queue.pop(0)
+        new_objects.append((mapping[(src.idnum, src.generation)], 0, _clone(src.get_object(), mapping, queue, next_id)))
+
+    # Nodos existentes que cambian: el padre (Kids) y la cuenta de todos los ancestros
+    modified: List = []
+    parent = parent_ref.get_object()
+    kids_raw = parent.raw_get('/Kids')
+    kids = ArrayObject(kids_raw.get_object())
+    pos = next(i for i, k in enumerate(kids) if (k.idnum, k.generation) == (first_ref.idnum, first_ref.generation))
+    kids.insert(pos + 1, IndirectObject(page_id, 0, None))
+    node_ref = parent_ref
+    while isinstance(node_ref, IndirectObject):
+        node = DictionaryObject(node_ref.get_object())
+        node[NameObject('/Count')] = NumberObject(int(node['/Count']) + 1)
+        if node_ref is parent_ref:
+            if isinstance(kids_raw, IndirectObject):
+                modified.append((kids_raw.idnum, kids_raw.generation, kids))
+            else:
+                node[NameObject('/Kids')] = kids
+        modified.append((node_ref.idnum, node_ref.generation, node))
+        node_ref = node.raw_get('/Parent') if '/Parent' in node else None
+
+    base = len(mapped)
+    out = BytesIO()
+    out.write(b'\n')
+    offsets = {}
+    for idnum, gen, obj in modified + new_objects:
+        offsets[idnum] = (base + out.tell(), gen)
+        out.write(f'{idnum} {gen} obj\n'.encode('ascii'))
+        obj.write_to_stream(out, None)
+        out.write(b'\nendobj\n')
+
+    trailer = DictionaryObject()
+    for key in ('/Root', '/Info', '/ID'):
+        if key in reader.trailer:
+            trailer[NameObject(key)] = reader.trailer.raw_get(key)
+    trailer[NameObject('/Prev')] = NumberObject(prev)
+
+    if xref_stream:
+        xref_id = next_id[0]
+        next_id[0] += 1
+        offsets[xref_id] = (base + out.tell(), 0)
+    trailer[NameObject('/Size')] = NumberObject(max(size, next_id[0]))
+
+    # Subsecciones contiguas de ids
+    ids = sorted(offsets)
+    runs: List[List[int]] = []
+    for i in ids:
+        if runs and runs[-1][-1] == i - 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+
+    xref_offset = offsets[xref_id][0] if xref_stream else base + out.tell()
+    if xref_stream:
+        width = max(4, (xref_offset.bit_length() + 7) // 8)
+        rows = b''.join(
+            b'\x01' + offsets[i][0].to_bytes(width, 'big') + offsets[i][1].to_bytes(2, 'big')
+            for run in runs for i in run
+        )
+        xref = StreamObject()
+        xref._data = rows
+        xref.update(trailer)
+        xref[NameObject('/Type')] = NameObject('/XRef')
+        xref[NameObject('/W')] = ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)])
+        xref[NameObject('/Index')] = ArrayObject(
+            NumberObject(n) for run in runs for n in (run[0], len(run))
+        )
+        out.write(f'{xref_id} 0 obj\n'.encode('ascii'))
+        xref.write_to_stream(out, None)
+        out.write(b'\nendobj\n')
+    else:
+        out.write(b'xref\n')
+        for run in runs:
+            out.write(f'{run[0]} {len(run)}\n'.encode('ascii'))
+            for i in run:
+                off, gen = offsets[i]
+                out.write(f'{off:010d} {gen:05d} n\r\n'.encode('ascii'))
+        out.write(b'trailer\n')
+        trailer.write_to_stream(out, None)
+        out.write(b'\n')
+    out.write(f'startxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+    return out.getvalue()
+
+
+def merge_plan_page_streaming(pdf_path: str, page_data: bytes, workdir: Optional[str] = None) -> Tuple[List[str], bytes]:
+    """Prepara la unión sin cargar el PDF original en memoria.
+
+    Devuelve (archivos, sufijo): la respuesta es el contenido de `archivos`
+    en orden seguido de `sufijo`. Normalmente es el original intacto más una
+    actualización incremental; si el PDF no lo permite (cifrado, xref roto)
+    se reescribe con PyPDF2 leyendo desde el mmap a un temporal en `workdir`
+    (por defecto, el directorio del PDF).
+    """
+    with open(pdf_path, 'rb') as src:
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            try:
+                return [pdf_path], plan_page_update(mapped, page_data)
+            except Exception:
+                pass
+            fd, out_path = tempfile.mkstemp(dir=workdir or os.path.dirname(pdf_path), suffix='.pdf')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    merge_plan_page(mapped, page_data, out)
+            except Exception:
+                os.remove(out_path)
+                raise
+    return [out_path], b''
+
+
+def iter_file_chunks(paths: List[str], suffix: bytes = b'', cleanup_dir: Optional[str] = None) -> Iterator[bytes]:
+    """Genera los archivos y el sufijo por bloques; al terminar borra el directorio temporal."""
+    try:
+        for path in paths:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        if suffix:
+            yield suffix
+    finally:
+        if cleanup_dir:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+
+def report_page_stream(svg: str) -> Tuple[bytes, Dict[float, str]]:
+    """Contenido comprimido (Flate) de una página de informe y sus opacidades (opacidad -> nombre).
+
+    Es la parte cara de cada página (traducir el SVG y comprimir), así que corre
+    en el pool de procesos; la fuente del plano se llama /FPlan como en
+    build_plan_page.
+    """
+    alpha_states: Dict[float, str] = {}
+    ops = 'q\n' + svg_plan_ops(svg, 'FPlan', alpha_states) + 'Q\n'
+    return zlib.compress(ops.encode('latin-1')), alpha_states
+
+
+def _caption_ops(label: str, number: int, count: int) -> bytes:
+    # Nombre de la habitación a la izquierda y número de página a la derecha, en blanco sobre el banner
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    y = PAGE_HEIGHT - MARGIN - BANNER_HEIGHT + 8
+    folio = f'{number} / {count}'
+    right = PAGE_WIDTH - MARGIN - 10 - stringWidth(folio, 'Helvetica', 10)
+    ops = '1 1 1 rg\nBT\n/FPlan 10 Tf\n'
+    if label:
+        ops += f'1 0 0 1 {_num(MARGIN + 10)} {_num(y)} Tm\n({_pdf_text(label)}) Tj\n'
+    ops += f'1 0 0 1 {_num(right)} {_num(y)} Tm\n({_pdf_text(folio)}) Tj\nET\n'
+    return ops.encode('latin-1')
+
+
+def iter_report(pages: Iterable[Tuple[bytes, Dict[float, str]]], labels: List[str]) -> Iterator[bytes]:
+    """PDF de una página de plano por habitación, generado por bloques a medida que llegan las páginas.
+
+    `pages` son resultados de report_page_stream en orden y `labels` el nombre de
+    cada página (puede ser vacío). El banner y el marco (contenido y recursos de
+    la plantilla), la fuente y los estados de opacidad se escriben una sola vez y
+    todas las páginas los referencian: cada página solo agrega su contenido (uno
+    solo para páginas idénticas), el rótulo y un diccionario chico.
+    """
+    count = len(labels)
+    offsets: Dict[int, int] = {}
+    pos = [0]
+    next_id = [3]  # 1: catálogo, 2: árbol de páginas (se escriben al final)
+
+    def emit(idnum: int, obj) -> bytes:
+        out = BytesIO()
+        out.write(f'{idnum} 0 obj\n'.encode('ascii'))
+        obj.write_to_stream(out, None)
+        out.write(b'\nendobj\n')
+        offsets[idnum] = pos[0]
+        data = out.getvalue()
+        pos[0] += len(data)
+        return data
+
+    def new_id() -> int:
+        next_id[0] += 1
+        return next_id[0] - 1
+
+    def ref(idnum: int) -> IndirectObject:
+        return IndirectObject(idnum, 0, None)
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    pos[0] = len(header)
+    chunk = [header]
+
+    # Plantilla: contenido y recursos copiados una vez con ids nuevos
+    src = template_page()
+    mapping: Dict = {}
+    queue: List = []
+    contents = _clone(src.raw_get('/Contents'), mapping, queue, next_id)
+    template_contents = list(contents) if isinstance(contents, ArrayObject) else [contents]
+    media_box = _clone(src.raw_get('/MediaBox'), mapping, queue, next_id)
+    src_resources = src['/Resources'].get_object()
+    base_resources = DictionaryObject()
+    fonts = DictionaryObject()
+    for key in src_resources:
+        if key == '/Font':
+            src_fonts = src_resources['/Font'].get_object()
+            for name in src_fonts:
+                fonts[NameObject(name)] = _clone(src_fonts.raw_get(name), mapping, queue, next_id)
+        else:
+            base_resources[NameObject(key)] = _clone(src_resources.raw_get(key), mapping, queue, next_id)
+    while queue:
+        obj = queue.pop(0)
+        chunk.append(emit(mapping[(obj.idnum, obj.generation)], _clone(obj.get_object(), mapping, queue, next_id)))
+
+    plan_font = new_id()
+    chunk.append(emit(plan_font, _helvetica()))
+    fonts[NameObject('/FPlan')] = ref(plan_font)
+    fonts_id = new_id()
+    chunk.append(emit(fonts_id, fonts))
+    base_resources[NameObject('/Font')] = ref(fonts_id)
+    yield b''.join(chunk)
+
+    alpha_ids: Dict[float, int] = {}
+    plan_ids: Dict[bytes, int] = {}
+    kids = ArrayObject()
+    for number, ((data, alpha_states), label) in enumerate(zip(pages, labels), 1):
+        chunk = []
+        # Habitaciones iguales comparten el mismo contenido de plano
+        plan_id = plan_ids.get(data)
+        if plan_id is None:
+            plan = StreamObject()
+            plan._data = data
+            plan[NameObject('/Filter')] = NameObject('/FlateDecode')
+            plan_id = plan_ids[data] = new_id()
+            chunk.append(emit(plan_id, plan))
+        caption = StreamObject()
+        caption._data = _caption_ops(label, number, count)
+        caption_id = new_id()
+        chunk.append(emit(caption_id, caption))
+
+        resources = DictionaryObject(base_resources)
+        if alpha_states:
+            states = DictionaryObject()
+            for opacity, name in alpha_states.items():
+                if opacity not in alpha_ids:
+                    alpha_ids[opacity] = new_id()
+                    chunk.append(emit(alpha_ids[opacity], _alpha_state(opacity)))
+                states[NameObject('/' + name)] = ref(alpha_ids[opacity])
+            resources[NameObject('/ExtGState')] = states
+
+        # El plano va primero para que el banner, el marco y el rótulo queden por encima
+        page = DictionaryObject()
+        page[NameObject('/Type')] = NameObject('/Page')
+        page[NameObject('/Parent')] = ref(2)
+        page[NameObject('/Contents')] = ArrayObject([ref(plan_id)] + template_contents + [ref(caption_id)])
+        page[NameObject('/Resources')] = resources
+        page_id = new_id()
+        chunk.append(emit(page_id, page))
+        kids.append(ref(page_id))
+        yield b''.join(chunk)
+
+    tree = DictionaryObject()
+    tree[NameObject('/Type')] = NameObject('/Pages')
+    tree[NameObject('/Kids')] = kids
+    tree[NameObject('/Count')] = NumberObject(len(kids))
+    tree[NameObject('/MediaBox')] = media_box
+    catalog = DictionaryObject()
+    catalog[NameObject('/Type')] = NameObject('/Catalog')
+    catalog[NameObject('/Pages')] = ref(2)
+    chunk = [emit(2, tree), emit(1, catalog)]
+
+    xref_offset = pos[0]
+    size = next_id[0]
+    lines = [f'xref\n0 {size}\n0000000000 65535 f\r\n']
+    for idnum in range(1, size):
+        lines.append(f'{offsets[idnum]:010d} 00000 n\r\n')
+    trailer = DictionaryObject()
+    trailer[NameObject('/Size')] = NumberObject(size)
+    trailer[NameObject('/Root')] = ref(1)
+    out = BytesIO()
+    out.write(''.join(lines).encode('ascii'))
+    out.write(b'trailer\n')
+    trailer.write_to_stream(out, None)
+    out.write(f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+    chunk.append(out.getvalue())
+    yield b''.join(chunk)
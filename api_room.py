@@ -0,0 +1,307 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from api_catalog import Catalogue
+from api_domain import pack_lengths, pick_height_and_levels, resolve_catalogue, round1
+
+# Ángulos interiores por encima de este valor (grados) no generan conflicto de esquina
+STRAIGHT_ANGLE = 179.5
+MAX_WALLS = 64
+# Medida máxima (cm) de un muro o del ambiente: acota las piezas de un plan y el tamaño del dibujo
+MAX_EXTENT = 100000.0
+
+
+def _finite(value, what: str) -> float:
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{what} debe ser un número') from None
+    if not math.isfinite(x):
+        raise ValueError(f'{what} debe ser un número finito')
+    return x
+
+
+def _spans(items, what: str, default_width: Optional[float] = None) -> List[Dict[str, float]]:
+    spans = []
+    for j, item in enumerate(items or []):
+        if not isinstance(item, dict):
+            raise ValueError(f'{what}[{j}] debe ser un objeto {{from, to}}')
+        start = round1(_finite(item.get('from'), f'{what}[{j}].from'))
+        if item.get('to') is None and default_width is not None:
+            end = start + default_width
+        else:
+            end = round1(_finite(item.get('to'), f'{what}[{j}].to'))
+        if end < start:
+            raise ValueError(f'{what}[{j}]: "to" debe ser mayor o igual que "from"')
+        spans.append({'from': start, 'to': round1(end)})
+    return spans
+
+
+def normalize_room(room: Dict, door_clear: float) -> Dict:
+    """Forma canónica de un ambiente poligonal.
+
+    `points` son los vértices en cm (y crece hacia abajo, como en el dibujo); el muro
+    i va del punto i al i+1 y el último cierra el polígono. `walls` (opcional, uno por
+    muro) indica `id`, `use`, `maxDepth` (espacio libre frente al muro), `depth`
+    (profundidad fija), `obstacles` y `doors` como tramos `{from, to}` medidos desde el
+    inicio del muro; una puerta sin `to` ocupa la holgura de puerta del catálogo.
+    El polígono debe ser simple (sin cruces ni área nula): si no, ValueError.
+    """
+    if not isinstance(room, dict):
+        raise ValueError('room debe ser un objeto')
+    points = room.get('points')
+    if not isinstance(points, list) or not 3 <= len(points) <= MAX_WALLS:
+        raise ValueError(f'room.points debe tener entre 3 y {MAX_WALLS} vértices')
+    pts = []
+    for i, p in enumerate(points):
+        if not isinstance(p, (list, tuple)) or len(p) != 2:
+            raise ValueError(f'room.points[{i}] debe ser [x, y]')
+        pts.append([round1(_finite(p[0], f'room.points[{i}][0]')), round1(_finite(p[1], f'room.points[{i}][1]'))])
+    for axis in (0, 1):
+        if max(p[axis] for p in pts) - min(p[axis] for p in pts) > MAX_EXTENT:
+            raise ValueError(f'room.points: el ambiente no puede medir más de {MAX_EXTENT:g} cm por lado')
+    _check_simple(pts)
+    walls_in = room.get('walls')
+    if walls_in is None:
+        walls_in = [{} for _ in pts]
+    if not isinstance(walls_in, list) or len(walls_in) != len(pts):
+        raise ValueError('room.walls debe tener un elemento por muro (igual que room.points)')
+    walls = []
+    for i, w in enumerate(walls_in):
+        if not isinstance(w, dict):
+            raise ValueError(f'room.walls[{i}] debe ser un objeto')
+        wall = {
+            'id': str(w.get('id') or f'M{i + 1}'),
+            'use': bool(w.get('use', True)),
+            'obstacles': _spans(w.get('obstacles'), f'room.walls[{i}].obstacles'),
+            'doors': _spans(w.get('doors'), f'room.walls[{i}].doors', door_clear),
+        }
+        for field in ('maxDepth', 'depth'):
+            if w.get(field) is not None:
+                wall[field] = round1(_finite(w[field], f'room.walls[{i}].{field}'))
+        walls.append(wall)
+    if len({w['id'] for w in walls}) != len(walls):
+        raise ValueError('Los id de room.walls deben ser únicos')
+    return {'points': pts, 'walls': walls}
+
+
+def _cross(o: List[float], a: List[float], b: List[float]) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _segments_touch(p1: List[float], p2: List[float], q1: List[float], q2: List[float]) -> bool:
+    # Intersección cerrada de segmentos (incluye tocarse en un extremo o solaparse colineales)
+    d1, d2 = _cross(q1, q2, p1), _cross(q1, q2, p2)
+    d3, d4 = _cross(p1, p2, q1), _cross(p1, p2, q2)
+    if ((d1 > 0 > d2) or (d1 < 0 < d2)) and ((d3 > 0 > d4) or (d3 < 0 < d4)):
+        return True
+
+    def on_segment(a, b, c):
+        return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+    return ((d1 == 0 and on_segment(q1, q2, p1)) or (d2 == 0 and on_segment(q1, q2, p2))
+            or (d3 == 0 and on_segment(p1, p2, q1)) or (d4 == 0 and on_segment(p1, p2, q2)))
+
+
+def _check_simple(pts: List[List[float]]) -> None:
+    # El polígono debe ser simple: área no nula, sin muros que se crucen ni que vuelvan sobre el anterior
+    n = len(pts)
+    for i in range(n):
+        if pts[i] == pts[(i + 1) % n]:
+            raise ValueError(f'room.walls[{i}] tiene largo 0 (vértices repetidos)')
+    area2 = sum(_cross([0.0, 0.0], pts[i], pts[(i + 1) % n]) for i in range(n))
+    if abs(area2) < 1e-9:
+        raise ValueError('room.points no forma un polígono (área 0)')
+    for i in range(n):
+        a, b, c = pts[i - 1], pts[i], pts[(i + 1) % n]
+        # Muros consecutivos colineales en sentido contrario: se superponen
+        if _cross(a, b, c) == 0 and (b[0] - a[0]) * (c[0] - b[0]) + (b[1] - a[1]) * (c[1] - b[1]) < 0:
+            raise ValueError(f'room.points: los muros {(i - 1) % n + 1} y {i + 1} se superponen')
+    for i in range(n):
+        for j in range(i + 2, n):
+            if i == 0 and j == n - 1:
+                continue  # muros consecutivos (cierre del polígono)
+            if _segments_touch(pts[i], pts[(i + 1) % n], pts[j], pts[(j + 1) % n]):
+                raise ValueError(f'room.points se cruza a sí mismo (muros {i + 1} y {j + 1})')
+
+
+def _orientation(pts: List[List[float]]) -> int:
+    area2 = sum(pts[i][0] * pts[(i + 1) % len(pts)][1] - pts[(i + 1) % len(pts)][0] * pts[i][1]
+                for i in range(len(pts)))
+    return 1 if area2 > 0 else -1
+
+
+def room_geometry(pts: List[List[float]]) -> Tuple[List[Dict], List[float]]:
+    """Por muro: origen, dirección unitaria, normal hacia el interior y largo; y el
+    ángulo interior (grados) en cada vértice i, entre el muro i-1 y el muro i."""
+    n = len(pts)
+    orient = _orientation(pts)
+    walls = []
+    for i in range(n):
+        (x0, y0), (x1, y1) = pts[i], pts[(i + 1) % n]
+        length = math.hypot(x1 - x0, y1 - y0)
+        ax, ay = (x1 - x0) / length, (y1 - y0) / length
+        walls.append({'origin': (x0, y0), 'dir': (ax, ay), 'normal': (-ay * orient, ax * orient), 'length': length})
+    angles = []
+    for i in range(n):
+        ux, uy = walls[i - 1]['dir']
+        vx, vy = walls[i]['dir']
+        turn = math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+        angles.append(math.degrees(math.pi - turn * orient))
+    return walls, angles
+
+
+def corner_loss(angle: float, d_owner: float, d_other: float) -> float:
+    """Largo que pierde, desde la esquina, el muro que cede frente a la repisa del dueño."""
+    if angle >= STRAIGHT_ANGLE:
+        return 0.0
+    t = math.radians(angle)
+    if angle <= 90:
+        return (d_owner + d_other * math.cos(t)) / math.sin(t)
+    return math.sin(t) * min(d_owner, d_other / -math.cos(t))
+
+
+def _free_segments(length: float, start: float, end: float, blocked: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    # Tramos libres entre [start, length - end] descontando obstáculos y puertas
+    segments = []
+    pos, stop = start, length - end
+    for a, b in sorted(blocked):
+        if b <= pos:
+            continue
+        if a >= stop:
+            break
+        if a > pos:
+            segments.append((pos, a))
+        pos = max(pos, b)
+    if stop > pos:
+        segments.append((pos, stop))
+    return segments
+
+
+def _wall_cost(length: float, start: float, end: float, blocked: List[Tuple[float, float]],
+               cat: Catalogue) -> Tuple[Tuple[int, float], List[Tuple[float, List[float]]]]:
+    # (cortes, largo libre sin cubrir) y las piezas de cada tramo libre
+    cuts, waste, layout = 0, 0.0, []
+    for a, b in _free_segments(length, start, end, blocked):
+        pieces = [p for p in pack_lengths(b - a, cat) if p >= cat.min_len]
+        cuts += sum(1 for p in pieces if p < cat.max_len)
+        waste += (b - a) - sum(pieces)
+        layout.append((a, pieces))
+    return (cuts, round(waste, 6)), layout
+
+
+def plan_room(room: Dict, room_height: float, cat: Optional[Catalogue] = None, params: Optional[Dict] = None) -> Dict:
+    """Planifica un ambiente poligonal de N muros (ya normalizado con `normalize_room`).
+
+    Cada muro usado toma la mayor profundidad del catálogo que entra en su `maxDepth`
+    (o su `depth` fijo). En cada esquina convexa entre dos muros usados, uno de los dos
+    se queda con la esquina y el otro pierde el largo que ocupa la repisa del primero
+    (según el ángulo). Las esquinas se asignan con programación dinámica sobre el ciclo
+    de muros, minimizando cortes y luego largo sin cubrir: O(N) evaluaciones de muro.
+    """
+    cat = resolve_catalogue(params or {}, cat)
+    hl = pick_height_and_levels(room_height, cat)
+    if not hl:
+        return {"ok": False, "error": "Ninguna altura cumple la holgura de 40 cm al cielo."}
+
+    specs = room['walls']
+    geo, angles = room_geometry(room['points'])
+    n = len(specs)
+    depths: List[Optional[float]] = []
+    for spec in specs:
+        if not spec['use']:
+            depths.append(None)
+            continue
+        depth = spec.get('depth')
+        if depth is None:
+            depth = cat.pick_depth(spec['maxDepth'] if spec.get('maxDepth') is not None else float('inf'))
+        if not depth:
+            return {"ok": False, "error": f"No cabe ninguna profundidad en el muro {spec['id']}."}
+        depths.append(depth)
+    blocked = [[(span['from'], span['to']) for span in spec['obstacles'] + spec['doors']] for spec in specs]
+
+    # Vértice i: conflicto si los muros i-1 e i se usan y la esquina es convexa.
+    # Estado de la esquina: 0 = el muro i (siguiente) es dueño, 1 = el muro i-1 (anterior) es dueño.
+    conflict = [depths[i - 1] is not None and depths[i] is not None and angles[i] < STRAIGHT_ANGLE
+                for i in range(n)]
+    states = [(0, 1) if c else (0,) for c in conflict]
+
+    def losses(i: int, s_start: int, s_end: int) -> Tuple[float, float]:
+        start = corner_loss(angles[i], depths[i - 1], depths[i]) if conflict[i] and s_start == 1 else 0.0
+        j = (i + 1) % n
+        end = corner_loss(angles[j], depths[j], depths[i]) if conflict[j] and s_end == 0 else 0.0
+        return start, end
+
+    memo: Dict[Tuple[int, int, int], Tuple] = {}
+
+    def cost(i: int, s_start: int, s_end: int):
+        key = (i, s_start, s_end)
+        if key not in memo:
+            if depths[i] is None:
+                memo[key] = ((0, 0.0), [])
+            else:
+                start, end = losses(i, s_start, s_end)
+                memo[key] = _wall_cost(geo[i]['length'], start, end, blocked[i], cat)
+        return memo[key]
+
+    def add(a, b):
+        return (a[0] + b[0], a[1] + b[1])
+
+    best = None
+    for s0 in states[0]:
+        # dp[s] = costo acumulado hasta el vértice i con estado s; back[i][s] = estado del vértice i-1
+        dp = {s0: (0, 0.0)}
+        back: List[Dict[int, int]] = [{}]
+        for i in range(1, n):
+            nxt, choice = {}, {}
+            for s in states[i]:
+                for prev, acc in dp.items():
+                    cand = add(acc, cost(i - 1, prev, s)[0])
+                    if s not in nxt or cand < nxt[s]:
+                        nxt[s], choice[s] = cand, prev
+            dp = nxt
+            back.append(choice)
+        for last, acc in dp.items():
+            total = add(acc, cost(n - 1, last, s0)[0])
+            if best is None or total < best[0]:
+                path = [0] * n
+                path[0], path[n - 1] = s0, last
+                for i in range(n - 1, 1, -1):
+                    path[i - 1] = back[i][path[i]]
+                best = (total, path)
+    path = best[1]
+
+    plan: List[Dict] = []
+    walls_meta = []
+    for i, spec in enumerate(specs):
+        s_start, s_end = path[i], path[(i + 1) % n]
+        start, end = losses(i, s_start, s_end) if depths[i] is not None else (0.0, 0.0)
+        _, layout = cost(i, s_start, s_end)
+        for offset, pieces in layout:
+            for piece in pieces:
+                plan.append({"wall": spec['id'], "length": piece, "depth": depths[i], "height": hl["height"],
+                             "levels": hl["levels"], "offset": round1(offset)})
+                offset += piece
+        walls_meta.append({
+            "id": spec['id'],
+            "length": round1(geo[i]['length']),
+            "depth": depths[i],
+            "lossStart": round1(start),
+            "lossEnd": round1(end),
+        })
+    corners = [{"vertex": i, "angle": round1(angles[i]),
+                "owner": specs[i - 1]['id'] if path[i] == 1 else specs[i]['id']}
+               for i in range(n) if conflict[i]]
+
+    totals = {
+        "totalLen": round1(sum(p["length"] for p in plan)),
+        "pieces": len(plan),
+        "cuts": sum(1 for p in plan if p["length"] < cat.max_len),
+    }
+    meta = {
+        "catalogue": cat.name,
+        "hl": hl,
+        "walls": walls_meta,
+        "corners": corners,
+        "waste": round1(best[0][1]),
+    }
+    return {"ok": True, "plan": plan, "totals": totals, "meta": meta}
@@ -0,0 +1,203 @@
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from api_domain import resolve_catalogue
+from api_optimize import OBJECTIVES
+from api_room import MAX_EXTENT, normalize_room
+
+SHAPES = ("L", "U", "1")
+WALLS = ("A", "B", "E")
+COMPACT_MODES = ("meta", "columns")
+
+
+class ValidationError(ValueError):
+    """Parámetros inválidos, con un mensaje por campo en `errors`."""
+
+    def __init__(self, errors: Dict[str, str], message: str = "Parámetros inválidos"):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors
+
+    def payload(self) -> Dict:
+        return {"ok": False, "error": self.message, "errors": self.errors}
+
+
+def _number(value) -> float:
+    kind = type(value)
+    if kind is float or kind is int:
+        x = float(value)
+    else:
+        if kind is bool:
+            raise ValueError("debe ser un número")
+        try:
+            x = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("debe ser un número") from None
+    # Camino rápido: un solo chequeo descarta negativos, infinitos y NaN
+    if 0.0 <= x < math.inf:
+        return x
+    if not math.isfinite(x):
+        raise ValueError("debe ser un número finito")
+    raise ValueError("no puede ser negativo")
+
+
+def _measure(value) -> float:
+    x = _number(value)
+    if x > MAX_EXTENT:
+        raise ValueError(f"no puede superar {MAX_EXTENT:g} cm")
+    return x
+
+
+def _walls(value) -> List[str]:
+    if isinstance(value, str):
+        items = [w.strip() for w in value.split(",") if w.strip()]
+    elif isinstance(value, list):
+        items = [str(w).strip() for w in value]
+    else:
+        raise ValueError("debe ser una lista o texto separado por comas")
+    unknown = [w for w in items if w not in WALLS]
+    if unknown:
+        raise ValueError(f"muros desconocidos: {', '.join(unknown)} (válidos: {', '.join(WALLS)})")
+    return items
+
+
+def _choice(choices: Tuple[str, ...]) -> Callable:
+    def parse(value) -> str:
+        text = str(value).strip()
+        if text not in choices:
+            raise ValueError(f"debe ser uno de: {', '.join(choices)}")
+        return text
+    return parse
+
+
+def _lower_choice(choices: Tuple[str, ...]) -> Callable:
+    inner = _choice(choices)
+    return lambda value: inner(str(value).lower())
+
+
+def _text(value) -> str:
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise ValueError("debe ser texto")
+    return str(value).strip()
+
+
+def _flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text not in ("1", "true", "0", "false"):
+        raise ValueError("debe ser 1/true o 0/false")
+    return text in ("1", "true")
+
+
+class Field:
+    """Campo de entrada: nombre canónico, alias aceptados, conversión y valor por defecto."""
+    __slots__ = ("name", "aliases", "parse", "default")
+
+    def __init__(self, name: str, parse: Callable, default=None, aliases: Tuple[str, ...] = ()):
+        self.name = name
+        self.parse = parse
+        self.default = default
+        self.aliases = (name,) + aliases
+
+
+# Entrada del planificador clásico (A/B/E); `room` se valida aparte con normalize_room
+PLAN_FIELDS = (
+    Field("A", _measure, 0.0),
+    Field("B", _measure, 0.0),
+    Field("C", _measure, 0.0),
+    Field("D", _measure, 0.0),
+    Field("E", _measure, 0.0),
+    Field("roomHeight", _measure, 0.0, ("H",)),
+    Field("walls", _walls, []),
+    Field("shape", _choice(SHAPES), "L"),
+    Field("optimize", _lower_choice(OBJECTIVES)),
+    Field("catalogue", _text),
+)
+ROOM_FIELDS = tuple(f for f in PLAN_FIELDS if f.name in ("roomHeight", "catalogue"))
+# Opciones de /plan/bom (query string)
+BOM_FIELDS = (
+    Field("format", _lower_choice(("json", "csv")), "json"),
+    Field("kerf", _number, 0.0),
+    Field("detail", _flag, False),
+)
+# Campos propios de cada habitación de /report
+REPORT_FIELDS = (
+    Field("name", _text, ""),
+)
+# GET /plan exige las medidas en la query string
+QUERY_REQUIRED = ("A", "B", "C", "D", "E", "roomHeight")
+
+
+def parse_fields(source, fields: Iterable[Field], required: Tuple[str, ...] = ()) -> Tuple[Dict, Dict[str, str]]:
+    """Convierte `source` (dict o query string) según `fields`; devuelve (valores, errores)."""
+    values: Dict = {}
+    errors: Dict[str, str] = {}
+    get = source.get
+    for field in fields:
+        for alias in field.aliases:
+            raw = get(alias)
+            if raw is not None and raw != "":
+                break
+        else:
+            if field.name in required:
+                errors[field.name] = "campo requerido"
+            elif field.default is not None:
+                values[field.name] = list(field.default) if isinstance(field.default, list) else field.default
+            continue
+        try:
+            values[field.name] = field.parse(raw)
+        except ValueError as e:
+            errors[alias] = str(e)
+    return values, errors
+
+
+def parse_plan(source, required: Tuple[str, ...] = ()) -> Dict:
+    """Parámetros validados del planificador (A/B/E o `room`) a partir de un dict o query string.
+
+    Lanza ValidationError con todos los campos inválidos a la vez; los campos
+    desconocidos se ignoran. El catálogo pedido tiene que existir y, si viene
+    `room`, el polígono se valida con las reglas de `normalize_room`.
+    """
+    if not hasattr(source, "get"):
+        raise ValidationError({"input": "debe ser un objeto"})
+    room = source.get("room")
+    params, errors = parse_fields(source, ROOM_FIELDS if room is not None else PLAN_FIELDS, required)
+    cat = None
+    if "catalogue" in params or room is not None:
+        try:
+            cat = resolve_catalogue(params)
+        except ValueError as e:
+            errors["catalogue"] = str(e).strip("'\"")
+    if room is not None:
+        try:
+            params["room"] = normalize_room(room, cat.door_clear if cat else 0)
+        except ValueError as e:
+            errors["room"] = str(e)
+    if errors:
+        raise ValidationError(errors)
+    return params
+
+
+def parse_compact(value) -> Optional[str]:
+    """Modo compacto de respuesta: None, "meta" (sin meta) o "columns" (sin meta y piezas en columnas)."""
+    if value is None or value == "" or str(value).lower() in ("0", "false"):
+        return None
+    mode = str(value).lower()
+    if mode in ("1", "true"):
+        return "meta"
+    if mode not in COMPACT_MODES:
+        raise ValidationError({"compact": f"debe ser uno de: {', '.join(COMPACT_MODES)}"})
+    return mode
+
+
+def compact_result(result: Dict, mode: Optional[str]) -> Dict:
+    """Resultado del plan sin `meta` y, en modo "columns", con `plan` como columnas {campo: [valores]}."""
+    if mode is None:
+        return result
+    out = {k: v for k, v in result.items() if k != "meta"}
+    if mode == "columns" and "plan" in out:
+        plan = out["plan"]
+        keys = list(plan[0]) if plan else []
+        out["plan"] = {k: [p.get(k) for p in plan] for k in keys}
+    return out
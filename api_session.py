@@ -0,0 +1,143 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from api_domain import build_shelves_for_wall, plan_result, plan_walls
+from api_draw import SVG_FRAGMENTS, assemble_svg, render_svg_fragment, svg_fragment_inputs
+from api_schema import PLAN_FIELDS
+
+
+def merge_changes(params: Dict, changes: Dict) -> Dict:
+    """Parámetros de la sesión con los cambios aplicados (un alias como H reemplaza a roomHeight)."""
+    merged = dict(params)
+    for field in PLAN_FIELDS:
+        if any(alias in changes for alias in field.aliases):
+            for alias in field.aliases:
+                merged.pop(alias, None)
+    merged.update(changes)
+    return merged
+
+
+class PlanSession:
+    """Último plan y dibujo de una sesión de edición interactiva.
+
+    Guarda por muro su especificación (largo útil, profundidad, altura, niveles y
+    catálogo) con las piezas armadas, y por fragmento del SVG los valores de los que
+    depende con su marcado. `apply` solo vuelve a llamar a `build_shelves_for_wall`
+    para los muros cuya especificación cambió y solo regenera los fragmentos cuyos
+    valores cambiaron; devuelve únicamente esas diferencias.
+    """
+
+    def __init__(self):
+        self.id = secrets.token_urlsafe(12)
+        self.version = 0
+        self.params: Dict = {}
+        self.result: Optional[Dict] = None
+        self.walls: Dict[str, Tuple[Tuple, List[Dict]]] = {}
+        self.canvas: Optional[Tuple[float, float]] = None
+        self.fragments: Dict[str, Tuple[Optional[Tuple], str]] = {}
+        self.touched = time.time()
+        self.lock = threading.Lock()
+
+    def apply(self, params: Dict) -> Dict:
+        """Replanifica con `params` (ya validados y normalizados) y devuelve el parche.
+
+        Si el plan no es factible devuelve `{"ok": False, "error"}` y la sesión queda
+        como estaba.
+        """
+        stage = plan_walls(params)
+        if not stage["ok"]:
+            return stage
+        cat, hl = stage["cat"], stage["hl"]
+
+        walls: Dict[str, Tuple[Tuple, List[Dict]]] = {}
+        plan: List[Dict] = []
+        pieces: Dict[str, List[Dict]] = {}
+        for wall, length, depth in stage["walls"]:
+            spec = (length, depth, hl["height"], hl["levels"], cat.name, cat.version)
+            prev = self.walls.get(wall)
+            if prev is not None and prev[0] == spec:
+                built = prev[1]
+            else:
+                built = build_shelves_for_wall(wall, length, depth, hl["height"], hl["levels"], cat)
+                pieces[wall] = built
+            walls[wall] = (spec, built)
+            plan.extend(built)
+        for wall in self.walls:
+            if wall not in walls:
+                pieces[wall] = []
+        result = plan_result(stage, plan)
+
+        canvas, inputs = svg_fragment_inputs(params, result)
+        fragments: Dict[str, Tuple[Optional[Tuple], str]] = {}
+        changed: Dict[str, str] = {}
+        for name in SVG_FRAGMENTS:
+            prev = self.fragments.get(name)
+            if prev is not None and prev[0] == inputs[name]:
+                fragments[name] = prev
+            else:
+                fragments[name] = (inputs[name], render_svg_fragment(name, inputs[name]))
+                changed[name] = fragments[name][1]
+
+        patch = {"ok": True, "pieces": pieces, "totals": result["totals"], "svg": {"fragments": changed}}
+        if self.result is None or self.result["meta"] != result["meta"]:
+            patch["meta"] = result["meta"]
+        if canvas != self.canvas:
+            patch["svg"]["canvas"] = {"width": canvas[0], "height": canvas[1]}
+        self.params, self.result, self.walls = params, result, walls
+        self.canvas, self.fragments = canvas, fragments
+        self.version += 1
+        patch["version"] = self.version
+        return patch
+
+    def svg(self) -> str:
+        return assemble_svg(self.canvas, {name: markup for name, (_, markup) in self.fragments.items()})
+
+
+class SessionStore:
+    """Sesiones de edición en memoria del proceso, con vencimiento por inactividad y tope LRU."""
+
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, PlanSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expire(self, now: float) -> None:
+        # Las sesiones están en orden de último uso: las vencidas quedan al principio
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.touched <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def add(self, session: PlanSession) -> None:
+        with self._lock:
+            self._expire(time.time())
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            self._sessions[session.id] = session
+
+    def get(self, session_id: str) -> Optional[PlanSession]:
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touched = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire(time.time())
+            return {"sessions": len(self._sessions), "maxSessions": self.max_sessions, "ttlS": self.ttl,
+                    "evictions": self.evictions}
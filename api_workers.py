@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from api_draw import render_svg
+
+
+WEBP_QUALITY = 80
+
+
+class RenderError(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def render_image(input_data: Dict, result: Dict, fmt: str = 'png', width: int = 1200, height: int = 900,
+                 thumbnail: bool = False) -> bytes:
+    """SVG + rasterizado completo a PNG o WebP; corre dentro de un proceso del pool."""
+    # Render SVG y convertir a PNG preservando transparencias y colores
+    svg = render_svg(input_data, result, thumbnail=thumbnail)
+    if not svg or len(svg.strip()) == 0:
+        raise RenderError('SVG generado está vacío')
+    return rasterize_svg(svg, fmt, width, height)
+
+
+def rasterize_svg(svg: str, fmt: str = 'png', width: int = 1200, height: int = 900) -> bytes:
+    """Solo el rasterizado (cairosvg y, para WebP, Pillow) de un SVG ya generado."""
+    import cairosvg
+
+    # Convertir con parámetros específicos para evitar corrupción
+    png_bytes = cairosvg.svg2png(
+        bytestring=svg.encode('utf-8'),
+        output_width=width,
+        output_height=height,
+        background_color='white'
+    )
+    if not png_bytes or len(png_bytes) == 0:
+        raise RenderError('PNG generado está vacío')
+    if fmt == 'webp':
+        from PIL import Image
+
+        out = BytesIO()
+        Image.open(BytesIO(png_bytes)).save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+        return out.getvalue()
+    return png_bytes
+
+
+def report_page(input_data: Dict, result: Dict) -> Tuple[bytes, Dict[float, str]]:
+    """SVG del plan y contenido vectorial de su página de informe; corre dentro de un proceso del pool."""
+    from api_pdf import report_page_stream
+
+    return report_page_stream(render_svg(input_data, result))
+
+
+def warm_render_worker() -> None:
+    """Inicializador de los procesos del pool: importa cairosvg al arrancar y no en el primer render."""
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):
+        pass
+
+
+class RenderPool:
+    """Pool de procesos con cola acotada.
+
+    Como mucho `workers + max_queue` trabajos pueden estar en curso o
+    esperando; por encima de eso `submit` lanza QueueFull para que el
+    endpoint responda 503 en lugar de encolar sin límite. Con `workers=0`
+    el trabajo se ejecuta en el mismo hilo (útil para depurar).
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: Optional[float]):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers + max_queue))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Se crea en el primer uso, después del fork de los workers del servidor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_render_worker)
+            return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        if self.workers <= 0:
+            fut: Future = Future()
+            try:
+                fut.set_result(fn(*args))
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull()
+        try:
+            fut = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def run(self, fn, *args):
+        """Ejecuta y espera con el timeout configurado (lanza TimeoutError)."""
+        fut = self.submit(fn, *args)
+        try:
+            return fut.result(timeout=self.timeout)
+        except TimeoutError:
+            fut.cancel()
+            raise
+
+    def imap(self, fn, items: Iterable[Tuple], window: int) -> Iterator:
+        """Ejecuta `fn(*args)` por cada elemento y devuelve los resultados en orden.
+
+        Mantiene como mucho `window` trabajos propios en curso; si la cola del pool
+        está llena espera el más antiguo antes de reintentar, y solo lanza QueueFull
+        si no tiene ninguno en curso. Cada resultado espera como mucho el timeout.
+        """
+        pending = deque()
+        try:
+            for args in items:
+                while True:
+                    if len(pending) < window:
+                        try:
+                            pending.append(self.submit(fn, *args))
+                            break
+                        except QueueFull:
+                            if not pending:
+                                raise
+                    yield pending.popleft().result(timeout=self.timeout)
+            while pending:
+                yield pending.popleft().result(timeout=self.timeout)
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class JobStore:
+    """Trabajos de render asíncronos indexados por su clave de caché."""
+
+    def __init__(self, ttl: float, max_jobs: int):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        for job_id in [k for k, j in self._jobs.items() if now - j['created'] > self.ttl]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._expire(time.time())
+            return self._jobs.get(job_id)
+
+    def add(self, job_id: str, start: Callable[[], Future]) -> Dict:
+        """Registra `job_id` y recién entonces lanza el trabajo con `start()`.
+
+        Si el trabajo ya existe se devuelve sin lanzar nada. El lugar se
+        reserva antes de encolar: con el almacén lleno lanza QueueFull sin
+        tocar el pool, y si `start` falla (p. ej. QueueFull del pool) la
+        reserva se libera.
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if job_id in self._jobs:
+                return self._jobs[job_id]
+            if len(self._jobs) >= self.max_jobs:
+                raise QueueFull()
+            # Queda como `pending` mientras se encola
+            job = {'id': job_id, 'future': Future(), 'created': now}
+            self._jobs[job_id] = job
+        try:
+            job['future'] = start()
+        except BaseException:
+            with self._lock:
+                if self._jobs.get(job_id) is job:
+                    del self._jobs[job_id]
+            raise
+        return job
+
+    @staticmethod
+    def status(job: Dict) -> str:
+        fut = job['future']
+        if not fut.done():
+            return 'running' if fut.running() else 'pending'
+        return 'error' if fut.cancelled() or fut.exception() is not None else 'done'
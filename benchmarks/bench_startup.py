@@ -0,0 +1,157 @@
+"""Tiempo de arranque en frío de la API (objetivo para pods con autoescalado).
+
+Mide, en intérpretes nuevos:
+
+- `import`: desde que arranca el proceso hasta responder el primer /plan (import de
+  wsgi.py más el primer pedido, con el cliente de pruebas de Flask); además verifica
+  que ese camino no cargue módulos pesados (NumPy, reportlab, PyPDF2, cairosvg, Pillow).
+- `server` (con --server, requiere gunicorn): desde que se lanza gunicorn con
+  gunicorn.conf.py hasta que /healthz responde 200.
+
+Termina con código 1 si el p50 de alguna medición supera --target-ms o si /plan cargó
+un módulo pesado.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --server --workers 2 --target-ms 1500 -o arranque.json
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('numpy', 'reportlab', 'PyPDF2', 'cairosvg', 'PIL')
+
+# Se ejecuta en un intérprete nuevo; el tiempo 0 es el del proceso padre (pasado por argv)
+PROBE = '''
+import json, sys, time
+t0 = float(sys.argv[1])
+import wsgi
+t_import = time.time()
+resp = wsgi.app.test_client().get('/plan?A=300&B=250&C=60&D=60&E=200&H=250&walls=A,B,E&shape=U')
+t_plan = time.time()
+print(json.dumps({
+    'status': resp.status_code,
+    'import_ms': (t_import - t0) * 1000,
+    'ready_ms': (t_plan - t0) * 1000,
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY,)
+
+
+def _stats(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {
+        'n': len(values),
+        'min_ms': round(values[0], 1),
+        'p50_ms': round(values[len(values) // 2], 1),
+        'max_ms': round(values[-1], 1),
+    }
+
+
+def measure_import(runs: int, env: Dict) -> Dict:
+    imports, ready, heavy = [], [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE, repr(time.time())], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        data = json.loads(out.stdout.strip().splitlines()[-1])
+        if data['status'] != 200:
+            raise RuntimeError(f"/plan respondió {data['status']}")
+        imports.append(data['import_ms'])
+        ready.append(data['ready_ms'])
+        heavy.update(data['heavy'])
+    return {'import': _stats(imports), 'ready': _stats(ready), 'heavyLoaded': sorted(heavy)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, deadline: float) -> Optional[float]:
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as resp:
+                if resp.status == 200:
+                    return time.time()
+        except OSError:
+            time.sleep(0.01)
+    return None
+
+
+def measure_server(runs: int, workers: int, env: Dict, timeout: float) -> Dict:
+    gunicorn = shutil.which('gunicorn')
+    if gunicorn is None:
+        raise RuntimeError('gunicorn no está instalado')
+    ready = []
+    for _ in range(runs):
+        port = _free_port()
+        run_env = dict(env, PORT=str(port), BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(workers))
+        t0 = time.time()
+        proc = subprocess.Popen([gunicorn, '-c', 'gunicorn.conf.py', 'wsgi:app'], cwd=ROOT, env=run_env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            t_ready = _wait_ready(f'http://127.0.0.1:{port}/healthz', proc, t0 + timeout)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if t_ready is None:
+            raise RuntimeError(f'gunicorn no quedó listo en {timeout} s')
+        ready.append((t_ready - t0) * 1000)
+    return {'ready': _stats(ready), 'workers': workers}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--runs', type=int, default=10)
+    ap.add_argument('--server', action='store_true', help='medir también gunicorn hasta /healthz')
+    ap.add_argument('--workers', type=int, default=2, help='workers de gunicorn con --server')
+    ap.add_argument('--preload-heavy', default='', help='valor de PRELOAD_HEAVY para las mediciones')
+    ap.add_argument('--target-ms', type=float, default=1000.0, help='objetivo de arranque (p50)')
+    ap.add_argument('--timeout', type=float, default=30.0, help='espera máxima por servidor (s)')
+    ap.add_argument('-o', '--output', help='archivo JSON de resultados')
+    args = ap.parse_args()
+
+    env = dict(os.environ, PRELOAD_HEAVY=args.preload_heavy)
+    results = {'targetMs': args.target_ms, 'preloadHeavy': args.preload_heavy,
+               'import': measure_import(args.runs, env)}
+    if args.server:
+        results['server'] = measure_server(args.runs, args.workers, env, args.timeout)
+
+    failures = []
+    imp = results['import']
+    print(f"import wsgi:           p50 {imp['import']['p50_ms']:8.1f} ms  (min {imp['import']['min_ms']}, "
+          f"max {imp['import']['max_ms']})")
+    print(f"primer /plan:          p50 {imp['ready']['p50_ms']:8.1f} ms")
+    if imp['ready']['p50_ms'] > args.target_ms:
+        failures.append(f"primer /plan: p50 {imp['ready']['p50_ms']} ms > {args.target_ms} ms")
+    if imp['heavyLoaded'] and not args.preload_heavy:
+        failures.append('/plan cargó módulos pesados: ' + ', '.join(imp['heavyLoaded']))
+    if 'server' in results:
+        srv = results['server']['ready']
+        print(f"gunicorn hasta /healthz: p50 {srv['p50_ms']:6.1f} ms  ({args.workers} workers)")
+        if srv['p50_ms'] > args.target_ms:
+            failures.append(f"gunicorn: p50 {srv['p50_ms']} ms > {args.target_ms} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(dict(results, failures=failures), f, indent=2, ensure_ascii=False)
+    for line in failures:
+        print('FUERA DE OBJETIVO', line)
+    if failures:
+        sys.exit(1)
+    print(f'Arranque dentro del objetivo de {args.target_ms:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Suite de benchmarks del planificador, el SVG, el rasterizado PNG y el armado del PDF.
+
+Genera corpus de habitaciones deterministas (formas L/U/1, combinaciones de muros,
+muros largos que se parten en varios tramos y casos de puerta con D=0), mide cada
+etapa por separado y escribe los resultados en JSON:
+
+- throughput (operaciones por segundo), p50/p99 y media en ms
+- pico de memoria de Python (tracemalloc) en una pasada aparte, para no afectar los tiempos
+
+Uso:
+    python benchmarks/bench_suite.py -o resultados.json
+    python benchmarks/bench_suite.py --compare baseline.json --tolerance 0.2
+
+Con --compare se marca como regresión toda etapa cuyo p50, p99 o pico de memoria
+supere al de la línea base en más de la tolerancia, o cuyo throughput caiga en la
+misma proporción; el proceso termina con código 1 si hay alguna.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_catalog import catalogues  # noqa: E402
+from api_domain import plan_shelves_py  # noqa: E402
+from api_draw import render_svg  # noqa: E402
+
+MAX_LEN = catalogues.get().max_len
+WALL_COMBOS = [list(c) for n in (1, 2, 3) for c in itertools.combinations(['A', 'B', 'E'], n)]
+HEIGHTS = [200, 230, 250, 280, 320]
+METRICS = (('p50_ms', 1), ('p99_ms', 1), ('peak_kb', 1), ('throughput', -1))
+
+
+def _room(rng: random.Random, shape: str, walls: List[str], lo: float, hi: float, door: bool = False) -> Dict:
+    return {
+        'A': round(rng.uniform(lo, hi), 1),
+        'B': round(rng.uniform(lo, hi), 1),
+        'C': round(rng.uniform(30, 120), 1),
+        'D': 0 if door else round(rng.uniform(30, 120), 1),
+        'E': round(rng.uniform(lo, hi), 1),
+        'roomHeight': rng.choice(HEIGHTS),
+        'walls': walls,
+        'shape': shape,
+    }
+
+
+def build_corpora(rooms: int, seed: int) -> Dict[str, List[Dict]]:
+    """Corpus deterministas por categoría, `rooms` habitaciones cada uno."""
+    rng = random.Random(seed)
+    corpora: Dict[str, List[Dict]] = {'shapes': [], 'long_walls': [], 'door': []}
+    cases = list(itertools.product(['L', 'U', '1'], WALL_COMBOS))
+    for i in range(rooms):
+        shape, walls = cases[i % len(cases)]
+        corpora['shapes'].append(_room(rng, shape, walls, 100, MAX_LEN * 1.5))
+        # Muros de varias veces MAX_LEN: muchos tramos por muro
+        corpora['long_walls'].append(_room(rng, shape, walls, MAX_LEN * 2, MAX_LEN * 8))
+        # Puerta en E (D=0), con y sin E entre los muros
+        corpora['door'].append(_room(rng, shape, walls, 100, MAX_LEN * 3, door=True))
+    return corpora
+
+
+def sample_pdf(pages: int) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for i in range(pages):
+        c.setFont('Helvetica', 12)
+        for line in range(40):
+            c.drawString(40, 800 - line * 18, f'Cotización de prueba - página {i + 1} - línea {line + 1}')
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def measure(fn: Callable, items: List, memory_items: int) -> Dict:
+    """Tiempos por elemento y, en otra pasada, el pico de memoria del peor elemento."""
+    if items:
+        fn(items[0])  # calentamiento (imports perezosos, plantillas en caché)
+    times = []
+    t_start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        times.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - t_start
+
+    peak = 0
+    for item in items[:memory_items]:
+        tracemalloc.start()
+        fn(item)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    times.sort()
+    return {
+        'n': len(items),
+        'total_s': round(total, 4),
+        'throughput': round(len(items) / total, 2) if total > 0 else 0.0,
+        'mean_ms': round(sum(times) / len(times), 4) if times else 0.0,
+        'p50_ms': round(percentile(times, 0.50), 4),
+        'p99_ms': round(percentile(times, 0.99), 4),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _png_renderer() -> Tuple[Optional[Callable], Optional[str]]:
+    try:
+        from api_workers import render_image
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError) as e:
+        return None, f'cairosvg no disponible: {e}'.splitlines()[0]
+    return render_image, None
+
+
+def run(args) -> Dict:
+    corpora = build_corpora(args.rooms, args.seed)
+    rooms = [r for corpus in corpora.values() for r in corpus]
+    stages: Dict[str, Dict] = {}
+
+    for name, corpus in corpora.items():
+        stages[f'plan[{name}]'] = measure(plan_shelves_py, corpus, args.memory_items)
+    stages['plan'] = measure(plan_shelves_py, rooms, args.memory_items)
+
+    planned = [(r, res) for r in rooms for res in [plan_shelves_py(r)] if res.get('ok')]
+    stages['svg'] = measure(lambda x: render_svg(*x), planned, args.memory_items)
+    pieces = [len(res['plan']) for _, res in planned]
+
+    # Etapas pesadas sobre una muestra repartida en todo el corpus
+    step = max(1, len(planned) // args.heavy) if args.heavy > 0 else len(planned) + 1
+    heavy = planned[::step][:args.heavy]
+    svgs = [render_svg(r, res) for r, res in heavy]
+
+    skipped: Dict[str, str] = {}
+    render_image, reason = _png_renderer()
+    if render_image is None:
+        skipped['png'] = reason
+    else:
+        stages['png'] = measure(lambda x: render_image(*x), heavy, min(args.memory_items, 5))
+
+    try:
+        from api_pdf import build_plan_page, merge_plan_page_bytes
+        pdf_data = sample_pdf(args.pdf_pages)
+    except ImportError as e:
+        skipped['page'] = skipped['merge'] = f'dependencias de PDF no disponibles: {e}'
+    else:
+        stages['page'] = measure(lambda svg: build_plan_page(svg=svg), svgs, min(args.memory_items, 5))
+        pages = [build_plan_page(svg=svg) for svg in svgs]
+        stages['merge'] = measure(lambda page: merge_plan_page_bytes(pdf_data, page), pages,
+                                  min(args.memory_items, 5))
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'rooms': {name: len(c) for name, c in corpora.items()},
+            'feasible': len(planned),
+            'maxPieces': max(pieces) if pieces else 0,
+            'heavySample': len(heavy),
+            'pdfPages': args.pdf_pages,
+            'skipped': skipped,
+        },
+        'stages': stages,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lista de regresiones respecto de `baseline` (vacía si no hay)."""
+    regressions = []
+    for stage, cur in current['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base:
+            continue
+        for metric, direction in METRICS:
+            old, new = base.get(metric), cur.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * direction
+            if change > tolerance:
+                regressions.append(f'{stage}.{metric}: {old} -> {new} ({change:+.0%})')
+    return regressions
+
+
+def print_table(results: Dict) -> None:
+    print(f'{"etapa":22s} {"n":>6s} {"ops/s":>10s} {"p50 ms":>10s} {"p99 ms":>10s} {"pico KB":>10s}')
+    for stage, r in results['stages'].items():
+        print(f'{stage:22s} {r["n"]:6d} {r["throughput"]:10.1f} {r["p50_ms"]:10.3f} '
+              f'{r["p99_ms"]:10.3f} {r["peak_kb"]:10.1f}')
+    for stage, reason in results['meta']['skipped'].items():
+        print(f'{stage:22s} omitida: {reason}')
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rooms', type=int, default=500, help='habitaciones por corpus')
+    ap.add_argument('--heavy', type=int, default=40, help='muestra para PNG y PDF')
+    ap.add_argument('--memory-items', type=int, default=50, help='elementos medidos con tracemalloc')
+    ap.add_argument('--pdf-pages', type=int, default=5, help='páginas del PDF de prueba')
+    ap.add_argument('--seed', type=int, default=1234)
+    ap.add_argument('-o', '--output', help='archivo JSON de resultados')
+    ap.add_argument('--compare', help='JSON de línea base contra el cual comparar')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='margen antes de marcar regresión (0.2 = 20%%)')
+    args = ap.parse_args()
+
+    results = run(args)
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESIÓN', line)
+        if regressions:
+            sys.exit(1)
+        print('Sin regresiones respecto de', args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""Planificación y dibujo por lotes desde archivos, sin pasar por la API HTTP.
+
+Lee habitaciones de un CSV (una columna por campo de /plan: A,B,C,D,E,H,shape,walls,
+catalogue,optimize, y `room` como JSON) o de un JSONL (la misma entrada que POST /plan,
+una por línea). Por cada una escribe en un directorio o en un archivo .zip:
+
+- `<nombre>.json`: `{ input, result }` como /plan más `key`, el hash de la entrada (siempre);
+- `<nombre>.svg`, `<nombre>.png` y `<nombre>.pdf` (página del plano) con --svg, --png y --pdf;
+- con --report, `report.pdf`: una página por habitación, como POST /report.
+
+El nombre es el campo `id` de la fila (saneado) o `room-<hash>` de la entrada validada,
+así que no depende del orden ni de la corrida. Si dos filas quedan con el mismo nombre (ids
+repetidos o que coinciden al sanearlos), la segunda lleva además `-<hash>` y, si ese nombre
+también está tomado, falla. Los archivos se escriben de forma atómica, el .json al final, y
+una nueva corrida sobre la misma salida saltea las habitaciones que ya tienen todos sus
+archivos y cuyo .json tiene la misma `key`: si la entrada cambió, se vuelve a dibujar. Con un .zip los archivos se juntan en `<salida>.parts/` y el .zip (con el
+contenido del anterior, si existía) se arma al final; si la corrida se corta, la siguiente
+retoma desde ese directorio.
+
+El trabajo se reparte en procesos (--workers, por defecto uno por CPU; 0 para hacerlo en
+el mismo proceso). Termina con código 1 si alguna habitación falló.
+
+Uso:
+    python cli.py habitaciones.csv -o salida/ --svg --pdf
+    python cli.py habitaciones.jsonl -o planos.zip --png --report --workers 8
+
+Como biblioteca: `run(read_rooms("habitaciones.csv"), "salida", formats=("json", "svg"))`.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api_cache import canonical_key, plan_shelves_cached
+from api_draw import render_svg
+from api_schema import REPORT_FIELDS, ValidationError, parse_fields, parse_plan
+from api_workers import RenderPool, rasterize_svg
+
+FORMATS = ('json', 'svg', 'png', 'pdf')
+REPORT_NAME = 'report.pdf'
+MAX_ERRORS = 100
+# Fecha fija de las entradas del .zip para que el archivo solo dependa del contenido
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def read_rooms(path: str) -> Iterator[Optional[Dict]]:
+    """Filas de un CSV (por extensión .csv) o JSONL, de a una; una línea JSON inválida da None."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                row = {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip()}
+                if row.get('room', '').startswith('{'):
+                    try:
+                        row['room'] = json.loads(row['room'])
+                    except ValueError:
+                        pass
+                yield row
+            return
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+
+def room_name(row: Dict, key: str) -> str:
+    # `id` de la fila si queda algo usable después de sanearlo; si no, hash de la entrada validada
+    name = re.sub(r'[^\w.-]+', '_', str(row.get('id', ''))).strip('._')[:100]
+    return name or 'room-' + key[:16]
+
+
+def stored_key(sink: 'DirectoryOutput', name: str) -> Optional[str]:
+    # `key` del .json de una corrida anterior (None si falta o no se puede leer)
+    try:
+        return json.loads(sink.read(f'{name}.json')).get('key')
+    except (OSError, KeyError, ValueError, AttributeError):
+        return None
+
+
+def process_room(index: int, name: str, key: str, params: Dict, formats: Tuple[str, ...], page: bool) -> Dict:
+    """Planifica y dibuja una habitación; corre dentro de un proceso del pool.
+
+    Devuelve {index, name, ok, error} y, si el plan es factible, `files` (extensión ->
+    bytes) y `page` (contenido de su página de informe) si se pidió.
+    """
+    out = {'index': index, 'name': name, 'ok': False}
+    try:
+        params, result = plan_shelves_cached(params)
+        if not result.get('ok'):
+            out['error'] = result.get('error', 'Error desconocido')
+            return out
+        files = {}
+        if 'json' in formats:
+            files['json'] = json.dumps({'input': params, 'result': result, 'key': key}, sort_keys=True,
+                                       ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if page or any(fmt in formats for fmt in ('svg', 'png', 'pdf')):
+            from api_pdf import build_plan_page, report_page_stream
+
+            svg = render_svg(params, result)
+            if 'svg' in formats:
+                files['svg'] = svg.encode('utf-8')
+            if 'png' in formats:
+                files['png'] = rasterize_svg(svg)
+            if 'pdf' in formats:
+                files['pdf'] = build_plan_page(svg=svg)
+            if page:
+                out['page'] = report_page_stream(svg)
+    except Exception as e:
+        out['error'] = f'{type(e).__name__}: {e}'
+        return out
+    out['ok'] = True
+    out['files'] = files
+    return out
+
+
+def process_rooms(tasks: List[Tuple]) -> List[Dict]:
+    # Un trabajo del pool procesa varias habitaciones para repartir el costo de enviar cada una
+    return [process_room(*task) for task in tasks]
+
+
+class DirectoryOutput:
+    """Archivos sueltos en un directorio; cada uno se escribe en un temporal y se renombra."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, name))
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+    def write(self, name: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.path, name))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def close(self) -> None:
+        pass
+
+
+class ZipOutput(DirectoryOutput):
+    """Archivo .zip armado al final desde `<ruta>.parts/` más las entradas del .zip anterior.
+
+    Las entradas van ordenadas por nombre y con fecha fija, así que el mismo contenido
+    produce el mismo .zip.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path + '.parts')
+        self.archive = path
+        self.previous = set()
+        self.old: Optional[zipfile.ZipFile] = None
+        if os.path.exists(path):
+            self.old = zipfile.ZipFile(path)
+            self.previous = set(self.old.namelist())
+
+    def exists(self, name: str) -> bool:
+        return name in self.previous or super().exists(name)
+
+    def read(self, name: str) -> bytes:
+        # Lo escrito en esta corrida (o en una cortada) pisa al .zip anterior
+        if super().exists(name):
+            return super().read(name)
+        return self.old.read(name)
+
+    def close(self) -> None:
+        staged = {name for name in os.listdir(self.path) if not name.startswith('.tmp-')}
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.archive)), suffix='.zip')
+        os.close(fd)
+        try:
+            try:
+                with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for name in sorted(staged | self.previous):
+                        if name in staged:
+                            with open(os.path.join(self.path, name), 'rb') as f:
+                                data = f.read()
+                        else:
+                            data = self.old.read(name)
+                        zf.writestr(zipfile.ZipInfo(name, ZIP_DATE), data, zipfile.ZIP_DEFLATED)
+            finally:
+                if self.old is not None:
+                    self.old.close()
+                    self.old = None
+            os.replace(tmp, self.archive)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def open_output(path: str) -> DirectoryOutput:
+    return ZipOutput(path) if path.lower().endswith('.zip') else DirectoryOutput(path)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(rooms: Iterable[Optional[Dict]], out: str, formats: Iterable[str] = ('json',), report: bool = False,
+        workers: Optional[int] = None, chunk: int = 16, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Procesa `rooms` (filas como las de read_rooms) y escribe los resultados en `out`.
+
+    Las habitaciones que ya tienen todos sus archivos en `out`, con la misma entrada, no se
+    vuelven a dibujar (sí se planifican si hace falta su página para --report). Devuelve el resumen
+    {rooms, written, skipped, failed, errors, report, seconds}; `progress` recibe el
+    resumen parcial después de cada bloque.
+    """
+    t0 = time.perf_counter()
+    formats = tuple(fmt for fmt in FORMATS if fmt in set(formats) | {'json'})
+    if workers is None:
+        workers = os.cpu_count() or 1
+    sink = open_output(out)
+    summary = {'rooms': 0, 'written': 0, 'skipped': 0, 'failed': 0, 'errors': [], 'report': False}
+
+    def fail(index: int, error) -> None:
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_ERRORS:
+            summary['errors'].append({'row': index, 'error': error})
+
+    labels: Dict[int, str] = {}
+    # Nombres ya usados en esta corrida
+    names = set()
+
+    def tasks() -> Iterator[Tuple]:
+        # Validación y nombre en el proceso principal: las filas inválidas y las ya hechas no viajan al pool
+        for index, row in enumerate(rooms):
+            summary['rooms'] += 1
+            try:
+                if not isinstance(row, dict):
+                    raise ValidationError({'input': 'debe ser un objeto'})
+                params = parse_plan(row.get('input') or row)
+                options, errors = parse_fields(row, REPORT_FIELDS)
+                if errors:
+                    raise ValidationError(errors)
+            except ValidationError as e:
+                fail(index, e.errors)
+                continue
+            key = canonical_key(params)
+            name = room_name(row, key)
+            if name in names:
+                # Id repetido o que coincide con otro al sanearlo: se desambigua con el hash de la entrada
+                name = f'{name}-{key[:8]}'
+                if name in names:
+                    fail(index, {'id': f'nombre duplicado: {name}'})
+                    continue
+            names.add(name)
+            done = all(sink.exists(f'{name}.{fmt}') for fmt in formats) and stored_key(sink, name) == key
+            if done:
+                summary['skipped'] += 1
+                if not report:
+                    continue
+            if report:
+                labels[index] = options['name'] or str(row.get('id', ''))
+            yield index, name, key, params, () if done else formats, report
+
+    pool = RenderPool(workers=workers, max_queue=2 * max(1, workers), timeout=None)
+    pages: List[Tuple[bytes, Dict[float, str]]] = []
+    page_labels: List[str] = []
+    try:
+        for results in pool.imap(process_rooms, ((c,) for c in _chunks(tasks(), chunk)), window=2 * max(1, workers)):
+            for res in results:
+                if not res['ok']:
+                    fail(res['index'], res['error'])
+                    continue
+                # El .json va último: si la corrida se corta, una habitación sin .json se vuelve a dibujar
+                for fmt, data in sorted(res['files'].items(), key=lambda item: item[0] == 'json'):
+                    sink.write(f"{res['name']}.{fmt}", data)
+                if res['files']:
+                    summary['written'] += 1
+                if 'page' in res:
+                    pages.append(res['page'])
+                    page_labels.append(labels[res['index']])
+            if progress is not None:
+                progress(summary)
+        if report and pages:
+            from api_pdf import iter_report
+
+            sink.write(REPORT_NAME, b''.join(iter_report(pages, page_labels)))
+            summary['report'] = True
+    finally:
+        pool.shutdown()
+        sink.close()
+    summary['seconds'] = round(time.perf_counter() - t0, 3)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('input', help='archivo .csv o .jsonl con una habitación por fila')
+    ap.add_argument('-o', '--output', required=True, help='directorio de salida o archivo .zip')
+    for fmt, text in (('svg', 'SVG del plano'), ('png', 'PNG del plano (requiere cairosvg)'),
+                      ('pdf', 'página PDF del plano')):
+        ap.add_argument(f'--{fmt}', action='store_true', help=f'escribir el {text} de cada habitación')
+    ap.add_argument('--report', action='store_true', help=f'escribir {REPORT_NAME} con una página por habitación')
+    ap.add_argument('--workers', type=int, default=None, help='procesos (por defecto uno por CPU; 0 sin pool)')
+    ap.add_argument('--chunk', type=int, default=16, help='habitaciones por trabajo del pool')
+    ap.add_argument('-q', '--quiet', action='store_true', help='sin progreso en stderr')
+    args = ap.parse_args(argv)
+
+    def progress(summary: Dict) -> None:
+        print(f"\r{summary['rooms']} habitaciones: {summary['written']} escritas, {summary['skipped']} salteadas, "
+              f"{summary['failed']} con error", end='', file=sys.stderr, flush=True)
+
+    formats = [fmt for fmt in FORMATS if fmt == 'json' or getattr(args, fmt)]
+    summary = run(read_rooms(args.input), args.output, formats, report=args.report, workers=args.workers,
+                  chunk=max(1, args.chunk), progress=None if args.quiet else progress)
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Configuración de gunicorn para producción (todo ajustable por variables de entorno).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import random
+
+_cpus = os.cpu_count() or 1
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', str(_cpus)))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Importar la app en el maestro y hacer fork después (ver wsgi.py y PRELOAD_HEAVY)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true')
+
+# Por encima de RENDER_TIMEOUT_S para que el timeout del pool responda antes que gunicorn
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+
+# El latido de los workers en memoria y no en el disco del contenedor
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Cada worker web tiene su propio pool de rasterizado; repartir los CPUs entre ellos
+# en lugar de crear `workers * cpus` procesos (se lee al importar api.py)
+os.environ.setdefault('RENDER_WORKERS', str(max(1, _cpus // max(1, workers))))
+
+
+def when_ready(server):
+    import wsgi
+
+    if preload_app:
+        server.log.info('App cargada en %s ms; precargados: %s', wsgi.STARTUP_MS, ', '.join(wsgi.PRELOADED) or '-')
+
+
+def post_fork(server, worker):
+    # Sin esto todos los workers heredan el mismo estado de `random` del maestro y
+    # el perfilador muestrea los mismos pedidos en todos
+    random.seed()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Los módulos de la API viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Rate limit y load shedding apagados por defecto: los tests que los prueban crean sus propias instancias
+os.environ.setdefault('RATE_LIMIT_PER_S', '0')
+os.environ.setdefault('SHED_CAPACITY', '0')
@@ -0,0 +1,40 @@
+import pytest
+
+import api
+
+ADMIN_CALLS = [("delete", "/plan/cache"), ("delete", "/render/cache"), ("post", "/catalogues/reload")]
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+@pytest.mark.parametrize("method,path", ADMIN_CALLS)
+def test_admin_endpoints_are_disabled_without_a_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert getattr(client, method)(path).status_code == 403
+
+
+@pytest.mark.parametrize("method,path", ADMIN_CALLS)
+@pytest.mark.parametrize("header", [None, "Bearer wrong", "Basic s3cret"])
+def test_admin_endpoints_reject_missing_or_wrong_tokens(client, monkeypatch, method, path, header):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": header} if header else {}
+    res = getattr(client, method)(path, headers=headers)
+    assert res.status_code == 401
+    assert res.headers["WWW-Authenticate"] == "Bearer"
+
+
+@pytest.mark.parametrize("method,path", ADMIN_CALLS)
+def test_admin_endpoints_accept_the_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "s3cret")
+    res = getattr(client, method)(path, headers={"Authorization": "Bearer s3cret"})
+    assert res.status_code == 200
+    assert res.get_json()["ok"]
+
+
+def test_read_only_endpoints_stay_public(client, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "s3cret")
+    for path in ("/plan/cache", "/render/cache", "/catalogues"):
+        assert client.get(path).status_code == 200
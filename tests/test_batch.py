@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+import api
+from api_batch import plan_shelves_batch
+from api_cache import plan_cache
+from api_domain import plan_shelves_py
+
+
+def _rooms(n, seed=7):
+    rnd = random.Random(seed)
+    rooms = []
+    for _ in range(n):
+        rooms.append({
+            "A": rnd.choice([0, 30, 130, 243, 250, 486, 700.5]),
+            "B": rnd.choice([0, 45, 250, 300, 520]),
+            "C": rnd.choice([0, 25, 50, 80, 200]),
+            "D": rnd.choice([0, 25, 50, 80, 200]),
+            "E": rnd.choice([0, 39, 250, 480]),
+            "roomHeight": rnd.choice([100, 180, 240, 250, 300]),
+            "walls": rnd.choice([["A"], ["A", "B"], ["A", "E"], ["A", "B", "E"], ["B"], ["E"], []]),
+            "shape": rnd.choice(["L", "U", "1"]),
+        })
+    return rooms
+
+
+@pytest.fixture
+def client():
+    plan_cache.clear()
+    return api.app.test_client()
+
+
+def test_batch_planner_matches_scalar_planner():
+    rooms = _rooms(2000)
+    assert plan_shelves_batch(rooms) == [plan_shelves_py(room) for room in rooms]
+
+
+def test_batch_endpoint_matches_plan_endpoint(client):
+    rooms = _rooms(50, seed=3)
+    body = client.post("/plan/batch", json={"rooms": rooms}).get_json()
+    assert body["count"] == len(rooms)
+    for room, row in zip(rooms, body["results"]):
+        single = client.post("/plan", json=room).get_json()
+        assert row["result"] == single["result"]
+
+
+def test_batch_endpoint_accepts_columns_and_marks_invalid_rows(client):
+    rooms = _rooms(3, seed=5)
+    columns = {key: [room[key] for room in rooms] for key in rooms[0]}
+    body = client.post("/plan/batch", json={"columns": columns}).get_json()
+    assert [row["result"] for row in body["results"]] == [plan_shelves_py(room) for room in rooms]
+
+    body = client.post("/plan/batch", json=[rooms[0], dict(rooms[1], A="x")]).get_json()
+    assert body["results"][0]["result"] == plan_shelves_py(rooms[0])
+    assert body["results"][1]["ok"] is False
+
+
+def test_batch_rows_are_normalized_like_plan(client):
+    rooms = [
+        {"A": 100.04, "B": 243.04, "C": 50, "D": 50, "E": 0, "H": 250, "walls": ["B", "A", "A"], "shape": "L"},
+        {"A": 249.96, "B": 130.01, "C": 30, "D": 30.04, "E": 120.05, "H": 250, "walls": "E, B,A,B", "shape": "U"},
+    ]
+    body = client.post("/plan/batch", json=rooms).get_json()
+    for room, row in zip(rooms, body["results"]):
+        single = client.post("/plan", json=room).get_json()
+        assert row["input"] == single["input"]
+        assert row["result"] == single["result"]
+    assert body["results"][0]["input"]["walls"] == ["A", "B"]
+    assert body["results"][0]["input"]["A"] == 100.0
+
+
+def test_batch_rows_with_optimize_use_the_optimizer(client):
+    room = {"A": 200, "B": 300, "C": 50, "D": 50, "E": 100, "H": 250, "walls": ["A", "B"], "optimize": "waste"}
+    body = client.post("/plan/batch", json=[room, dict(room, optimize=None)]).get_json()
+    optimized, classic = body["results"]
+    assert optimized["result"]["meta"]["optimizer"]["objective"] == "waste"
+    assert optimized["result"] == client.post("/plan", json=room).get_json()["result"]
+    assert "optimizer" not in classic["result"]["meta"]
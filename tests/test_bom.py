@@ -0,0 +1,84 @@
+import random
+from bisect import bisect_left, insort
+
+import pytest
+
+import api
+from api_bom import _to_tenths, cut_stock
+from api_cache import plan_cache
+
+
+def _bfd_one_by_one(demand, stock, kerf):
+    # Best Fit Decreasing de libro: cada corte, de mayor a menor, a la tabla con menos sobrante donde entra
+    capacity = _to_tenths(stock) + _to_tenths(kerf)
+    boards = []  # [(sobrante, orden de apertura, patrón)] ordenadas por sobrante
+    opened = 0
+    for length in sorted(demand, reverse=True):
+        need = _to_tenths(length) + _to_tenths(kerf)
+        for _ in range(demand[length]):
+            i = bisect_left(boards, (need, -1, ()))
+            if i == len(boards):
+                insort(boards, (capacity - need, opened, (_to_tenths(length),)))
+                opened += 1
+            else:
+                remaining, order, pattern = boards.pop(i)
+                insort(boards, (remaining - need, order, pattern + (_to_tenths(length),)))
+    counts = {}
+    for remaining, _, pattern in boards:
+        key = (pattern, max(0, remaining - _to_tenths(kerf)))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batched_cut_stock_uses_as_many_boards_as_one_by_one(seed):
+    rnd = random.Random(seed)
+    demand = {rnd.choice([30, 45.5, 60, 80, 90, 120, 121.5, 150, 200, 243]): rnd.randint(1, 40) for _ in range(6)}
+    kerf = rnd.choice([0, 0.3, 1])
+    rows = cut_stock(demand, 243, kerf)
+    assert sum(count for _, count, _ in rows) == sum(_bfd_one_by_one(demand, 243, kerf).values())
+    cuts = {}
+    for pattern, count, offcut in rows:
+        assert sum(pattern) + len(pattern) * _to_tenths(kerf) <= _to_tenths(243) + _to_tenths(kerf)
+        for piece in pattern:
+            cuts[piece] = cuts.get(piece, 0) + count
+    assert cuts == {_to_tenths(length): n for length, n in demand.items()}
+
+
+def test_bom_counts_every_piece_of_every_room():
+    plan_cache.clear()
+    client = api.app.test_client()
+    rooms = [
+        {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"},
+        {"A": 400, "B": 260, "C": 50, "D": 50, "E": 260, "H": 250, "walls": ["A", "B", "E"], "shape": "U",
+         "quantity": 3},
+    ]
+    body = client.post("/plan/bom", json=rooms).get_json()
+    plans = [client.post("/plan", json=room).get_json()["result"]["plan"] for room in rooms]
+    pieces = len(plans[0]) + 3 * len(plans[1])
+    assert body["summary"]["rooms"] == 4
+    assert body["summary"]["pieces"] == sum(g["count"] for g in body["groups"]) == pieces
+    assert body["summary"]["stockBoards"] >= body["summary"]["lowerBound"]
+
+
+@pytest.mark.parametrize("field, value, error", [
+    ("length", 0, "debe ser un número positivo"),
+    ("length", "x", "debe ser un número positivo"),
+    ("depth", True, "debe ser un número positivo"),
+    ("height", float("nan"), "debe ser un número positivo"),
+    ("levels", -3, "debe ser un entero positivo"),
+    ("levels", 2.5, "debe ser un entero positivo"),
+])
+def test_bom_rejects_invalid_posted_pieces(field, value, error):
+    plan_cache.clear()
+    client = api.app.test_client()
+    room = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+    good = client.post("/plan", json=room).get_json()
+    bad = {"input": room, "result": {**good["result"], "plan": [dict(p) for p in good["result"]["plan"]]}}
+    bad["result"]["plan"][1][field] = value
+    resp = client.post("/plan/bom", data=api.app.json.dumps([good, bad]), content_type="application/json")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["summary"]["rooms"] == 1 and body["summary"]["failed"] == 1
+    assert body["errors"] == [{"row": 1, "error": {f"result.plan[1].{field}": error}}]
+    assert body["summary"]["pieces"] == len(good["result"]["plan"])
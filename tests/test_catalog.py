@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+import api
+import api_domain
+from api_cache import plan_cache, plan_shelves_cached
+from api_catalog import BUILTIN, CatalogueStore, compile_catalogue
+
+ROOM = {"A": 300, "B": 250, "C": 50, "D": 50, "E": 0, "H": 250, "walls": ["A"], "shape": "1"}
+
+
+def _definition(**changes):
+    entry = dict(BUILTIN.summary(), **changes)
+    entry = {k: entry[k] for k in ("depths", "maxLen", "minLen", "doorClear", "heightOptions")}
+    return {"default": "estandar", "catalogues": {"estandar": entry}}
+
+
+def _write(path, data, bump):
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+    # Forzar un mtime distinto aunque la escritura caiga en el mismo tick del reloj
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + bump))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "catalogues.json"
+    _write(path, _definition(), 0)
+    store = CatalogueStore(str(path), check_interval=0)
+    monkeypatch.setattr(api_domain, "catalogues", store)
+    monkeypatch.setattr(api, "catalogues", store)
+    plan_cache.clear()
+    yield store
+    plan_cache.clear()
+
+
+def test_compiled_tables_pick_depth_and_height():
+    assert BUILTIN.depths == (68, 48, 38, 28)
+    assert BUILTIN.pick_depth(50) == 48
+    assert BUILTIN.pick_depth(10) is None
+    assert BUILTIN.pick_depth(float("nan")) is None
+    assert BUILTIN.pick_height(260) == (250, 5)
+    assert BUILTIN.pick_height(199) is None
+
+
+@pytest.mark.parametrize("changes", [
+    {"depths": []}, {"depths": [30, -1]}, {"maxLen": "243"}, {"minLen": 300},
+    {"heightOptions": [{"h": 250, "levels": [0]}]}, {"doorClear": True},
+])
+def test_invalid_catalogues_are_rejected(changes):
+    with pytest.raises(ValueError):
+        compile_catalogue("x", _definition(**changes)["catalogues"]["estandar"])
+
+
+def test_hot_reload_picks_up_new_tables(store, tmp_path):
+    assert store.get().max_len == 243
+    _, before = plan_shelves_cached(ROOM)
+    assert [p["length"] for p in before["plan"]] == [243, 57.0]
+
+    _write(tmp_path / "catalogues.json", _definition(maxLen=150, depths=[60, 30]), 10)
+    cat = store.get()
+    assert (cat.max_len, cat.depths) == (150, (60, 30))
+    assert store.version == 2 and cat.version == 2
+    # La versión nueva entra en la clave: el plan cacheado con la anterior no se reutiliza
+    _, after = plan_shelves_cached(ROOM)
+    assert [p["length"] for p in after["plan"]] == [150, 150]
+    assert {p["depth"] for p in after["plan"]} == {60}
+
+
+@pytest.mark.parametrize("content", ["{no es json", _definition(maxLen=-1), {"catalogues": {}}])
+def test_corrupt_file_keeps_the_previous_catalogue(store, tmp_path, content):
+    _write(tmp_path / "catalogues.json", content, 10)
+    assert store.get().max_len == 243
+    assert store.version == 1
+    assert store.last_error
+    assert store.reload() is False
+    assert store.stats()["lastError"] == store.last_error
+
+    _write(tmp_path / "catalogues.json", _definition(maxLen=200), 20)
+    assert store.get().max_len == 200 and store.last_error is None
+
+
+def test_requests_choose_the_catalogue(store, tmp_path):
+    data = _definition()
+    data["catalogues"]["corto"] = dict(data["catalogues"]["estandar"], maxLen=100)
+    _write(tmp_path / "catalogues.json", data, 10)
+    client = api.app.test_client()
+    plan = client.post("/plan", json=dict(ROOM, catalogue="corto")).get_json()
+    assert plan["input"]["catalogue"] == "corto"
+    assert [p["length"] for p in plan["result"]["plan"]] == [100, 100, 100]
+    assert client.post("/plan", json=dict(ROOM, catalogue="nada")).status_code == 400
+
+    rows = client.post("/plan/batch", json=[dict(ROOM, catalogue="corto"), dict(ROOM, catalogue="nada")]).get_json()
+    assert rows["results"][0]["result"] == plan["result"]
+    assert rows["results"][1]["ok"] is False
+    assert sorted(c["name"] for c in client.get("/catalogues").get_json()["catalogues"]) == ["corto", "estandar"]
+
+
+def test_reload_endpoint_reports_errors(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    client = api.app.test_client()
+    assert client.post("/catalogues/reload", headers=headers).get_json()["ok"] is True
+    _write(tmp_path / "catalogues.json", "{no es json", 10)
+    res = client.post("/catalogues/reload", headers=headers)
+    assert res.status_code == 422
+    assert res.get_json()["lastError"]
@@ -0,0 +1,87 @@
+import json
+import os
+import zipfile
+
+import cli
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+FORMATS = ("json", "svg", "pdf")
+
+
+def _rooms():
+    return [dict(ROOM, id="cocina"), dict(ROOM, id="baño 1", A=200), dict(ROOM, A=300), {"A": "x"}]
+
+
+def _run(rooms, out, **kwargs):
+    return cli.run(rooms, str(out), FORMATS, workers=0, **kwargs)
+
+
+def test_directory_output(tmp_path):
+    out = tmp_path / "salida"
+    summary = _run(_rooms(), out)
+    assert (summary["rooms"], summary["written"], summary["skipped"], summary["failed"]) == (4, 3, 0, 1)
+    assert summary["errors"] == [{"row": 3, "error": {"A": "debe ser un número"}}]
+    names = sorted(os.listdir(out))
+    hashed = [n for n in names if n.startswith("room-")]
+    assert len(hashed) == 3
+    assert {"cocina.json", "cocina.svg", "cocina.pdf", "baño_1.json", "baño_1.svg", "baño_1.pdf"} <= set(names)
+    doc = json.loads((out / "cocina.json").read_text())
+    assert doc["result"]["ok"] and doc["input"]["A"] == 130
+    assert doc["key"] == cli.canonical_key(cli.parse_plan(dict(ROOM, id="cocina")))
+    assert (out / "cocina.svg").read_text().startswith("<svg")
+    assert (out / "cocina.pdf").read_bytes().startswith(b"%PDF")
+
+
+def test_zip_output_is_reproducible(tmp_path):
+    first, second = tmp_path / "a.zip", tmp_path / "b.zip"
+    _run(_rooms(), first, report=True)
+    _run(_rooms(), second, report=True)
+    assert first.read_bytes() == second.read_bytes()
+    assert not os.path.exists(str(first) + ".parts")
+    with zipfile.ZipFile(first) as zf:
+        names = zf.namelist()
+        assert names == sorted(names)
+        assert len(names) == 3 * 3 + 1 and cli.REPORT_NAME in names
+
+
+def test_resume_skips_only_unchanged_rooms(tmp_path):
+    out = tmp_path / "salida.zip"
+    _run(_rooms(), out)
+    summary = _run(_rooms(), out)
+    assert (summary["written"], summary["skipped"]) == (0, 3)
+
+    # Misma id con otra entrada: se vuelve a dibujar y el .json guarda la key nueva
+    changed = _rooms()
+    changed[0]["A"] = 150
+    summary = _run(changed, out)
+    assert (summary["written"], summary["skipped"]) == (1, 2)
+    with zipfile.ZipFile(out) as zf:
+        doc = json.loads(zf.read("cocina.json"))
+    assert doc["input"]["A"] == 150
+
+    # Una corrida cortada antes del .json (o con un .json de otra entrada) no cuenta como hecha
+    parts = tmp_path / "dir"
+    _run(_rooms()[:1], parts)
+    os.remove(parts / "cocina.json")
+    assert _run(_rooms()[:1], parts)["written"] == 1
+    (parts / "cocina.json").write_text(json.dumps({"key": "otra"}))
+    assert _run(_rooms()[:1], parts)["written"] == 1
+    assert _run(_rooms()[:1], parts)["skipped"] == 1
+
+
+def test_duplicate_names_get_the_input_hash(tmp_path):
+    # Ids repetidos o que coinciden al sanearlos ("a b", "a/b" -> "a_b")
+    rooms = [dict(ROOM, id="a b"), dict(ROOM, id="a_b", A=200), dict(ROOM, id="a/b", A=250),
+             dict(ROOM, id="a b"), dict(ROOM, id="a b")]
+    keys = [cli.canonical_key(cli.parse_plan(room)) for room in rooms]
+    summary = _run(rooms, tmp_path)
+    assert (summary["written"], summary["failed"]) == (4, 1)
+    # La quinta fila repite la cuarta: su nombre con hash ya está tomado
+    assert summary["errors"] == [{"row": 4, "error": {"id": f"nombre duplicado: a_b-{keys[4][:8]}"}}]
+    expected = {"a_b": 130, f"a_b-{keys[1][:8]}": 200, f"a_b-{keys[2][:8]}": 250, f"a_b-{keys[3][:8]}": 130}
+    jsons = {n[:-5]: json.loads((tmp_path / n).read_text()) for n in os.listdir(tmp_path) if n.endswith(".json")}
+    assert {name: doc["input"]["A"] for name, doc in jsons.items()} == expected
+
+    # Al retomar, cada fila vuelve a caer en el mismo nombre y se saltea
+    summary = _run(rooms, tmp_path)
+    assert (summary["written"], summary["skipped"], summary["failed"]) == (0, 4, 1)
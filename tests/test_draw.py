@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+import api
+from api_cache import plan_cache, plan_shelves_cached
+from api_draw import render_svg
+
+# SVGs del dibujo original (render_svg de la primera versión de la API) para las entradas de cada caso
+with open(os.path.join(os.path.dirname(__file__), "data", "baseline_svg.json"), encoding="utf-8") as f:
+    BASELINE = json.load(f)
+
+
+@pytest.fixture
+def client():
+    plan_cache.clear()
+    api.render_cache.clear()
+    return api.app.test_client()
+
+
+@pytest.mark.parametrize("case", BASELINE, ids=lambda case: json.dumps(case["input"], sort_keys=True))
+def test_svg_is_byte_identical_to_baseline(case):
+    params, result = plan_shelves_cached(case["input"])
+    assert result["plan"] == case["plan"]
+    assert render_svg(params, result) == case["svg"]
+
+
+@pytest.mark.parametrize("case", BASELINE[:4], ids=lambda case: json.dumps(case["input"], sort_keys=True))
+def test_render_endpoint_svg_matches_baseline(client, case):
+    planned = client.post("/plan", json=case["input"]).get_json()
+    for body in (case["input"], planned):
+        res = client.post("/render?format=svg", json=body)
+        assert res.status_code == 200
+        assert res.data.decode("utf-8") == case["svg"]
@@ -0,0 +1,99 @@
+import io
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import NameObject, StreamObject
+
+import api
+from api_limits import CHEAP, HEAVY, RENDER, LoadShedder, RateLimiter
+
+MB = 1024 * 1024
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+QUERY = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": "A,B", "shape": "L"}
+
+
+def _padded_pdf(size):
+    # PDF de una página cuyo contenido es un comentario de `size` bytes
+    writer = PdfWriter()
+    page = writer.add_blank_page(595, 842)
+    content = StreamObject()
+    content._data = b"%" + b"x" * size + b"\n"
+    page[NameObject("/Contents")] = writer._add_object(content)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+def test_pdf_accepts_uploads_over_the_json_limit(client):
+    assert api.app.config["MAX_CONTENT_LENGTH"] == 64 * MB
+    data = _padded_pdf(65 * MB)
+    res = client.post("/pdf", data={"plan": api.app.json.dumps(ROOM), "pdf": (io.BytesIO(data), "base.pdf")},
+                      content_type="multipart/form-data")
+    assert res.status_code == 200, res.data[:200]
+    assert len(PdfReader(io.BytesIO(res.data)).pages) == 2
+
+
+def test_json_endpoints_keep_the_global_limit(client):
+    res = client.post("/plan", data=b" " * (64 * MB + 1), content_type="application/json")
+    assert res.status_code == 413
+    assert "64 MB" in res.get_json()["error"]
+
+
+def test_pdf_rejects_uploads_over_its_own_limit(client, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_MAX_CONTENT_LENGTH", MB)
+    res = client.post("/pdf", data={"plan": api.app.json.dumps(ROOM), "pdf": (io.BytesIO(_padded_pdf(MB)), "base.pdf")},
+                      content_type="multipart/form-data")
+    assert res.status_code == 413
+    assert "1 MB" in res.get_json()["error"]
+
+
+def test_rate_limit_answers_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(api, "rate_limiter", RateLimiter(rate=0.01, burst=3, max_clients=10))
+    codes = [client.get("/plan", query_string=QUERY).status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+    res = client.get("/plan", query_string=QUERY)
+    assert res.status_code == 429
+    assert int(res.headers["Retry-After"]) >= 1
+    # Cada cliente tiene su propia cuenta; /healthz y /metrics no se limitan
+    assert client.get("/plan", query_string=QUERY, environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code == 200
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/metrics").status_code == 200
+
+
+def test_rate_limit_charges_by_endpoint_class(client, monkeypatch):
+    monkeypatch.setattr(api, "rate_limiter", RateLimiter(rate=0.01, burst=api.RATE_COSTS[HEAVY], max_clients=10))
+    assert client.post("/report", json=[ROOM]).status_code == 200
+    assert client.get("/plan", query_string=QUERY).status_code == 429
+
+
+def test_load_shedding_answers_503_for_expensive_endpoints_first(client, monkeypatch):
+    shedder = LoadShedder(max_capacity=16, target=1.0)
+    monkeypatch.setattr(api, "load_shedder", shedder)
+    # Un pedido pesado en curso ocupa la parte de la capacidad reservada a los pesados
+    assert shedder.admit(HEAVY)
+    res = client.post("/report", json=[ROOM])
+    assert res.status_code == 503
+    assert int(res.headers["Retry-After"]) >= 1
+    assert client.post("/render?format=svg", json=ROOM).status_code == 200
+    assert client.get("/plan", query_string=QUERY).status_code == 200
+    shedder.release(HEAVY, 0.0)
+    assert client.post("/report", json=[ROOM]).status_code == 200
+    assert shedder.stats()["shed"] == {CHEAP: 0, RENDER: 0, HEAVY: 1}
+    assert shedder.load == 0
+
+
+def test_load_shedder_backs_off_on_slow_cheap_requests():
+    shedder = LoadShedder(max_capacity=32, target=0.1)
+    for _ in range(20):
+        assert shedder.admit(CHEAP)
+        shedder.release(CHEAP, 1.0)
+    assert shedder.capacity == shedder.min_capacity
+    for _ in range(40):
+        assert shedder.admit(CHEAP)
+        shedder.release(CHEAP, 0.0)
+    assert shedder.capacity == shedder.max_capacity
@@ -0,0 +1,105 @@
+import pytest
+
+import api
+from api_metrics import Counter, Gauges, Histogram, Registry, SlowRequestProfiler, request_spans, span, start_request
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+def _metric(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_counter_and_histogram_exposition():
+    counter = Counter("x_total", "Ayuda.")
+    counter.inc(endpoint="/a", code=200)
+    counter.inc(2, endpoint="/a", code=200)
+    counter.inc(endpoint='/"b"', code=500)
+    assert counter.expose() == [
+        "# HELP x_total Ayuda.",
+        "# TYPE x_total counter",
+        'x_total{code="200",endpoint="/a"} 3',
+        'x_total{code="500",endpoint="/\\"b\\""} 1',
+    ]
+
+    hist = Histogram("t_seconds", "Ayuda.", (0.1, 1))
+    for value in (0.05, 0.5, 5):
+        hist.observe(value, stage="plan")
+    lines = hist.expose()
+    assert 't_seconds_bucket{stage="plan",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="plan",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{stage="plan",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{stage="plan"} 5.55' in lines
+    assert 't_seconds_count{stage="plan"} 3' in lines
+
+
+def test_registry_reads_gauges_at_exposition_time():
+    registry = Registry()
+    value = {"n": 1}
+    registry.register(Gauges("g", "Ayuda.", "gauge", lambda: [({"cache": "plan"}, value["n"])]))
+    value["n"] = 7
+    assert registry.expose().endswith('g{cache="plan"} 7\n')
+
+
+def test_spans_are_recorded_per_request():
+    start_request()
+    with span("plan"):
+        pass
+    with span("svg"):
+        pass
+    assert [stage for stage, _ in request_spans()] == ["plan", "svg"]
+    start_request()
+    assert request_spans() == []
+
+
+def test_metrics_endpoint_counts_requests_and_stages(client):
+    before = client.get("/metrics").get_data(as_text=True)
+    client.post("/plan", json=ROOM)
+    client.post("/plan", json="x")
+    text = client.get("/metrics").get_data(as_text=True)
+    ok = 'repisas_requests_total{code="200",endpoint="/plan",method="POST"}'
+    bad = 'repisas_request_errors_total{code="400",endpoint="/plan"}'
+    assert _metric(text, ok) == _metric(before, ok) + 1
+    assert _metric(text, bad) == _metric(before, bad) + 1
+    stage = 'repisas_stage_duration_seconds_count{stage="plan"}'
+    assert _metric(text, stage) >= _metric(before, stage) + 1
+    assert 'repisas_cache_hit_ratio{cache="plan"}' in text
+    assert "# TYPE repisas_render_rejected_total counter" in text
+
+
+def test_server_timing_header_is_opt_in(client, monkeypatch):
+    assert "Server-Timing" not in client.post("/plan", json=ROOM).headers
+    monkeypatch.setattr(api, "SERVER_TIMING", True)
+    header = client.post("/plan", json=ROOM).headers["Server-Timing"]
+    assert [part.split(";")[0] for part in header.split(", ")] == ["plan", "total"]
+
+
+def test_slow_request_profiler_keeps_the_slowest(tmp_path):
+    profiler = SlowRequestProfiler(sample_rate=1, keep=2, directory=str(tmp_path))
+    for duration in (0.3, 0.1, 0.5):
+        profile = profiler.maybe_start()
+        assert profile is not None
+        profiler.finish(profile, {"duration": duration})
+    slowest = profiler.slowest()
+    assert [entry["duration"] for entry in slowest] == [0.5, 0.3]
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        f"request-{entry['id']}.prof" for entry in slowest)
+    assert "function calls" in slowest[0]["profile"]
+
+
+def test_slowest_endpoint_is_404_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(api, "profiler", SlowRequestProfiler(sample_rate=0))
+    assert client.get("/metrics/slowest").status_code == 404
+    monkeypatch.setattr(api, "profiler", SlowRequestProfiler(sample_rate=1, keep=5))
+    client.post("/plan", json=ROOM)
+    body = client.get("/metrics/slowest").get_json()
+    assert body["sampleRate"] == 1
+    assert any(entry["endpoint"] == "/plan" and "plan" in entry["spans"] for entry in body["requests"])
@@ -0,0 +1,62 @@
+import pytest
+
+import api
+from api_cache import plan_cache
+from api_domain import resolve_catalogue
+from api_optimize import OBJECTIVES, plan_shelves_optimized, split_options
+
+ROOMS = [
+    {"A": 200, "B": 300, "C": 50, "D": 50, "E": 100, "roomHeight": 250, "walls": ["A", "B"], "shape": "L"},
+    {"A": 90, "B": 300, "C": 50, "D": 50, "E": 100, "roomHeight": 250, "walls": ["A", "B"], "shape": "L"},
+    {"A": 130, "B": 250, "C": 50, "D": 50, "E": 250, "roomHeight": 250, "walls": ["A", "B", "E"], "shape": "U"},
+    {"A": 600, "B": 500, "C": 30, "D": 70, "E": 400, "roomHeight": 240, "walls": ["A", "E"], "shape": "L"},
+    {"A": 45, "B": 0, "C": 0, "D": 0, "E": 0, "roomHeight": 250, "walls": ["A"], "shape": "1"},
+]
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+@pytest.mark.parametrize("room", ROOMS)
+def test_every_requested_wall_is_covered(room, objective):
+    result = plan_shelves_optimized(room, objective, budget_ms=1000)
+    assert result["ok"]
+    covered = {p["wall"] for p in result["plan"]}
+    assert covered == set(room["walls"])
+    cat = resolve_catalogue(room)
+    assert all(cat.min_len <= p["length"] <= cat.max_len for p in result["plan"])
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_plan_endpoint_keeps_short_walls(objective):
+    # Regresión: con optimize=cuts el muro A (más corto que maxLen) se descartaba por no tener cortes
+    plan_cache.clear()
+    res = api.app.test_client().get(
+        f"/plan?A=200&B=300&C=50&D=50&E=100&H=250&walls=A,B&optimize={objective}")
+    assert res.status_code == 200
+    plan = res.get_json()["result"]["plan"]
+    assert {p["wall"] for p in plan} == {"A", "B"}
+
+
+def _check_split_options(max_t, min_t):
+    for length_t in range(min_t, 3 * max_t, 7):
+        options = split_options(length_t, max_t, min_t)
+        assert options
+        for cuts, waste, pieces in options:
+            assert pieces
+            assert sum(pieces) + waste == length_t
+            assert all(min_t <= p <= max_t for p in pieces)
+
+
+def test_split_options_never_drop_a_coverable_wall():
+    _check_split_options(2430, 400)
+
+
+def test_split_options_below_min_len_is_uncovered():
+    assert split_options(399, 2430, 400) == ((0, 399, ()),)
+
+
+def test_split_options_with_min_len_above_half_max_len():
+    # Catálogo con minLen > maxLen / 2: 2430 + 370 no se puede repartir en dos mitades de 1400
+    assert split_options(2800, 2430, 1500) == ((0, 370, (2430,)),)
+    # 2430 + 1000: el remanente no llega a minLen pero las dos mitades sí
+    assert split_options(3430, 2430, 1500) == ((0, 1000, (2430,)), (2, 0, (1715, 1715)))
+    _check_split_options(2430, 1500)
@@ -0,0 +1,185 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+
+import api
+import api_pdf
+from api_cache import plan_shelves_cached
+from api_draw import render_svg
+from api_pdf import build_plan_page, image_xobject, merge_plan_page_bytes, merge_plan_page_streaming, svg_content
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+def _base_pdf(pages):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for i in range(pages):
+        c.drawString(72, 720, f"pagina {i + 1}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _png(size=(120, 90), mode="RGB", fmt="PNG"):
+    buf = io.BytesIO()
+    Image.new(mode, size, "white").save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _texts(data):
+    return [page.extract_text().strip() for page in PdfReader(io.BytesIO(data)).pages]
+
+
+@pytest.fixture(scope="module")
+def page_data():
+    return build_plan_page(_png())
+
+
+@pytest.fixture
+def base_path(tmp_path):
+    path = tmp_path / "base.pdf"
+    path.write_bytes(_base_pdf(3))
+    return str(path)
+
+
+def test_incremental_update_appends_the_plan_page(base_path, page_data):
+    original = open(base_path, "rb").read()
+    paths, suffix = merge_plan_page_streaming(base_path, page_data)
+    # El original queda intacto y la respuesta es el original más la actualización
+    assert paths == [base_path]
+    assert open(base_path, "rb").read() == original
+    merged = original + suffix
+    assert suffix.rstrip().endswith(b"%%EOF")
+    texts = _texts(merged)
+    assert len(texts) == 4
+    assert [texts[0]] + texts[2:] == ["pagina 1", "pagina 2", "pagina 3"]
+    assert texts[1] not in ("pagina 1", "pagina 2", "pagina 3")
+
+
+def test_incremental_update_matches_in_memory_merge(base_path, page_data):
+    paths, suffix = merge_plan_page_streaming(base_path, page_data)
+    merged = open(base_path, "rb").read() + suffix
+    assert _texts(merged) == _texts(merge_plan_page_bytes(open(base_path, "rb").read(), page_data))
+
+
+def test_broken_xref_falls_back_to_a_rewrite(tmp_path, base_path, page_data):
+    data = open(base_path, "rb").read()
+    head, _, _ = data.rpartition(b"startxref")
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(head + b"startxref\n10\n%%EOF\n")
+    paths, suffix = merge_plan_page_streaming(str(broken), page_data)
+    assert paths != [str(broken)] and suffix == b""
+    assert len(_texts(open(paths[0], "rb").read())) == 4
+    os.remove(paths[0])
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+def test_pdf_endpoint_returns_a_valid_merged_file(stream):
+    res = api.app.test_client().post(
+        f"/pdf?stream={stream}",
+        data={"image": (io.BytesIO(_png()), "plano.png"), "pdf": (io.BytesIO(_base_pdf(2)), "base.pdf")},
+        content_type="multipart/form-data")
+    assert res.status_code == 200
+    assert len(PdfReader(io.BytesIO(res.data)).pages) == 3
+
+
+def test_pdf_endpoint_requires_both_files():
+    res = api.app.test_client().post("/pdf", data={"pdf": (io.BytesIO(_base_pdf(1)), "base.pdf")},
+                                     content_type="multipart/form-data")
+    assert res.status_code == 400
+
+
+def _page(data):
+    return PdfReader(io.BytesIO(data)).pages[0]
+
+
+def test_plan_page_reuses_the_banner_template():
+    api_pdf.template_page.cache_clear()
+    api_pdf._template_page_data.cache_clear()
+    build_plan_page(_png())
+    page = _page(build_plan_page(_png()))
+    assert api_pdf._template_page_data.cache_info().misses == 1
+    assert [float(v) for v in page.mediabox] == [0, 0, 595.2756, 841.8898]
+    # El plano va primero y el banner (naranja, con su texto) y el marco quedan encima
+    contents = page.raw_get("/Contents").get_object()
+    assert len(contents) == 2
+    plan, banner = (c.get_object().get_data() for c in contents)
+    assert b"/PlanImg Do" in plan
+    assert b"1 .576 .118 rg" in banner and b"(PLANO PROPUESTO) Tj" in banner
+    assert b"30 30 535.2756 781.8898 re S" in banner
+    assert "PLANO PROPUESTO" in page.extract_text()
+
+
+def test_rgb_png_is_embedded_without_recompressing():
+    xobj, w, h = image_xobject(_png())
+    assert (w, h) == (120, 90)
+    assert xobj["/Filter"] == "/FlateDecode" and xobj["/DecodeParms"]["/Predictor"] == 15
+    assert xobj["/ColorSpace"] == "/DeviceRGB"
+
+
+def test_jpeg_is_embedded_as_is_and_rgba_goes_through_pillow():
+    jpeg = _png(fmt="JPEG")
+    xobj, _, _ = image_xobject(jpeg)
+    assert xobj["/Filter"] == "/DCTDecode" and xobj._data == jpeg
+    xobj, w, h = image_xobject(_png(mode="RGBA"))
+    assert (w, h) == (120, 90) and xobj["/ColorSpace"] == "/DeviceRGB"
+
+
+def test_tall_images_are_rotated_inside_the_frame():
+    plan = _page(build_plan_page(_png(size=(90, 120)))).raw_get("/Contents").get_object()[0]
+    assert b"0 -1 1 0 " in plan.get_object().get_data()
+
+
+def test_svg_translator_emits_rects_lines_and_text():
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 100">'
+        '<style>text { font-size: 10px; fill: #111; } .big { font-size: 20px; }</style>'
+        '<g stroke="#f00" stroke-width="2"><line x1="0" y1="0" x2="10" y2="10" /></g>'
+        '<rect x="1" y="2" width="30" height="40" fill="#00f" fill-opacity="0.5" />'
+        '<text class="big" x="100" y="50" text-anchor="middle">Hola (A)</text>'
+        '</svg>'
+    )
+    alpha = {}
+    ops, vw, vh = svg_content(svg, "FPlan", alpha)
+    assert (vw, vh) == (200, 100)
+    # Eje y invertido una sola vez al principio
+    assert ops.startswith("1 0 0 -1 0 100 cm\n")
+    assert "1 0 0 RG 2 w\n0 0 m 10 10 l\nS\n" in ops
+    assert alpha == {0.5: "GSa0"}
+    assert "/GSa0 gs\n0 0 1 rg\n1 2 30 40 re\nf\n" in ops
+    assert "/FPlan 20 Tf\n" in ops and "(Hola \\(A\\)) Tj" in ops
+
+
+def test_vector_plan_page_keeps_the_plan_text():
+    params, result = plan_shelves_cached(ROOM)
+    page = _page(build_plan_page(svg=render_svg(params, result)))
+    assert "/FPlan" in page["/Resources"]["/Font"]
+    text = page.extract_text()
+    assert "A (130.0 cm)" in text and "PLANO PROPUESTO" in text
+
+
+@pytest.mark.parametrize("field", ["plan", "svg"])
+def test_pdf_endpoint_accepts_a_plan_or_an_svg(field):
+    params, result = plan_shelves_cached(ROOM)
+    data = {"pdf": (io.BytesIO(_base_pdf(1)), "base.pdf")}
+    if field == "plan":
+        data["plan"] = api.app.json.dumps(ROOM)
+    else:
+        data["svg"] = (io.BytesIO(render_svg(params, result).encode()), "plano.svg")
+    res = api.app.test_client().post("/pdf", data=data, content_type="multipart/form-data")
+    assert res.status_code == 200
+    assert "A (130.0 cm)" in PdfReader(io.BytesIO(res.data)).pages[1].extract_text()
+
+
+def test_report_has_one_page_per_room():
+    rooms = [dict(ROOM, name=f"Ambiente {i}", A=130 + 10 * (i % 3)) for i in range(7)]
+    res = api.app.test_client().post("/report", json=rooms)
+    assert res.status_code == 200
+    texts = _texts(res.data)
+    assert len(texts) == 7
+    assert all(f"Ambiente {i}" in text for i, text in enumerate(texts))
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+
+import api
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+def _base_pdf(pages):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for i in range(pages):
+        c.drawString(72, 720, f"pagina {i + 1}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    (tmp_path / "cotizacion.pdf").write_bytes(_base_pdf(2))
+    monkeypatch.setattr(api, "QUOTE_TEMPLATE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _check_quote(res, pages):
+    assert res.status_code == 200
+    assert res.mimetype == "application/pdf"
+    reader = PdfReader(io.BytesIO(res.data))
+    assert len(reader.pages) == pages + 1
+    assert "A (130.0 cm)" in reader.pages[1].extract_text()
+    stages = [part.split(";")[0] for part in res.headers["Server-Timing"].split(", ")]
+    assert stages == ["plan", "svg", "page", "merge"]
+
+
+def test_quote_with_a_named_template_leaves_the_template_intact(client, templates):
+    original = (templates / "cotizacion.pdf").read_bytes()
+    _check_quote(client.post("/quote", json={"input": ROOM, "template": "cotizacion"}), 2)
+    assert (templates / "cotizacion.pdf").read_bytes() == original
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+def test_quote_with_an_uploaded_pdf(client, stream):
+    res = client.post(f"/quote?stream={stream}",
+                      data={"input": api.app.json.dumps(ROOM), "pdf": (io.BytesIO(_base_pdf(3)), "base.pdf")},
+                      content_type="multipart/form-data")
+    _check_quote(res, 3)
+
+
+@pytest.mark.parametrize("template", [None, "no-existe", "../cotizacion", "/etc/passwd"])
+def test_quote_requires_a_pdf_or_an_existing_template(client, templates, template):
+    assert client.post("/quote", json={"input": ROOM, "template": template}).status_code == 400
+
+
+def test_quote_rejects_templates_when_no_directory_is_configured(client, monkeypatch):
+    monkeypatch.setattr(api, "QUOTE_TEMPLATE_DIR", None)
+    assert client.post("/quote", json={"input": ROOM, "template": "cotizacion"}).status_code == 400
+
+
+def test_quote_reports_infeasible_plans(client, templates):
+    res = client.post("/quote", json={"input": dict(ROOM, H=100), "template": "cotizacion"})
+    assert res.status_code == 422
+    assert res.get_json()["ok"] is False
@@ -0,0 +1,117 @@
+import io
+
+import pytest
+
+import api
+from api_cache import RenderCache, plan_cache, plan_shelves_cached
+from api_draw import render_svg
+from api_workers import render_image
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    plan_cache.clear()
+    monkeypatch.setattr(api, "render_cache", RenderCache(memory_bytes=1 << 20))
+    return api.app.test_client()
+
+
+def _options(query="", **body):
+    with api.app.test_request_context("/render" + query):
+        return api.render_options(body)
+
+
+def test_render_options_defaults_and_sizes():
+    assert _options() == {"format": "png", "width": 1200, "height": 900, "thumbnail": False}
+    assert _options("?width=600") == {"format": "png", "width": 600, "height": 450, "thumbnail": False}
+    assert _options(height=300, format="WEBP") == {"format": "webp", "width": 400, "height": 300, "thumbnail": False}
+    assert _options("?scale=0.5&width=800", width=100)["width"] == 800  # la query string tiene prioridad
+    assert _options(scale=2)["width"] == 2400
+
+
+def test_render_options_thumbnails():
+    assert _options(thumbnail="1") == {"format": "png", "width": 200, "height": 150, "thumbnail": True}
+    assert _options(width=320)["thumbnail"] is True
+    assert _options(width=321)["thumbnail"] is False
+    # El SVG no depende del tamaño
+    assert _options("?format=svg&width=640") == {"format": "svg", "width": None, "height": None, "thumbnail": False}
+
+
+@pytest.mark.parametrize("opts", [{"format": "gif"}, {"width": 8}, {"width": 5000}, {"scale": 10}, {"width": "x"}])
+def test_render_options_reject_bad_values(opts):
+    with pytest.raises(ValueError):
+        _options(**opts)
+
+
+def test_thumbnail_svg_drops_grid_and_labels():
+    params, result = plan_shelves_cached(ROOM)
+    full = render_svg(params, result)
+    thumb = render_svg(params, result, thumbnail=True)
+    assert 'class="grid"' in full and "<text" in full
+    assert 'class="grid"' not in thumb and "<text" not in thumb
+    assert thumb.count("<rect") == full.count("<rect")
+
+
+def test_render_svg_format_is_cached_per_variant(client):
+    res = client.post("/render?format=svg", json=ROOM)
+    assert res.status_code == 200
+    assert res.mimetype == "image/svg+xml"
+    params, result = plan_shelves_cached(ROOM)
+    assert res.data.decode() == render_svg(params, result)
+    assert res.headers["X-Cache"] == "MISS"
+    again = client.post("/render?format=svg", json=ROOM)
+    assert again.headers["X-Cache"] == "HIT" and again.headers["ETag"] == res.headers["ETag"]
+
+    thumb = client.post("/render?format=svg&thumbnail=1", json=ROOM)
+    assert thumb.headers["ETag"] != res.headers["ETag"]
+    assert b"<text" not in thumb.data
+
+
+def test_render_rejects_bad_options_and_svg_jobs(client):
+    assert client.post("/render?format=gif", json=ROOM).status_code == 400
+    assert client.post("/render?width=99999", json=ROOM).status_code == 400
+    assert client.post("/render/jobs?format=svg", json=ROOM).status_code == 400
+
+
+def test_image_mimetype_sniffs_the_cached_bytes():
+    assert api.image_mimetype(b"\x89PNG\r\n\x1a\n...") == "image/png"
+    assert api.image_mimetype(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert api.image_mimetype(b"<svg></svg>") == "image/svg+xml"
+
+
+def _require_cairo():
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):
+        pytest.skip("cairosvg/libcairo no disponible")
+
+
+@pytest.mark.parametrize("fmt,magic", [("png", b"\x89PNG"), ("webp", b"RIFF")])
+def test_render_image_formats_and_sizes(fmt, magic):
+    _require_cairo()
+    from PIL import Image
+
+    params, result = plan_shelves_cached(ROOM)
+    data = render_image(params, result, fmt, 400, 300)
+    assert data.startswith(magic)
+    assert Image.open(io.BytesIO(data)).size == (400, 300)
+
+
+@pytest.mark.parametrize("strip", ["compact", "manual"])
+def test_render_accepts_results_without_meta(client, strip):
+    if strip == "compact":
+        body = client.post("/plan?compact=meta", json=ROOM).get_json()
+    else:
+        body = client.post("/plan", json=ROOM).get_json()
+        del body["result"]["meta"]
+    assert "meta" not in body["result"]
+    res = client.post("/render?format=svg", json=body)
+    assert res.status_code == 200
+    assert res.data.startswith(b"<svg")
+
+
+def test_render_rejects_results_that_are_not_plans(client):
+    res = client.post("/render?format=svg", json={"input": ROOM, "result": {"ok": True}})
+    assert res.status_code == 400
+    assert res.get_json()["errors"] == {"result": "debe ser un resultado de /plan"}
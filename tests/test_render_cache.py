@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import api
+from api_cache import DiskCache, LRUCache, RenderCache
+from api_domain import plan_shelves_py
+
+PNG = {"format": "png", "width": 1200, "height": 900, "thumbnail": False}
+ROOM = {"A": 240, "B": 200, "C": 30, "D": 30, "E": 0, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+def test_lru_evicts_least_recently_used_by_bytes():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "b" pasa a ser el menos usado
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["entries"] == 2 and stats["evictions"] == 1
+
+
+def test_lru_skips_values_larger_than_the_cache():
+    cache = LRUCache(max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_disk_cache_round_trip_survives_a_restart(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=100)
+    disk.put("k1", b"png-1")
+    disk.put("k2", b"png-2")
+    assert disk.get("k1") == b"png-1"
+
+    reopened = DiskCache(str(tmp_path), max_bytes=100)
+    assert reopened.stats()["entries"] == 2 and reopened.stats()["bytes"] == 10
+    assert reopened.get("k2") == b"png-2"
+
+
+def test_disk_cache_eviction_removes_files(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=8)
+    disk.put("old", b"1234")
+    disk.put("new", b"5678")
+    disk.put("newer", b"9abc")
+    assert disk.get("old") is None
+    assert not os.path.exists(tmp_path / "old.bin")
+    assert sorted(os.listdir(tmp_path)) == ["new.bin", "newer.bin"]
+
+
+def test_render_cache_promotes_disk_hits_to_memory(tmp_path):
+    RenderCache(memory_bytes=100, disk_dir=str(tmp_path), disk_bytes=100).put("k", b"png")
+    cache = RenderCache(memory_bytes=100, disk_dir=str(tmp_path), disk_bytes=100)
+    assert cache.get("k") == b"png"
+    assert cache.stats()["memory"]["entries"] == 1
+    assert cache.get("k") == b"png"
+    assert cache.stats()["memory"]["hits"] == 1 and cache.stats()["disk"]["hits"] == 1
+
+
+def test_render_cache_key_depends_on_the_renderer_version(monkeypatch):
+    result = plan_shelves_py(ROOM)
+    key = api.render_cache_key(ROOM, result, PNG)
+    assert key == api.render_cache_key(dict(ROOM, C=40), result, PNG)  # C no cambia el dibujo
+    monkeypatch.setattr(api, "RENDER_VERSION", "otra-version")
+    assert api.render_cache_key(ROOM, result, PNG) != key
+
+
+def test_render_serves_cached_png_with_etag_and_304(client, monkeypatch):
+    monkeypatch.setattr(api, "render_cache", RenderCache(memory_bytes=1024))
+    key = api.render_cache_key(ROOM, plan_shelves_py(ROOM), PNG)
+    api.render_cache.put(key, b"\x89PNG cacheado")
+
+    res = client.post("/render", json=ROOM)
+    assert res.status_code == 200
+    assert res.data == b"\x89PNG cacheado"
+    assert res.headers["X-Cache"] == "HIT"
+    assert res.headers["ETag"] == f'"{key}"'
+    assert res.headers["Cache-Control"] == api.RENDER_CACHE_CONTROL
+
+    res = client.post("/render", json=ROOM, headers={"If-None-Match": f'"{key}"'})
+    assert res.status_code == 304
+    assert res.data == b""
+    assert res.headers["ETag"] == f'"{key}"'
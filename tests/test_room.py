@@ -0,0 +1,104 @@
+import pytest
+
+import api
+from api_cache import plan_cache, plan_shelves_cached
+from api_catalog import catalogues
+from api_domain import plan_shelves_py
+from api_room import normalize_room
+from api_schema import parse_plan
+
+
+def _rect_room(A, S, walls, depths):
+    # Rectángulo con A arriba, E a la derecha, B a la izquierda y el cuarto muro libre
+    return {
+        "points": [[0, 0], [A, 0], [A, S], [0, S]],
+        "walls": [
+            {"id": "A", "use": "A" in walls, **depths.get("A", {})},
+            {"id": "E", "use": "E" in walls, **depths.get("E", {})},
+            {"use": False},
+            {"id": "B", "use": "B" in walls, **depths.get("B", {})},
+        ],
+    }
+
+
+def _pieces(result):
+    return sorted((p["wall"], p["length"], p["depth"]) for p in result["plan"])
+
+
+@pytest.mark.parametrize("A, S, walls, shape", [
+    (300, 120, ["A"], "L"),
+    (243, 486, ["A", "B"], "L"),
+    (300, 180, ["A", "E"], "L"),
+    (400, 250, ["A", "B"], "L"),
+    (130, 250, ["A", "B", "E"], "U"),
+    (300, 486, ["A", "B", "E"], "U"),
+])
+def test_rectangle_matches_abe_plan(A, S, walls, shape):
+    C, D = 60, 40
+    legacy = plan_shelves_py({"A": A, "B": S, "C": C, "D": D, "E": S, "H": 250, "walls": walls, "shape": shape})
+    if shape == "U":
+        # En U las tres repisas comparten la profundidad más chica
+        common = min(legacy["meta"]["depthMax"].values())
+        depths = {w: {"depth": common} for w in "ABE"}
+    else:
+        depths = {"B": {"maxDepth": C}, "E": {"maxDepth": D}}
+    _, result = plan_shelves_cached(parse_plan({"room": _rect_room(A, S, walls, depths), "H": 250}))
+    assert result["ok"] and legacy["ok"]
+    assert _pieces(result) == _pieces(legacy)
+    assert result["totals"] == legacy["totals"]
+
+
+def test_l_shaped_room():
+    # L de 6 muros: esquina cóncava en (200, 150) sin conflicto de repisas
+    room = {"points": [[0, 0], [400, 0], [400, 150], [200, 150], [200, 300], [0, 300]]}
+    _, result = plan_shelves_cached(parse_plan({"room": room, "H": 250}))
+    assert result["ok"]
+    meta = result["meta"]
+    assert [w["length"] for w in meta["walls"]] == [400, 150, 200, 150, 200, 300]
+    assert {c["vertex"] for c in meta["corners"]} == {0, 1, 2, 4, 5}
+    assert {c["angle"] for c in meta["corners"]} == {90}
+    # Cada esquina convexa la cede uno de los dos muros, que pierde la profundidad del dueño
+    walls = meta["walls"]
+    for c in meta["corners"]:
+        prev, nxt = walls[c["vertex"] - 1], walls[c["vertex"]]
+        if c["owner"] == prev["id"]:
+            assert nxt["lossStart"] == prev["depth"]
+        else:
+            assert prev["lossEnd"] == nxt["depth"]
+    assert all(p["length"] >= catalogues.get().min_len for p in result["plan"])
+
+
+@pytest.mark.parametrize("points", [
+    [[0, 0], [100, 0], [0, 100], [100, 100]],  # moño: dos muros se cruzan
+    [[0, 0], [200, 0], [200, 100], [100, 0], [0, 100]],  # un vértice toca otro muro
+    [[0, 0], [100, 0], [200, 0]],  # colineales, área 0
+    [[0, 0], [100, 0], [100, 0], [0, 100]],  # vértice repetido
+    [[0, 0], [100, 0], [50, 0], [50, 100]],  # vuelve sobre el muro anterior
+    [[0, 0], [100, 0]],
+])
+def test_invalid_polygons_raise(points):
+    with pytest.raises(ValueError):
+        normalize_room({"points": points}, door_clear=80)
+
+
+def test_invalid_polygon_is_400():
+    plan_cache.clear()
+    room = {"points": [[0, 0], [200, 0], [0, 100], [150, 200]]}
+    resp = api.app.test_client().post("/plan", json={"H": 250, "room": room})
+    assert resp.status_code == 400
+    assert "se cruza" in resp.get_json()["errors"]["room"]
+
+
+def test_plan_with_room_renders():
+    plan_cache.clear()
+    client = api.app.test_client()
+    room = {"points": [[0, 0], [400, 0], [400, 300], [0, 300]],
+            "walls": [{"id": "A"}, {"id": "B", "doors": [{"from": 50}]}, {"use": False}, {"maxDepth": 40}]}
+    planned = client.post("/plan", json={"H": 250, "room": room})
+    assert planned.status_code == 200
+    body = planned.get_json()
+    assert body["input"]["room"]["walls"][1]["doors"] == [{"from": 50, "to": 50 + catalogues.get().door_clear}]
+    resp = client.post("/render?format=svg", json=body)
+    assert resp.status_code == 200
+    svg = resp.get_data(as_text=True)
+    assert svg.startswith("<svg") and "A (400" in svg and "M4 (300" in svg
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from flask import Flask
+
+import api
+import api_json
+from api_cache import plan_cache, plan_shelves_cached
+from api_schema import ValidationError, compact_result, parse_plan
+
+ROOM = {"A": 130, "B": 250, "C": 50, "D": 0, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+@pytest.fixture
+def client():
+    plan_cache.clear()
+    return api.app.test_client()
+
+
+def test_validation_error_reports_every_field_at_once():
+    with pytest.raises(ValidationError) as exc:
+        parse_plan({"A": "x", "B": -1, "C": float("inf"), "H": True, "walls": ["A", "Z"], "shape": "O"})
+    assert exc.value.payload() == {
+        "ok": False,
+        "error": "Parámetros inválidos",
+        "errors": {
+            "A": "debe ser un número",
+            "B": "no puede ser negativo",
+            "C": "debe ser un número finito",
+            "H": "debe ser un número",
+            "walls": "muros desconocidos: Z (válidos: A, B, E)",
+            "shape": "debe ser uno de: L, U, 1",
+        },
+    }
+
+
+def test_validation_errors_have_the_same_shape_on_every_endpoint(client):
+    bad = dict(ROOM, A="x")
+    for resp in (client.post("/plan", json=bad), client.get("/plan?A=x&B=250&C=50&D=0&E=250&H=250"),
+                 client.post("/render?format=svg", json=bad)):
+        assert resp.status_code == 400
+        assert resp.get_json() == {"ok": False, "error": "Parámetros inválidos", "errors": {"A": "debe ser un número"}}
+    # GET exige todas las medidas
+    missing = client.get("/plan?A=130").get_json()["errors"]
+    assert missing == {k: "campo requerido" for k in ("B", "C", "D", "E", "roomHeight")}
+    # En el lote, la fila inválida trae el mismo payload y las demás se planifican
+    rows = client.post("/plan/batch", json=[ROOM, bad]).get_json()["results"]
+    assert rows[0]["ok"] is True
+    assert rows[1] == {"ok": False, "error": "Parámetros inválidos", "errors": {"A": "debe ser un número"}}
+
+
+def test_invalid_json_body_is_a_validation_error(client):
+    resp = client.post("/plan", data="{", content_type="application/json")
+    assert resp.status_code == 400
+    assert resp.get_json() == {"ok": False, "error": "JSON inválido", "errors": {"body": "JSON inválido"}}
+
+
+def _provider_app(monkeypatch, backend):
+    monkeypatch.setattr(api_json, "JSON_BACKEND", backend)
+    app = Flask(__name__)
+    assert api_json.install_json_provider(app) == backend
+    return app
+
+
+def test_orjson_and_std_providers_return_the_same_document(monkeypatch):
+    pytest.importorskip("orjson")
+    params, result = plan_shelves_cached(dict(ROOM, walls=["A", "B", "E"], shape="U"))
+    doc = {"input": params, "result": compact_result(result, "columns"), "text": "Cocina ñ – 1º"}
+    bodies = {}
+    for backend in ("std", "orjson"):
+        app = _provider_app(monkeypatch, backend)
+        with app.app_context():
+            resp = app.json.response(doc)
+            assert resp.mimetype == "application/json"
+            bodies[backend] = resp.get_data()
+            assert app.json.loads(app.json.dumps(doc)) == doc
+    assert json.loads(bodies["orjson"]) == json.loads(bodies["std"]) == json.loads(json.dumps(doc))
+    # orjson escribe UTF-8 sin escapar y sin espacios
+    assert "Cocina ñ – 1º".encode() in bodies["orjson"]
+    assert b", " not in bodies["orjson"] and b": " not in bodies["orjson"]
+
+
+def test_auto_backend_falls_back_to_std_without_orjson(monkeypatch):
+    monkeypatch.setattr(api_json, "orjson", None)
+    monkeypatch.setattr(api_json, "JSON_BACKEND", "auto")
+    assert api_json.install_json_provider(Flask(__name__)) == "std"
+    monkeypatch.setattr(api_json, "JSON_BACKEND", "orjson")
+    with pytest.raises(RuntimeError):
+        api_json.install_json_provider(Flask(__name__))
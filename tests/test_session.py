@@ -0,0 +1,107 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import api
+from api_cache import plan_cache
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+START = {"A": 300, "B": 250, "C": 50, "D": 40, "E": 250, "H": 250, "walls": ["A", "B"], "shape": "L"}
+EDITS = [
+    {"B": 260},
+    {"walls": ["A", "B", "E"]},
+    {"shape": "U"},
+    {"C": 30},
+    {"A": 900, "E": 700},
+    {"H": 300},
+    {"walls": ["E"]},
+    {"A": 120, "walls": ["A", "B"], "shape": "L"},
+]
+
+
+class Client:
+    """Estado de una sesión del lado del cliente, actualizado solo con los parches."""
+
+    def __init__(self, state):
+        self.version = state["version"]
+        self.pieces = {}
+        for piece in state["result"]["plan"]:
+            self.pieces.setdefault(piece["wall"], []).append(piece)
+        self.totals = state["result"]["totals"]
+        self.meta = state["result"]["meta"]
+        self.svg = ET.fromstring(state["svg"])
+
+    def apply(self, patch):
+        assert patch["version"] == self.version + 1
+        self.version = patch["version"]
+        for wall, pieces in patch["pieces"].items():
+            self.pieces[wall] = pieces
+        self.totals = patch["totals"]
+        self.meta = patch.get("meta", self.meta)
+        canvas = patch["svg"].get("canvas")
+        if canvas is not None:
+            self.svg.set("width", str(canvas["width"]))
+            self.svg.set("height", str(canvas["height"]))
+            self.svg.set("viewBox", f"0 0 {canvas['width']} {canvas['height']}")
+        for name, markup in patch["svg"]["fragments"].items():
+            children = list(self.svg)
+            index = next(i for i, el in enumerate(children) if el.get("id") == name)
+            self.svg.remove(children[index])
+            self.svg.insert(index, ET.fromstring(f'<svg xmlns="http://www.w3.org/2000/svg">{markup}</svg>')[0])
+
+    def plan(self):
+        return [p for wall in ("B", "A", "E") for p in self.pieces.get(wall, [])]
+
+
+def _canonical(svg):
+    return ET.tostring(svg if isinstance(svg, ET.Element) else ET.fromstring(svg))
+
+
+@pytest.fixture
+def client():
+    plan_cache.clear()
+    return api.app.test_client()
+
+
+def test_session_patches_round_trip(client):
+    res = client.post("/plan/sessions", json=START)
+    assert res.status_code == 201
+    state = res.get_json()
+    local = Client(state)
+    room = dict(START)
+    for edit in EDITS:
+        res = client.patch(f"/plan/sessions/{state['session']}", json={"changes": edit, "version": local.version})
+        assert res.status_code == 200, res.get_json()
+        patch = res.get_json()
+        local.apply(patch)
+        room.update(edit)
+
+        fresh = client.post("/plan", json=room).get_json()
+        assert patch["input"] == fresh["input"]
+        assert local.plan() == fresh["result"]["plan"]
+        assert local.totals == fresh["result"]["totals"]
+        assert local.meta == fresh["result"]["meta"]
+        # El SVG de la sesión (con id por fragmento) es el mismo que el de una sesión nueva con esa entrada
+        assert _canonical(local.svg) == _canonical(client.post("/plan/sessions", json=room).get_json()["svg"])
+
+    full = client.get(f"/plan/sessions/{state['session']}").get_json()
+    assert full["version"] == local.version
+    assert _canonical(local.svg) == _canonical(full["svg"])
+
+
+def test_session_only_sends_what_changed(client):
+    state = client.post("/plan/sessions", json=START).get_json()
+    patch = client.patch(f"/plan/sessions/{state['session']}", json={"H": 250}).get_json()
+    assert patch["pieces"] == {}
+    assert patch["svg"]["fragments"] == {}
+    assert "meta" not in patch and "canvas" not in patch["svg"]
+
+
+def test_stale_version_and_infeasible_changes_leave_the_session_untouched(client):
+    state = client.post("/plan/sessions", json=START).get_json()
+    url = f"/plan/sessions/{state['session']}"
+    assert client.patch(url, json={"changes": {"B": 260}, "version": state["version"] + 5}).status_code == 409
+    assert client.patch(url, json={"H": 50}).status_code == 422
+    after = client.get(url).get_json()
+    assert after["version"] == state["version"]
+    assert after["svg"] == state["svg"]
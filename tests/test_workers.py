@@ -0,0 +1,146 @@
+import time
+from concurrent.futures import Future, TimeoutError
+
+import pytest
+
+import api
+from api_cache import RenderCache
+from api_workers import JobStore, QueueFull, RenderPool
+
+PNG = {"format": "png", "width": 1200, "height": 900, "thumbnail": False}
+ROOM = {"A": 240, "B": 200, "C": 30, "D": 30, "E": 0, "H": 250, "walls": ["A", "B"], "shape": "L"}
+
+
+class CountingPool(RenderPool):
+    def __init__(self, fail=None):
+        super().__init__(workers=0, max_queue=0, timeout=1)
+        self.fail = fail
+        self.calls = 0
+
+    def submit(self, fn, *args):
+        self.calls += 1
+        if self.fail:
+            raise self.fail()
+        return super().submit(fn, *args)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "render_cache", RenderCache(memory_bytes=1 << 20))
+    monkeypatch.setattr(api, "render_jobs", JobStore(ttl=600, max_jobs=10))
+    monkeypatch.setattr(api, "render_pool", CountingPool())
+    monkeypatch.setattr(api, "render_image", lambda input_data, result, *options: b"\x89PNG falso")
+    monkeypatch.setattr(api, "rasterize_svg", lambda svg, *options: b"\x89PNG falso")
+    return api.app.test_client()
+
+
+def test_pool_rejects_when_full_and_times_out():
+    pool = RenderPool(workers=1, max_queue=0, timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            pool.run(time.sleep, 1)
+        with pytest.raises(QueueFull):
+            pool.submit(time.sleep, 0)
+        assert pool.rejected == 1
+    finally:
+        pool.shutdown()
+
+
+def test_inline_pool_captures_exceptions():
+    pool = RenderPool(workers=0, max_queue=0, timeout=1)
+    assert pool.run(sum, [1, 2]) == 3
+    with pytest.raises(ZeroDivisionError):
+        pool.run(divmod, 1, 0)
+
+
+def test_job_status_transitions():
+    store = JobStore(ttl=600, max_jobs=10)
+    fut = Future()
+    job = store.add("k", lambda: fut)
+    assert JobStore.status(job) == "pending"
+    fut.set_running_or_notify_cancel()
+    assert JobStore.status(job) == "running"
+    fut.set_result(b"png")
+    assert JobStore.status(store.get("k")) == "done"
+
+    failed = Future()
+    failed.set_exception(RuntimeError("boom"))
+    assert JobStore.status(store.add("e", lambda: failed)) == "error"
+
+
+def test_job_store_reserves_capacity_before_starting():
+    store = JobStore(ttl=600, max_jobs=1)
+    started = []
+
+    def start():
+        started.append(1)
+        return Future()
+
+    job = store.add("a", start)
+    assert store.add("a", start) is job  # ya existe: no se lanza de nuevo
+    with pytest.raises(QueueFull):
+        store.add("b", start)
+    assert len(started) == 1
+
+
+def test_job_store_forgets_jobs_whose_start_fails():
+    store = JobStore(ttl=600, max_jobs=1)
+
+    def start():
+        raise QueueFull()
+
+    with pytest.raises(QueueFull):
+        store.add("a", start)
+    assert store.get("a") is None
+    store.add("b", Future)  # el lugar quedó libre
+
+
+def test_job_store_expires_old_jobs():
+    store = JobStore(ttl=0.01, max_jobs=1)
+    store.add("a", Future)
+    time.sleep(0.02)
+    assert store.get("a") is None
+    store.add("b", Future)
+
+
+def test_render_job_runs_to_done_and_fills_the_cache(client):
+    res = client.post("/render/jobs", json=ROOM)
+    assert res.status_code == 202
+    body = res.get_json()
+    assert body["status"] == "done"
+    assert client.get(body["statusUrl"]).get_json()["status"] == "done"
+    res = client.get(body["resultUrl"])
+    assert res.status_code == 200 and res.data == b"\x89PNG falso"
+    # Ya está en caché: un nuevo pedido responde listo sin pasar por el pool
+    assert client.post("/render/jobs", json=ROOM).status_code == 200
+    assert api.render_pool.calls == 1
+
+
+def test_render_job_503_when_job_store_is_full_does_not_touch_the_pool(client, monkeypatch):
+    monkeypatch.setattr(api, "render_jobs", JobStore(ttl=600, max_jobs=0))
+    res = client.post("/render/jobs", json=ROOM)
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == str(api.RENDER_RETRY_AFTER)
+    assert api.render_pool.calls == 0
+
+
+def test_render_job_503_when_pool_is_full_leaves_no_job(client, monkeypatch):
+    monkeypatch.setattr(api, "render_pool", CountingPool(fail=QueueFull))
+    res = client.post("/render/jobs", json=ROOM)
+    assert res.status_code == 503
+    job_id = api.render_cache_key(*api.plan_shelves_cached(ROOM), PNG)
+    assert client.get(f"/render/jobs/{job_id}").status_code == 404
+
+
+def test_render_maps_pool_errors_to_503_and_504(client, monkeypatch):
+    monkeypatch.setattr(api, "render_pool", CountingPool(fail=QueueFull))
+    assert client.post("/render", json=ROOM).status_code == 503
+    monkeypatch.setattr(api, "render_pool", CountingPool(fail=TimeoutError))
+    assert client.post("/render", json=ROOM).status_code == 504
+
+
+def test_render_miss_then_hit(client):
+    res = client.post("/render", json=ROOM)
+    assert res.status_code == 200 and res.headers["X-Cache"] == "MISS"
+    res = client.post("/render", json=ROOM)
+    assert res.headers["X-Cache"] == "HIT" and res.data == b"\x89PNG falso"
@@ -0,0 +1,47 @@
+"""Punto de entrada WSGI de producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con `preload_app` (ver gunicorn.conf.py) este módulo se importa una sola vez en el
+proceso maestro y los workers se crean con fork, compartiendo las páginas ya cargadas.
+`PRELOAD_HEAVY` elige qué módulos pesados se importan también antes del fork:
+`batch` (NumPy), `pdf` (reportlab y PyPDF2, más la plantilla de la página del plano)
+y `raster` (cairosvg y Pillow), separados por comas, o `all`. Por defecto ninguno, para
+que un pod que solo atiende /plan esté listo lo antes posible; los pods de render
+pueden usar `PRELOAD_HEAVY=pdf,raster` y pagar la importación una vez, no por worker.
+"""
+import importlib
+import os
+import time
+
+_t0 = time.perf_counter()
+
+from api import app  # noqa: E402
+
+HEAVY_MODULES = {
+    'batch': ('api_batch',),
+    'pdf': ('api_pdf',),
+    'raster': ('cairosvg', 'PIL.Image'),
+}
+
+
+def preload_heavy(groups):
+    """Importa los grupos de `HEAVY_MODULES` pedidos; devuelve los módulos que se cargaron."""
+    loaded = []
+    for group in groups:
+        for name in HEAVY_MODULES.get(group, ()):
+            try:
+                importlib.import_module(name)
+            except (ImportError, OSError):
+                continue
+            loaded.append(name)
+    if 'api_pdf' in loaded:
+        importlib.import_module('api_pdf').template_page()
+    return loaded
+
+
+_groups = [g.strip() for g in os.environ.get('PRELOAD_HEAVY', '').split(',') if g.strip()]
+if _groups == ['all']:
+    _groups = list(HEAVY_MODULES)
+PRELOADED = preload_heavy(_groups)
+STARTUP_MS = round((time.perf_counter() - _t0) * 1000, 1)